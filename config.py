@@ -13,7 +13,8 @@ load_dotenv()
 class Config:
     """Enhanced configuration management for LLM automation"""
     
-    # OpenRouter Konfiguration (kostenlose Modelle mit Vision)
+    # OpenRouter Konfiguration (kostenlose Modelle mit Vision); mehrere Schlüssel
+    # kommagetrennt angeben, sie werden pro Anfrage rotiert
     OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
     OPENROUTER_MODELS = [
         'meta-llama/llama-3.2-11b-vision-instruct:free',
@@ -21,7 +22,7 @@ class Config:
     ]
     OPENROUTER_API_URL = os.getenv('OPENROUTER_API_URL', 'https://openrouter.ai/api/v1/chat/completions')
     
-    # Google Gemini Konfiguration (kostenlose Modelle)
+    # Google Gemini Konfiguration (kostenlose Modelle); mehrere Schlüssel kommagetrennt
     GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
     GOOGLE_MODELS = [
         'gemini-2.0-flash-exp',
@@ -29,6 +30,73 @@ class Config:
         'gemini-1.5-flash-8b'
     ]
     GOOGLE_API_URL = os.getenv('GOOGLE_API_URL', 'https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent')
+    # Explizites Context-Caching des System-Prompts (Sekunden, 0 = deaktiviert); greift erst ab
+    # 1024 Tokens, also nur bei eigenen großen System-Prompts, nicht beim eingebauten
+    GOOGLE_CONTEXT_CACHE_TTL = int(os.getenv('GOOGLE_CONTEXT_CACHE_TTL', 3600))
+    # Wiederholt gesendete Screenshots einmal über die Files API hochladen und per URI
+    # referenzieren (Sekunden, 0 = deaktiviert; Google löscht Dateien nach 48 Stunden)
+    GOOGLE_FILE_UPLOAD_TTL = int(os.getenv('GOOGLE_FILE_UPLOAD_TTL', 165600))
+    
+    # Lokaler OpenAI-kompatibler Server (llama.cpp, vLLM, Ollama); aktiv, sobald LOCAL_MODELS gesetzt ist
+    LOCAL_API_URL = os.getenv('LOCAL_API_URL', 'http://localhost:8080/v1/chat/completions')
+    LOCAL_API_KEY = os.getenv('LOCAL_API_KEY')  # Nur falls der Server einen Schlüssel verlangt
+    LOCAL_MODELS = [model.strip() for model in os.getenv('LOCAL_MODELS', '').split(',') if model.strip()]
+    LOCAL_HEALTH_CHECK_INTERVAL = float(os.getenv('LOCAL_HEALTH_CHECK_INTERVAL', 30.0))  # Sekunden
+    
+    # Bekannte Free-Tier-Quoten pro Provider und Modell (Requests pro Minute/Tag);
+    # '*' gilt gemeinsam für alle Modelle des Providers
+    MODEL_RATE_LIMITS = {
+        'openrouter': {
+            '*': {'rpm': 20, 'rpd': 50}
+        },
+        'google': {
+            'gemini-2.0-flash-exp': {'rpm': 10, 'rpd': 1500},
+            'gemini-1.5-flash': {'rpm': 15, 'rpd': 1500},
+            'gemini-1.5-flash-8b': {'rpm': 15, 'rpd': 1500}
+        }
+    }
+    
+    # Retry-Matrix pro Provider und Fehlerklasse ('*' = alle Provider).
+    # retryable: gleiches Modell nach Backoff erneut versuchen (max_attempts
+    # inkl. erstem Versuch); sonst geht es direkt zum nächsten Modell.
+    # skip_provider: auch die übrigen Modelle des Providers überspringen.
+    # Fehlerklassen: timeout, server_error, network, invalid_response,
+    # invalid_request, auth, truncated, unknown (Rate-Limits werden umgangen,
+    # abgelehnte Schlüssel eines Pools sofort durch den nächsten ersetzt)
+    RETRY_POLICY = {
+        '*': {
+            'timeout': {'retryable': True, 'max_attempts': 1},
+            'server_error': {'retryable': True, 'max_attempts': 2},
+            'network': {'retryable': True, 'max_attempts': 2},
+            'invalid_response': {'retryable': True, 'max_attempts': 2},
+            'invalid_request': {'retryable': False},
+            'auth': {'retryable': False, 'skip_provider': True},
+            'unknown': {'retryable': False}
+        },
+        'local': {
+            # Ein nicht erreichbarer lokaler Server kommt nicht nach Sekunden zurück
+            'network': {'retryable': False, 'skip_provider': True}
+        }
+    }
+    
+    # Preise in USD pro 1 Mio. Tokens für die Kostenschätzung (Paid Tier; im
+    # Free Tier fallen keine Kosten an). Schlüssel = Modellname oder Präfix,
+    # '*' gilt für alle übrigen Modelle des Providers. OpenRouter meldet die
+    # tatsächlichen Kosten selbst, die Tabelle dient dort nur als Fallback.
+    MODEL_PRICING = {
+        'openrouter': {
+            '*': {'input': 0.0, 'cached_input': 0.0, 'output': 0.0}  # ':free'-Modelle
+        },
+        'local': {
+            '*': {'input': 0.0, 'cached_input': 0.0, 'output': 0.0}
+        },
+        'google': {
+            'gemini-2.0-flash-exp': {'input': 0.0, 'cached_input': 0.0, 'output': 0.0},
+            'gemini-2.0-flash': {'input': 0.10, 'cached_input': 0.025, 'output': 0.40},
+            'gemini-1.5-flash-8b': {'input': 0.0375, 'cached_input': 0.01, 'output': 0.15},
+            'gemini-1.5-flash': {'input': 0.075, 'cached_input': 0.01875, 'output': 0.30}
+        }
+    }
     
     # Aktuelle Modell-Indizes für Rate-Limit-Switching
     _current_openrouter_model_index = 0
@@ -37,6 +105,7 @@ class Config:
     # App-Einstellungen
     MAX_ITERATIONS = int(os.getenv('MAX_ITERATIONS', 20))
     DELAY_BETWEEN_ACTIONS = float(os.getenv('DELAY_BETWEEN_ACTIONS', 1.0))  # Sekunden
+    MAX_PLAN_STEPS = int(os.getenv('MAX_PLAN_STEPS', 10))  # Maximale Schritte einer 'plan'-Aktion
     SCREENSHOT_QUALITY = os.getenv('SCREENSHOT_QUALITY', 'PNG')  # PNG oder JPEG
     SCREENSHOT_CACHE_SIZE = int(os.getenv('SCREENSHOT_CACHE_SIZE', 5))
     SCREENSHOT_CHANGE_THRESHOLD = float(os.getenv('SCREENSHOT_CHANGE_THRESHOLD', 0.1))
@@ -53,19 +122,97 @@ class Config:
     # Modell-Konfiguration
     DEFAULT_MODEL = os.getenv('DEFAULT_MODEL', "google/gemini-2.0-flash-exp:free")
     MAX_TOKENS = int(os.getenv('MAX_TOKENS', 500))
+    MAX_TOKENS_LIMIT = int(os.getenv('MAX_TOKENS_LIMIT', 2048))  # Obergrenze bei Wiederholung nach Abschneiden
+    TRUNCATION_RETRY_FACTOR = float(os.getenv('TRUNCATION_RETRY_FACTOR', 2.0))
+    # Prompt-Budget (geschätzte Tokens für System, Aufgabe, Verlauf und
+    # Fehlerhinweis ohne Screenshot); darüber wird der Verlauf gekürzt
+    PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', 1000))
+    PROMPT_HISTORY_SIZE = int(os.getenv('PROMPT_HISTORY_SIZE', 3))  # Letzte Aktionen im Prompt
+    # Generierung nach dem schließenden Klammerpaar der Aktion beenden
+    STOP_SEQUENCES = ['}\n\n', '}\n```']
+    # Generierungsprofile pro Modell (Schlüssel = Modellname oder Präfix):
+    # max_tokens, stop_sequences, thinking_budget (Gemini), reasoning_effort (OpenRouter)
+    GENERATION_PROFILES = {
+        'gemini-2.5': {'max_tokens': 1024, 'thinking_budget': 512},
+        'gemini-2.0-flash-thinking': {'max_tokens': 2048},
+        'google/gemini-2.5': {'max_tokens': 1024, 'reasoning_effort': 'low'}
+    }
     
     # Safety and Validation Settings
     MAX_WAIT_TIME = float(os.getenv('MAX_WAIT_TIME', 30.0))
     
     # API Settings
-    REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', 30.0))
+    REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', 30.0))  # Obergrenze pro Anfrage
+    # Zeitbudget pro Iteration für alle Versuche und Fallbacks (Sekunden, 0 = unbegrenzt)
+    ITERATION_DEADLINE = float(os.getenv('ITERATION_DEADLINE', 90.0))
+    # Adaptiver Timeout pro Modell: Faktor x p95-Latenz, sobald genug Messwerte vorliegen
+    ADAPTIVE_TIMEOUT_FACTOR = float(os.getenv('ADAPTIVE_TIMEOUT_FACTOR', 3.0))
+    ADAPTIVE_TIMEOUT_MIN_SAMPLES = int(os.getenv('ADAPTIVE_TIMEOUT_MIN_SAMPLES', 5))
+    MIN_REQUEST_TIMEOUT = float(os.getenv('MIN_REQUEST_TIMEOUT', 2.0))
     MAX_RETRIES = int(os.getenv('MAX_RETRIES', 3))
     RETRY_DELAY = float(os.getenv('RETRY_DELAY', 1.0))
+    RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', 10.0))  # Obergrenze einer einzelnen Wartezeit
+    RETRY_BUDGET = float(os.getenv('RETRY_BUDGET', 15.0))  # Summe aller Wartezeiten pro Anfrage
     RATE_LIMIT_BACKOFF = float(os.getenv('RATE_LIMIT_BACKOFF', 60.0))
+    ENABLE_STREAMING = os.getenv('ENABLE_STREAMING', 'True').lower() == 'true'
+    ENABLE_STRUCTURED_OUTPUT = os.getenv('ENABLE_STRUCTURED_OUTPUT', 'True').lower() == 'true'  # JSON-Schema für Antworten
+    
+    # Routing Settings
+    ROUTER_EWMA_ALPHA = float(os.getenv('ROUTER_EWMA_ALPHA', 0.3))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 3))
+    CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', 60.0))
+    
+    # Modell-Kaskade: erst günstige Modelle (provider:model), Eskalation bei
+    # Parse-/Validierungsfehlern oder Aktionen ohne Wirkung
+    ENABLE_MODEL_CASCADE = os.getenv('ENABLE_MODEL_CASCADE', 'True').lower() == 'true'
+    CASCADE_CHEAP_MODELS = [
+        spec.strip() for spec in os.getenv('CASCADE_CHEAP_MODELS', 'google:gemini-1.5-flash-8b').split(',')
+        if spec.strip()
+    ]
+    
+    # Reparatur unlesbarer Antworten: fehlerhafte Antwort und Aktionsschema als
+    # reine Textanfrage (ohne Screenshot) an ein schnelles Modell statt einer
+    # neuen Iteration
+    ENABLE_RESPONSE_REPAIR = os.getenv('ENABLE_RESPONSE_REPAIR', 'True').lower() == 'true'
+    REPAIR_TIMEOUT = float(os.getenv('REPAIR_TIMEOUT', 10.0))  # Zeitbudget der Reparatur
+    
+    # Unveränderter Bildschirm: Folgeanfrage ohne Screenshot, die auf den
+    # vorherigen Turn verweist (Provider mit Multi-Turn-Unterstützung)
+    ENABLE_FOLLOW_UP_TURNS = os.getenv('ENABLE_FOLLOW_UP_TURNS', 'True').lower() == 'true'
+    
+    # Warm-up beim Start: jedes Modell einmal mit einer Mini-Anfrage testen;
+    # Latenz und Erreichbarkeit werden mit TTL gespeichert und beim nächsten
+    # Start wiederverwendet
+    ENABLE_WARMUP_PROBE = os.getenv('ENABLE_WARMUP_PROBE', 'False').lower() == 'true'
+    WARMUP_PROFILE_PATH = os.getenv('WARMUP_PROFILE_PATH', 'latency_profile.json')
+    WARMUP_PROFILE_TTL = float(os.getenv('WARMUP_PROFILE_TTL', 3600))  # Sekunden
+    WARMUP_TIMEOUT = float(os.getenv('WARMUP_TIMEOUT', 10.0))
+    WARMUP_WORKERS = int(os.getenv('WARMUP_WORKERS', 4))  # Parallele Probes
+    
+    # Offline-Evaluierung (python main.py --eval <Verzeichnis>)
+    EVAL_WORKERS = int(os.getenv('EVAL_WORKERS', 4))  # Parallele Anfragen
+    EVAL_COORDINATE_TOLERANCE = float(os.getenv('EVAL_COORDINATE_TOLERANCE', 20.0))  # Pixel pro Achse
     
     # Performance Settings
     ENABLE_CACHING = os.getenv('ENABLE_CACHING', 'True').lower() == 'true'
     CACHE_TTL = int(os.getenv('CACHE_TTL', 300))  # 5 minutes
+    ENABLE_RESPONSE_CACHE = os.getenv('ENABLE_RESPONSE_CACHE', 'False').lower() == 'true'
+    RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', 'llm_response_cache.sqlite3')
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1000))
+    # Gleichzeitige identische Anfragen (Screenshot, Prompt, Modell) aller Prozesse auf diesem
+    # Rechner nur einmal senden (SQLite-Datei)
+    ENABLE_SINGLE_FLIGHT = os.getenv('ENABLE_SINGLE_FLIGHT', 'False').lower() == 'true'
+    SINGLE_FLIGHT_PATH = os.getenv('SINGLE_FLIGHT_PATH', 'single_flight.sqlite3')
+    # Sekunden, nach denen ein laufender Aufruf als abgebrochen gilt und neu gesendet wird
+    SINGLE_FLIGHT_LEASE_TTL = float(os.getenv('SINGLE_FLIGHT_LEASE_TTL', 120.0))
+    # Rate-Limits über alle Prozesse auf diesem Rechner teilen (SQLite-Datei)
+    ENABLE_SHARED_QUOTA = os.getenv('ENABLE_SHARED_QUOTA', 'False').lower() == 'true'
+    QUOTA_LEDGER_PATH = os.getenv('QUOTA_LEDGER_PATH', 'quota_ledger.sqlite3')
+    ENABLE_SCREEN_INDEX = os.getenv('ENABLE_SCREEN_INDEX', 'False').lower() == 'true'
+    SCREEN_INDEX_PATH = os.getenv('SCREEN_INDEX_PATH', 'screen_index.json')
+    SCREEN_INDEX_MAX_ENTRIES = int(os.getenv('SCREEN_INDEX_MAX_ENTRIES', 100000))
+    SCREEN_INDEX_HINT_DISTANCE = int(os.getenv('SCREEN_INDEX_HINT_DISTANCE', 10))  # Bits (von 256)
+    SCREEN_INDEX_HIT_DISTANCE = int(os.getenv('SCREEN_INDEX_HIT_DISTANCE', 2))
     OPTIMIZE_SCREENSHOTS = os.getenv('OPTIMIZE_SCREENSHOTS', 'True').lower() == 'true'
     
     # Monitoring Settings
@@ -119,28 +266,60 @@ class Config:
         else:
             raise ValueError(f"Unbekannter Provider: {provider}. Nur 'openrouter' und 'google' werden unterstützt.")
     
+    # Verfügbarkeit einzelner Provider ist nur informativ; einer genügt
+    PROVIDER_STATUS_KEYS = ('openrouter_available', 'google_available', 'local_available')
+    
     @classmethod
     def validate_config(cls) -> Dict[str, bool]:
         """Enhanced configuration validation"""
         status = {
             'openrouter_available': bool(cls.OPENROUTER_API_KEY),
             'google_available': bool(cls.GOOGLE_API_KEY),
+            'local_available': bool(cls.LOCAL_MODELS),
+            'provider_available': bool(cls.OPENROUTER_API_KEY or cls.GOOGLE_API_KEY or cls.LOCAL_MODELS),
             'valid_max_iterations': 1 <= cls.MAX_ITERATIONS <= 1000,
             'valid_delay': 0 <= cls.DELAY_BETWEEN_ACTIONS <= 10,
+            'valid_plan_steps': 1 <= cls.MAX_PLAN_STEPS <= 50,
             'valid_cache_size': 1 <= cls.SCREENSHOT_CACHE_SIZE <= 20,
             'valid_change_threshold': 0.01 <= cls.SCREENSHOT_CHANGE_THRESHOLD <= 1.0,
             'valid_timeout': 1 <= cls.REQUEST_TIMEOUT <= 300,
-            'valid_retries': 0 <= cls.MAX_RETRIES <= 10,
-            'valid_wait_time': 0 <= cls.MAX_WAIT_TIME <= 300
+            'valid_adaptive_timeout': cls.ADAPTIVE_TIMEOUT_FACTOR >= 1 and 0 < cls.MIN_REQUEST_TIMEOUT <= cls.REQUEST_TIMEOUT,
+            'valid_iteration_deadline': cls.ITERATION_DEADLINE == 0 or cls.ITERATION_DEADLINE >= cls.MIN_REQUEST_TIMEOUT,
+            'valid_retries': 1 <= cls.MAX_RETRIES <= 10,
+            'valid_retry_delays': 0 <= cls.RETRY_DELAY <= cls.RETRY_MAX_DELAY and cls.RETRY_BUDGET >= 0,
+            'valid_max_tokens': 1 <= cls.MAX_TOKENS <= cls.MAX_TOKENS_LIMIT,
+            'valid_prompt_budget': cls.PROMPT_TOKEN_BUDGET >= 100 and cls.PROMPT_HISTORY_SIZE >= 0,
+            'valid_file_upload_ttl': 0 <= cls.GOOGLE_FILE_UPLOAD_TTL <= 172800,
+            'valid_local_health_interval': cls.LOCAL_HEALTH_CHECK_INTERVAL > 0,
+            'valid_eval_workers': 1 <= cls.EVAL_WORKERS <= 64,
+            'valid_repair_timeout': cls.REPAIR_TIMEOUT >= cls.MIN_REQUEST_TIMEOUT,
+            'valid_warmup': cls.WARMUP_PROFILE_TTL >= 0 and 0 < cls.WARMUP_TIMEOUT <= cls.REQUEST_TIMEOUT and cls.WARMUP_WORKERS >= 1,
+            'valid_router_alpha': 0 < cls.ROUTER_EWMA_ALPHA <= 1,
+            'valid_wait_time': 0 <= cls.MAX_WAIT_TIME <= 300,
+            'valid_response_cache_size': cls.RESPONSE_CACHE_MAX_ENTRIES >= 1,
+            'valid_single_flight_lease': cls.SINGLE_FLIGHT_LEASE_TTL >= cls.REQUEST_TIMEOUT,
+            'valid_screen_index_distances': 0 <= cls.SCREEN_INDEX_HIT_DISTANCE <= cls.SCREEN_INDEX_HINT_DISTANCE
         }
         return status
     
+    @classmethod
+    def failed_validations(cls, status: Optional[Dict[str, bool]] = None) -> List[str]:
+        """Failed checks of validate_config, ignoring which single providers are configured"""
+        status = cls.validate_config() if status is None else status
+        return [key for key, value in status.items() if not value and key not in cls.PROVIDER_STATUS_KEYS]
+    
     @classmethod
     def get_performance_config(cls) -> Dict:
         """Get performance-related configuration"""
         return {
             'enable_caching': cls.ENABLE_CACHING,
             'cache_ttl': cls.CACHE_TTL,
+            'enable_response_cache': cls.ENABLE_RESPONSE_CACHE,
+            'response_cache_max_entries': cls.RESPONSE_CACHE_MAX_ENTRIES,
+            'enable_single_flight': cls.ENABLE_SINGLE_FLIGHT,
+            'enable_shared_quota': cls.ENABLE_SHARED_QUOTA,
+            'enable_screen_index': cls.ENABLE_SCREEN_INDEX,
+            'screen_index_hit_distance': cls.SCREEN_INDEX_HIT_DISTANCE,
             'optimize_screenshots': cls.OPTIMIZE_SCREENSHOTS,
             'screenshot_cache_size': cls.SCREENSHOT_CACHE_SIZE,
             'change_threshold': cls.SCREENSHOT_CHANGE_THRESHOLD
@@ -161,14 +340,28 @@ ENV_EXAMPLE = """
 # .env Datei - Kopieren Sie diese Vorlage und fügen Sie Ihre API-Schlüssel ein
 
 # OpenRouter API-Schlüssel (empfohlen - kostenlose Modelle verfügbar)
+# Mehrere Schlüssel kommagetrennt: Anfragen werden rotiert, jeder Schlüssel hat eigene Quoten
 OPENROUTER_API_KEY=
 
 # Google Gemini API-Schlüssel (empfohlen - kostenlose Modelle verfügbar)
 GOOGLE_API_KEY=your-google-api-key-here
 
+# System-Prompt per cachedContents registrieren (Sekunden, 0 = deaktiviert)
+GOOGLE_CONTEXT_CACHE_TTL=3600
+
+# Unveränderte Screenshots einmal hochladen statt erneut einzubetten (Sekunden, 0 = deaktiviert)
+GOOGLE_FILE_UPLOAD_TTL=165600
+
+# Lokaler OpenAI-kompatibler Server (optional, kommagetrennte Modellnamen)
+LOCAL_API_URL=http://localhost:8080/v1/chat/completions
+LOCAL_API_KEY=
+LOCAL_MODELS=
+LOCAL_HEALTH_CHECK_INTERVAL=30.0
+
 # App-Einstellungen (optional)
 MAX_ITERATIONS=20
 DELAY_BETWEEN_ACTIONS=1.0
+MAX_PLAN_STEPS=10
 LOG_LEVEL=INFO
 LOG_FILE=automation.log
 
@@ -181,18 +374,73 @@ SCREENSHOT_CHANGE_THRESHOLD=0.1
 FAILSAFE_ENABLED=True
 PAUSE_BETWEEN_ACTIONS=0.5
 
+# Generierungsbudget
+MAX_TOKENS=500
+MAX_TOKENS_LIMIT=2048
+TRUNCATION_RETRY_FACTOR=2.0
+PROMPT_TOKEN_BUDGET=1000
+PROMPT_HISTORY_SIZE=3
+
 # Safety Settings
 MAX_WAIT_TIME=30.0
 
 # API Settings
 REQUEST_TIMEOUT=30.0
+ITERATION_DEADLINE=90.0
+ADAPTIVE_TIMEOUT_FACTOR=3.0
+ADAPTIVE_TIMEOUT_MIN_SAMPLES=5
+MIN_REQUEST_TIMEOUT=2.0
 MAX_RETRIES=3
 RETRY_DELAY=1.0
+RETRY_MAX_DELAY=10.0
+RETRY_BUDGET=15.0
 RATE_LIMIT_BACKOFF=60.0
+ENABLE_STREAMING=True
+ENABLE_STRUCTURED_OUTPUT=True
+
+# Routing Settings
+ROUTER_EWMA_ALPHA=0.3
+CIRCUIT_FAILURE_THRESHOLD=3
+CIRCUIT_RESET_TIMEOUT=60.0
+
+# Modell-Kaskade (kommagetrennt, Format provider:model)
+ENABLE_MODEL_CASCADE=True
+CASCADE_CHEAP_MODELS=google:gemini-1.5-flash-8b
+
+# Reparatur unlesbarer Antworten (reine Textanfrage)
+ENABLE_RESPONSE_REPAIR=True
+REPAIR_TIMEOUT=10.0
+
+# Folgeanfragen ohne Screenshot bei unverändertem Bildschirm
+ENABLE_FOLLOW_UP_TURNS=True
+
+# Warm-up beim Start
+ENABLE_WARMUP_PROBE=False
+WARMUP_PROFILE_PATH=latency_profile.json
+WARMUP_PROFILE_TTL=3600
+WARMUP_TIMEOUT=10.0
+WARMUP_WORKERS=4
+
+# Offline-Evaluierung
+EVAL_WORKERS=4
+EVAL_COORDINATE_TOLERANCE=20.0
 
 # Performance Settings
 ENABLE_CACHING=True
 CACHE_TTL=300
+ENABLE_RESPONSE_CACHE=False
+RESPONSE_CACHE_PATH=llm_response_cache.sqlite3
+RESPONSE_CACHE_MAX_ENTRIES=1000
+ENABLE_SINGLE_FLIGHT=False
+SINGLE_FLIGHT_PATH=single_flight.sqlite3
+SINGLE_FLIGHT_LEASE_TTL=120.0
+ENABLE_SHARED_QUOTA=False
+QUOTA_LEDGER_PATH=quota_ledger.sqlite3
+ENABLE_SCREEN_INDEX=False
+SCREEN_INDEX_PATH=screen_index.json
+SCREEN_INDEX_MAX_ENTRIES=100000
+SCREEN_INDEX_HINT_DISTANCE=10
+SCREEN_INDEX_HIT_DISTANCE=2
 OPTIMIZE_SCREENSHOTS=True
 
 # Monitoring Settings
@@ -205,7 +453,7 @@ if __name__ == "__main__":
     print("Konfiguration wird getestet...")
     
     validation_status = Config.validate_config()
-    if all(validation_status.values()):
+    if not Config.failed_validations(validation_status):
         print("✓ Konfiguration ist gültig")
         print(f"  Validation details: {validation_status}")
     else:
@@ -2,7 +2,7 @@ import pyautogui
 import time
 import webbrowser
 import logging
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Callable, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -11,13 +11,24 @@ class ActionExecutor:
     Executes GUI actions with validation and safety checks
     """
     
-    def __init__(self, config):
+    # Actions that are expected to visibly change the screen
+    SCREEN_CHANGING_ACTIONS = frozenset({
+        'click', 'double_click', 'right_click', 'type', 'key', 'scroll', 'navigate', 'plan'
+    })
+    
+    def __init__(self, config, screen_change_check: Optional[Callable[[], bool]] = None):
         self.config = config
+        self.screen_change_check = screen_change_check
+        self.max_plan_steps = getattr(config, 'MAX_PLAN_STEPS', 10)
         self.screen_size = pyautogui.size()
         self.safe_zones = getattr(config, 'SAFE_CLICK_ZONES', [])
         self.confirmation_required = getattr(config, 'CONFIRMATION_REQUIRED_ACTIONS', [])
         self.action_count = 0
         self.successful_actions = 0
+        self.plans_executed = 0
+        self.plan_steps_executed = 0
+        self.plans_aborted = 0
+        self.last_plan_aborted = False
         
         # Configure PyAutoGUI
         pyautogui.FAILSAFE = getattr(config, 'FAILSAFE_ENABLED', True)
@@ -68,6 +79,8 @@ class ActionExecutor:
                 return self._execute_complete(action_data)
             elif action == 'error':
                 return self._execute_error(action_data)
+            elif action == 'plan':
+                return self._execute_plan(action_data)
             else:
                 logger.error(f"Unknown action: {action}")
                 return None
@@ -112,6 +125,15 @@ class ActionExecutor:
             if 'url' not in action_data or not isinstance(action_data['url'], str):
                 return False
         
+        # Validate plan
+        if action == 'plan':
+            steps = action_data.get('steps')
+            if not isinstance(steps, list) or not steps:
+                return False
+            if len(steps) > self.max_plan_steps:
+                logger.warning(f"Plan has {len(steps)} steps, more than the allowed {self.max_plan_steps}")
+                return False
+        
         # Validate wait time
         if action == 'wait':
             if 'seconds' not in action_data or not isinstance(action_data['seconds'], (int, float)):
@@ -262,11 +284,58 @@ class ActionExecutor:
         logger.error(f"Task error: {message}")
         return "ERROR"
     
+    def _execute_plan(self, action_data: Dict[str, Any]) -> Optional[str]:
+        """
+        Execute the steps of a plan back to back
+        
+        A step with "verify_change": true is a checkpoint: if the screen did
+        not change after it, or a step fails, the rest of the plan is skipped
+        and the next iteration asks the LLM again. Steps that end the
+        iteration (next_prompt, complete, error) end the plan.
+        """
+        steps = action_data['steps']
+        self.plans_executed += 1
+        self.last_plan_aborted = False
+        logger.info(f"Executing plan with {len(steps)} steps")
+        
+        for index, step in enumerate(steps, 1):
+            if isinstance(step, dict) and step.get('action') == 'plan':
+                logger.error("Nested plans are not supported")
+                return self._abort_plan(index, len(steps))
+            
+            successful_before = self.successful_actions
+            result = self.execute_action(step)
+            if self.successful_actions == successful_before and result != "ERROR":
+                logger.warning(f"Plan step {index} ({step.get('action') if isinstance(step, dict) else step}) failed")
+                return self._abort_plan(index, len(steps))
+            self.plan_steps_executed += 1
+            
+            if result is not None:
+                return result
+            
+            if step.get('verify_change') and self.screen_change_check is not None:
+                if not self.screen_change_check():
+                    logger.warning(f"Plan checkpoint after step {index} failed: screen unchanged")
+                    return self._abort_plan(index, len(steps))
+                logger.debug(f"Plan checkpoint after step {index} passed")
+        
+        self.successful_actions += 1
+        return None
+    
+    def _abort_plan(self, step: int, total: int) -> Optional[str]:
+        self.plans_aborted += 1
+        self.last_plan_aborted = True
+        logger.info(f"Aborting plan after step {step}/{total}")
+        return None
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get action execution statistics"""
         return {
             'total_actions': self.action_count,
             'successful_actions': self.successful_actions,
             'success_rate': self.successful_actions / max(self.action_count, 1),
+            'plans_executed': self.plans_executed,
+            'plan_steps_executed': self.plan_steps_executed,
+            'plans_aborted': self.plans_aborted,
             'screen_size': {'width': self.screen_size.width, 'height': self.screen_size.height}
         }
\ No newline at end of file
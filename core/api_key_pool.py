@@ -0,0 +1,95 @@
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+def mask_key(key: str) -> str:
+    """Stable identifier of an API key for logs, stats and rate limits that does not reveal it"""
+    return 'key-' + hashlib.sha256(key.encode('utf-8')).hexdigest()[:8]
+
+class ApiKeyPool:
+    """
+    Round-robin rotation over the API keys of one provider
+
+    Keys are only ever exposed by their masked id outside the provider.
+    Keys the API rejects as invalid are retired for the rest of the session.
+    An empty pool stands for a provider that needs no key.
+    """
+
+    def __init__(self, keys: Sequence[str]):
+        # Keep the configured order, drop duplicates
+        self._keys: Dict[str, str] = {mask_key(key): key for key in dict.fromkeys(keys)}
+        self._retired: Dict[str, str] = {}
+        self._cursor = 0
+        self._stats = {key_id: {'requests': 0, 'rate_limited': 0} for key_id in self._keys}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse(value: Optional[str]) -> List[str]:
+        """Split a comma-separated key setting"""
+        return [key.strip() for key in (value or '').split(',') if key.strip()]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def exhausted(self) -> bool:
+        """True if the provider has keys but all of them were retired"""
+        return bool(self._keys) and len(self._retired) == len(self._keys)
+
+    def active_count(self) -> int:
+        return len(self._keys) - len(self._retired)
+
+    def active(self) -> List[Tuple[str, str]]:
+        """Active keys as (key, key id) in configured order"""
+        if not self._keys:
+            return [('', '')]
+        return [(key, key_id) for key_id, key in self._keys.items() if key_id not in self._retired]
+
+    def rotation(self) -> List[Tuple[str, str]]:
+        """
+        Active keys in the order to try them for the next request
+
+        Each call starts one key further, so consecutive requests rotate.
+        """
+        with self._lock:
+            active = self.active()
+            if not active:
+                return []
+            start = self._cursor % len(active)
+            self._cursor += 1
+        return active[start:] + active[:start]
+
+    def default(self) -> Tuple[str, str]:
+        """First active key, used outside of a request"""
+        active = self.active()
+        return active[0] if active else ('', '')
+
+    def record_request(self, key_id: str):
+        with self._lock:
+            if key_id in self._stats:
+                self._stats[key_id]['requests'] += 1
+
+    def record_rate_limit(self, key_id: str):
+        with self._lock:
+            if key_id in self._stats:
+                self._stats[key_id]['rate_limited'] += 1
+
+    def retire(self, key_id: str, reason: str):
+        """Stop using a key the API rejected"""
+        with self._lock:
+            if key_id not in self._keys or key_id in self._retired:
+                return
+            self._retired[key_id] = reason
+            remaining = len(self._keys) - len(self._retired)
+        logger.warning(f"Retired API key {key_id} ({reason}), {remaining} keys left")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Request counts per masked key id"""
+        with self._lock:
+            return {
+                key_id: dict(stats, retired=self._retired.get(key_id))
+                for key_id, stats in self._stats.items()
+            }
@@ -0,0 +1,19 @@
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass(frozen=True)
+class ConversationTurn:
+    """
+    One completed exchange with a model
+
+    Sent as history before a follow-up prompt, so the follow-up can refer to
+    the screenshot of this turn instead of attaching it again.
+
+    Attributes:
+        prompt: User prompt of the turn
+        image_b64: Screenshot sent with the prompt, None for a text-only turn
+        response: Raw answer of the model
+    """
+    prompt: str
+    image_b64: Optional[str]
+    response: str
@@ -0,0 +1,33 @@
+import math
+import time
+from typing import Optional
+
+class Deadline:
+    """
+    Point in time by which a unit of work (e.g. one iteration) must finish
+
+    Passed down through the request path so that retries and fallbacks only
+    spend the remaining budget. A deadline without budget never expires.
+    """
+
+    def __init__(self, budget: Optional[float] = None):
+        self.budget = budget
+        self.expires_at = time.time() + budget if budget else None
+
+    def remaining(self) -> float:
+        """Seconds left, infinite for a deadline without budget"""
+        if self.expires_at is None:
+            return math.inf
+        return max(self.expires_at - time.time(), 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cap(self, timeout: float) -> float:
+        """Limit a timeout to the remaining budget"""
+        return min(timeout, self.remaining())
+
+    def __repr__(self) -> str:
+        if self.expires_at is None:
+            return 'Deadline(unbounded)'
+        return f"Deadline(remaining={self.remaining():.2f}s)"
@@ -0,0 +1,286 @@
+"""
+Offline evaluation of provider/model pairs on recorded frames
+
+A recording directory contains one screenshot per case plus a JSON sidecar
+with the same stem:
+
+    recordings/
+        login_01.png
+        login_01.json   {"prompt": "Melde dich an", "expected": {"action": "click", "x": 640, "y": 410}}
+
+"expected" may also be a list of acceptable actions; an optional
+"tolerance" overrides the coordinate tolerance for that case.
+"""
+
+import base64
+import json
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from core.exceptions import RateLimitError
+from core.prompt_builder import PromptBuilder
+from core.provider_router import Target
+from core.usage_tracker import UsageTracker
+from utils.json_parser import ACTION_FIELDS, RobustJSONParser
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg')
+COORDINATE_FIELDS = ('x', 'y')
+LATENCY_PERCENTILES = (50, 90, 99)
+
+@dataclass
+class EvalCase:
+    """A recorded frame with the prompt and the acceptable actions"""
+    name: str
+    prompt: str
+    image_b64: str
+    expected: List[Dict[str, Any]]
+    tolerance: Optional[float] = None
+
+def load_cases(directory: str) -> List[EvalCase]:
+    """
+    Load all cases of a recording directory
+
+    Frames without a sidecar or with an unreadable one are skipped.
+
+    Args:
+        directory: Directory with <name>.png and <name>.json pairs
+    """
+    cases = []
+    for image_path in sorted(Path(directory).iterdir()):
+        if image_path.suffix.lower() not in IMAGE_SUFFIXES:
+            continue
+        sidecar = image_path.with_suffix('.json')
+        try:
+            spec = json.loads(sidecar.read_text(encoding='utf-8'))
+            expected = spec['expected']
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Skipping {image_path.name}: no usable sidecar ({e})")
+            continue
+        cases.append(EvalCase(
+            name=image_path.stem,
+            prompt=spec.get('prompt', ''),
+            image_b64=base64.b64encode(image_path.read_bytes()).decode('ascii'),
+            expected=expected if isinstance(expected, list) else [expected],
+            tolerance=spec.get('tolerance')
+        ))
+    logger.info(f"Loaded {len(cases)} evaluation cases from {directory}")
+    return cases
+
+def action_matches(actual: Dict[str, Any], expected: Dict[str, Any], tolerance: float) -> bool:
+    """
+    Check whether an action is equivalent to the expected one
+
+    Coordinates may deviate by up to tolerance pixels per axis; other fields
+    of the action type must match exactly (text case-insensitively). Plans
+    match if all steps match in order.
+    """
+    if actual.get('action') != expected.get('action'):
+        return False
+
+    if expected['action'] == 'plan':
+        actual_steps = actual.get('steps') or []
+        expected_steps = expected.get('steps') or []
+        return len(actual_steps) == len(expected_steps) and all(
+            action_matches(step, expected_step, tolerance)
+            for step, expected_step in zip(actual_steps, expected_steps)
+        )
+
+    for field in ACTION_FIELDS.get(expected['action'], []):
+        if field not in expected:
+            continue
+        if field in COORDINATE_FIELDS:
+            try:
+                if abs(float(actual[field]) - float(expected[field])) > tolerance:
+                    return False
+            except (KeyError, TypeError, ValueError):
+                return False
+        elif str(actual.get(field, '')).strip().lower() != str(expected[field]).strip().lower():
+            return False
+    return True
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile, None for an empty sample"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+class TargetResult:
+    """Outcome counters and latencies of one provider/model pair"""
+
+    def __init__(self, target: Target):
+        self.target = target
+        self.cases = 0
+        self.correct = 0
+        self.parse_failures = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.latencies: List[float] = []
+        self.failures: List[str] = []
+
+    @property
+    def answered(self) -> int:
+        return self.cases - self.errors - self.rate_limited
+
+    def as_dict(self, usage: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        usage = usage or {}
+        return {
+            'target': f"{self.target[0]}:{self.target[1]}",
+            'cases': self.cases,
+            'correct': self.correct,
+            'accuracy': self.correct / max(self.answered, 1),
+            'parse_failures': self.parse_failures,
+            'errors': self.errors,
+            'rate_limited': self.rate_limited,
+            'latency': {f"p{q}": percentile(self.latencies, q) for q in LATENCY_PERCENTILES},
+            'prompt_tokens': usage.get('prompt_tokens', 0),
+            'output_tokens': usage.get('output_tokens', 0),
+            'tokens_per_case': (usage.get('prompt_tokens', 0) + usage.get('output_tokens', 0)) / max(self.answered, 1),
+            'cost': usage.get('cost', 0.0),
+            'failures': self.failures
+        }
+
+class Evaluator:
+    """
+    Runs every case against every target on a bounded thread pool
+
+    Each target gets its own provider instance so concurrent requests do not
+    switch models under each other; all instances share the manager's rate
+    limiter, and locally throttled requests wait for their slot. Prompts
+    are assembled by the same PromptBuilder as in the automation loop. Requests
+    are not streamed by default, because cancelled streams do not report usage.
+    """
+
+    def __init__(self, llm_manager, prompt_builder: Optional[PromptBuilder] = None, workers: int = 4,
+                 tolerance: float = 20.0, stream: bool = False, max_wait: float = 30.0):
+        self.llm_manager = llm_manager
+        # Recorded frames have no action history
+        self.prompt_builder = prompt_builder or PromptBuilder(llm_manager.config.PROMPT_TOKEN_BUDGET, history_size=0)
+        self.system_prompt = self.prompt_builder.system_prompt
+        self.workers = workers
+        self.tolerance = tolerance
+        self.stream = stream
+        self.max_wait = max_wait
+        self.usage_tracker = UsageTracker(llm_manager.config.MODEL_PRICING)
+        self._lock = threading.Lock()
+
+    def run(self, cases: List[EvalCase], targets: Optional[List[Target]] = None) -> List[Dict[str, Any]]:
+        """
+        Evaluate targets on the cases
+
+        Args:
+            cases: Recorded cases
+            targets: Provider/model pairs, defaults to all configured ones
+
+        Returns:
+            One result dict per target, best accuracy first, then lowest p90 latency
+        """
+        targets = targets or self.llm_manager.get_available_targets()
+        providers = {}
+        for target in targets:
+            try:
+                providers[target] = self.llm_manager.create_target_provider(target, self.usage_tracker)
+            except Exception as e:
+                logger.error(f"Skipping {target[0]}/{target[1]}: {e}")
+
+        results = {target: TargetResult(target) for target in providers}
+        # Built up front: the builder is not shared across worker threads
+        prompts = {case.name: self.prompt_builder.build(case.prompt).text for case in cases}
+        logger.info(f"Evaluating {len(providers)} targets on {len(cases)} cases with {self.workers} workers")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {
+                pool.submit(self._evaluate_case, providers[target], results[target], case, prompts[case.name]):
+                    (target, case)
+                for case in cases for target in providers
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    target, case = futures[future]
+                    logger.error(f"Evaluation of {case.name} on {target[0]}/{target[1]} crashed: {e}")
+                    with self._lock:
+                        results[target].cases += 1
+                        results[target].errors += 1
+                        results[target].failures.append(case.name)
+
+        models = self.usage_tracker.get_stats()['models']
+        report = [
+            result.as_dict(models.get(f"{target[0]}/{target[1]}"))
+            for target, result in results.items()
+        ]
+        report.sort(key=lambda r: (-r['accuracy'], r['latency']['p90'] if r['latency']['p90'] is not None else math.inf))
+        return report
+
+    def _evaluate_case(self, provider, result: TargetResult, case: EvalCase, prompt: str):
+        """Send one case to one target and score the answer"""
+        label = f"{result.target[0]}/{result.target[1]}"
+        deadline = time.time() + self.max_wait
+        while True:
+            start_time = time.time()
+            try:
+                if self.stream:
+                    response = provider.send_streaming_request(prompt, case.image_b64, self.system_prompt)
+                else:
+                    response = provider.send_request(prompt, case.image_b64, self.system_prompt)
+                break
+            except RateLimitError as e:
+                wait = e.retry_after or 1.0
+                if time.time() + wait > deadline:
+                    logger.warning(f"{label} rate limited on {case.name} for {wait:.1f}s, skipping case")
+                    with self._lock:
+                        result.cases += 1
+                        result.rate_limited += 1
+                    return
+                time.sleep(wait)
+            except Exception as e:
+                logger.warning(f"{label} failed on {case.name}: {e}")
+                with self._lock:
+                    result.cases += 1
+                    result.errors += 1
+                return
+        latency = time.time() - start_time
+
+        try:
+            action_data = RobustJSONParser.parse_llm_response(response)
+            valid = action_data is not None and RobustJSONParser.validate_action_data(action_data)
+        except Exception:
+            valid = False
+        tolerance = case.tolerance if case.tolerance is not None else self.tolerance
+        correct = valid and any(action_matches(action_data, expected, tolerance) for expected in case.expected)
+
+        with self._lock:
+            result.cases += 1
+            result.latencies.append(latency)
+            if not valid:
+                result.parse_failures += 1
+            if correct:
+                result.correct += 1
+            else:
+                result.failures.append(case.name)
+        logger.debug(f"{label} on {case.name}: {'correct' if correct else 'wrong'} in {latency:.2f}s")
+
+def format_report(report: List[Dict[str, Any]]) -> str:
+    """Render evaluation results as a plain-text table"""
+    def seconds(value: Optional[float]) -> str:
+        return f"{value:.2f}s" if value is not None else '-'
+
+    header = f"{'Target':<55} {'Acc':>6} {'Parse':>5} {'Err':>4} {'p50':>7} {'p90':>7} {'p99':>7} {'Tok/case':>9} {'Cost':>9}"
+    lines = [header, '-' * len(header)]
+    for r in report:
+        lines.append(
+            f"{r['target']:<55} {r['accuracy']:>6.1%} {r['parse_failures']:>5} {r['errors'] + r['rate_limited']:>4} "
+            f"{seconds(r['latency']['p50']):>7} {seconds(r['latency']['p90']):>7} {seconds(r['latency']['p99']):>7} "
+            f"{r['tokens_per_case']:>9.0f} {'$' + format(r['cost'], '.4f'):>9}"
+        )
+    return '\n'.join(lines)
@@ -17,22 +17,50 @@ class APIError(LLMAutomationError):
 
 class RateLimitError(APIError):
     """Raised when API rate limit is exceeded"""
-    def __init__(self, message: str, provider: str = None, retry_after: int = None):
-        super().__init__(message, provider)
+    def __init__(self, message: str, provider: str = None, retry_after: float = None):
+        super().__init__(message, provider, status_code=429)
         self.retry_after = retry_after
 
 class AuthenticationError(APIError):
     """Raised when API authentication fails"""
     pass
 
+class KeyRetiredError(AuthenticationError):
+    """Raised when an API key was rejected and retired while the provider has other keys left"""
+    pass
+
+class ServerError(APIError):
+    """Raised when the API fails on its side (5xx or an error event in a stream)"""
+    pass
+
+class InvalidRequestError(APIError):
+    """Raised when the API rejects the request itself (4xx other than auth and rate limits)"""
+    pass
+
+class NetworkError(APIError):
+    """Raised when the API cannot be reached or the connection breaks"""
+    pass
+
 class InvalidResponseError(APIError):
     """Raised when API returns invalid response"""
     pass
 
+class TruncatedResponseError(InvalidResponseError):
+    """Raised when the model stopped at its output token limit before completing an action"""
+    def __init__(self, message: str, provider: str = None, finish_reason: str = None):
+        super().__init__(message, provider)
+        self.finish_reason = finish_reason
+
 class TimeoutError(APIError):
     """Raised when API request times out"""
     pass
 
+class DeadlineExceededError(LLMAutomationError):
+    """Raised when the time budget of an iteration is used up before a response arrived"""
+    def __init__(self, message: str, budget: float = None):
+        super().__init__(message)
+        self.budget = budget
+
 class JSONParsingError(LLMAutomationError):
     """Raised when JSON parsing fails"""
     def __init__(self, message: str, raw_response: str = None):
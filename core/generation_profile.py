@@ -0,0 +1,88 @@
+import logging
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    """
+    Output budget settings for one model
+
+    Attributes:
+        max_tokens: Output token cap (max_tokens / maxOutputTokens)
+        stop_sequences: Stop generating once the action object is closed
+        thinking_budget: Gemini thinkingConfig.thinkingBudget (None = model default)
+        reasoning_effort: OpenRouter reasoning effort ('low', 'medium', 'high')
+    """
+    max_tokens: int = 500
+    stop_sequences: Tuple[str, ...] = ()
+    thinking_budget: Optional[int] = None
+    reasoning_effort: Optional[str] = None
+
+    def expanded(self, factor: float = 2.0, max_tokens_limit: int = 4096) -> 'GenerationProfile':
+        """
+        Profile for retrying a truncated response
+
+        Raises the output cap and shifts budget away from thinking, which is
+        what usually exhausts the limit on thinking models.
+        """
+        thinking_budget = self.thinking_budget // 2 if self.thinking_budget else self.thinking_budget
+        return replace(
+            self,
+            max_tokens=min(int(self.max_tokens * factor), max_tokens_limit),
+            thinking_budget=thinking_budget,
+            reasoning_effort='low' if self.reasoning_effort else None
+        )
+
+    @staticmethod
+    def restore_stop_sequence(text: str) -> str:
+        """
+        Re-append the closing brace swallowed by a stop sequence
+
+        Stop sequences such as '}\\n\\n' end generation after the action object,
+        but the API strips the matched sequence including the brace.
+        """
+        stripped = text.rstrip()
+        if stripped and not stripped.endswith('}') and stripped.count('{') == stripped.count('}') + 1:
+            return stripped + '}'
+        return text
+
+class GenerationProfiles:
+    """
+    Resolves the generation profile of a model
+
+    Overrides are keyed by model name or model name prefix; the longest
+    matching key wins, so 'gemini-2.5' covers every Gemini 2.5 model.
+    """
+
+    def __init__(self, default: GenerationProfile, overrides: Optional[Mapping[str, Mapping[str, Any]]] = None,
+                 retry_factor: float = 2.0, max_tokens_limit: int = 4096):
+        self.default = default
+        self.retry_factor = retry_factor
+        self.max_tokens_limit = max_tokens_limit
+        self._profiles: Dict[str, GenerationProfile] = {}
+        for model, settings in (overrides or {}).items():
+            settings = dict(settings)
+            if 'stop_sequences' in settings:
+                settings['stop_sequences'] = tuple(settings['stop_sequences'])
+            self._profiles[model] = replace(default, **settings)
+
+    @classmethod
+    def from_config(cls, config) -> 'GenerationProfiles':
+        default = GenerationProfile(
+            max_tokens=config.MAX_TOKENS,
+            stop_sequences=tuple(config.STOP_SEQUENCES)
+        )
+        return cls(default, config.GENERATION_PROFILES, config.TRUNCATION_RETRY_FACTOR, config.MAX_TOKENS_LIMIT)
+
+    def get(self, model: str) -> GenerationProfile:
+        """Get the profile for a model"""
+        matches = [key for key in self._profiles if model.startswith(key)]
+        if not matches:
+            return self.default
+        return self._profiles[max(matches, key=len)]
+
+    def expanded(self, profile: GenerationProfile) -> GenerationProfile:
+        """Get the retry profile for a truncated response"""
+        return profile.expanded(self.retry_factor, self.max_tokens_limit)
@@ -0,0 +1,78 @@
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, Optional
+
+from core.provider_router import Target
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ProbeResult:
+    """Outcome of one warm-up probe"""
+    available: bool
+    latency: Optional[float] = None
+    probed_at: float = 0.0
+    error: Optional[str] = None
+
+class LatencyProfile:
+    """
+    Warm-up probe results per provider/model pair, persisted as JSON
+
+    Entries older than ttl seconds are ignored on load, so a restart within
+    the ttl reuses the last measurement instead of probing again.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(target: Target) -> str:
+        return f"{target[0]}:{target[1]}"
+
+    def load(self) -> Dict[Target, ProbeResult]:
+        """Load all entries that are still fresh"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Failed to load latency profile {self.path}: {e}")
+            return {}
+
+        now = time.time()
+        results = {}
+        for key, entry in data.get('targets', {}).items():
+            try:
+                result = ProbeResult(**entry)
+            except TypeError:
+                continue
+            if now - result.probed_at < self.ttl:
+                provider_name, model = key.split(':', 1)
+                results[(provider_name, model)] = result
+        logger.debug(f"Loaded {len(results)} fresh entries from latency profile {self.path}")
+        return results
+
+    def save(self, results: Dict[Target, ProbeResult], targets: Optional[Iterable[Target]] = None):
+        """
+        Persist probe results, keeping fresh entries of other targets
+
+        Args:
+            results: Results to store
+            targets: Configured targets; entries of other targets are dropped
+        """
+        merged = {self._key(target): asdict(result) for target, result in self.load().items()}
+        merged.update({self._key(target): asdict(result) for target, result in results.items()})
+        if targets is not None:
+            keep = {self._key(target) for target in targets}
+            merged = {key: entry for key, entry in merged.items() if key in keep}
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({'targets': merged}, f, indent=2)
+        except OSError as e:
+            logger.warning(f"Failed to save latency profile {self.path}: {e}")
+            return
+        logger.debug(f"Saved {len(merged)} entries to latency profile {self.path}")
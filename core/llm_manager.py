@@ -1,12 +1,49 @@
+import json
 import logging
 import time
-from typing import Dict, List, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from typing import Dict, List, Optional, Any, Sequence, Tuple
 from providers.base_provider import BaseLLMProvider
-from providers.openrouter_provider import OpenRouterProvider, RateLimitError, APIError
-from providers.google_provider import GoogleProvider
+from providers.registry import ProviderRegistry
+from core.api_key_pool import ApiKeyPool
+from core.conversation import ConversationTurn
+from core.deadline import Deadline
+from core.exceptions import (
+    RateLimitError, ProviderUnavailableError, TruncatedResponseError, TimeoutError, DeadlineExceededError,
+    KeyRetiredError
+)
+from core.generation_profile import GenerationProfile, GenerationProfiles
+from core.latency_profile import LatencyProfile, ProbeResult
+from core.model_cascade import ModelCascade
+from core.provider_router import ProviderRouter, Target
+from core.quota_ledger import SharedQuotaLedger
+from core.rate_limiter import RateLimiter
+from core.response_cache import ResponseCache
+from core.retry_policy import RetryPolicy
+from core.single_flight import SingleFlight
+from core.usage_tracker import UsageTracker
+from utils.json_parser import RobustJSONParser, build_action_schema
 
 logger = logging.getLogger(__name__)
 
+# Warm-up probe: 1x1 PNG and a prompt with a minimal answer
+WARMUP_IMAGE_B64 = 'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII='
+WARMUP_PROMPT = 'Antworte nur mit {"action": "wait", "seconds": 0}'
+WARMUP_MAX_TOKENS = 32
+
+# Text-only repair of responses that did not parse into a valid action
+REPAIR_PROMPT = (
+    "Die folgende Antwort sollte genau eine Aktion als JSON-Objekt enthalten, konnte aber nicht "
+    "verarbeitet werden ({error}). Gib nur das korrigierte JSON-Objekt zurück, das dem Schema "
+    "entspricht und die Absicht der Antwort beibehält, ohne Erklärung.\n\n"
+    "Schema: {schema}\n\nAntwort:\n{response}"
+)
+REPAIR_MAX_RESPONSE_CHARS = 4000
+
+# Prepended to a follow-up sent without a screenshot
+FOLLOW_UP_PREFIX = "Der Bildschirm ist unverändert, siehe den vorherigen Screenshot.\n\n"
+
 class LLMManager:
     """
     Central manager for all LLM providers with intelligent fallback
@@ -14,128 +51,644 @@ class LLMManager:
     
     def __init__(self, config):
         self.config = config
+        self.registry = ProviderRegistry()
+        self.provider_configs: Dict[str, Dict[str, Any]] = {}
         self.providers: Dict[str, BaseLLMProvider] = {}
         self.current_provider = None
         self.fallback_order = ['openrouter', 'google']
         self.total_requests = 0
         self.successful_requests = 0
         self.provider_switches = 0
+        self.response_cache: Optional[ResponseCache] = None
+        self.single_flight: Optional[SingleFlight] = None
+        if self.config.ENABLE_SINGLE_FLIGHT:
+            self.single_flight = SingleFlight(self.config.SINGLE_FLIGHT_PATH, self.config.SINGLE_FLIGHT_LEASE_TTL)
+        if self.config.ENABLE_SHARED_QUOTA:
+            self.rate_limiter = SharedQuotaLedger(self.config.QUOTA_LEDGER_PATH, self.config.MODEL_RATE_LIMITS)
+        else:
+            self.rate_limiter = RateLimiter(self.config.MODEL_RATE_LIMITS)
+        # Shared by all instances of a provider, so rotation and retired keys are too
+        self.key_pools: Dict[str, ApiKeyPool] = {}
+        self.router = ProviderRouter(
+            alpha=self.config.ROUTER_EWMA_ALPHA,
+            failure_threshold=self.config.CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=self.config.CIRCUIT_RESET_TIMEOUT,
+            timeout_factor=self.config.ADAPTIVE_TIMEOUT_FACTOR,
+            timeout_min_samples=self.config.ADAPTIVE_TIMEOUT_MIN_SAMPLES,
+            min_timeout=self.config.MIN_REQUEST_TIMEOUT
+        )
+        self.retry_policy = RetryPolicy(
+            self.config.RETRY_POLICY,
+            base_delay=self.config.RETRY_DELAY,
+            max_delay=self.config.RETRY_MAX_DELAY,
+            budget=self.config.RETRY_BUDGET
+        )
+        self.generation_profiles = GenerationProfiles.from_config(self.config)
+        self.usage_tracker = UsageTracker(self.config.MODEL_PRICING)
+        # Warm-up probes are not part of the session's traffic
+        self.warmup_usage = UsageTracker(self.config.MODEL_PRICING)
+        self.truncation_retries = 0
+        self.timeouts = 0
+        self.deadline_exceeded = 0
+        self.retries = 0
+        self.errors_by_class: Dict[str, int] = {}
+        self.repair_attempts = 0
+        self.repair_successes = 0
+        self.repair_latency = 0.0
+        # Repairs use their own provider instances and are kept out of the
+        # routing statistics and the session's usage
+        self.repair_usage = UsageTracker(self.config.MODEL_PRICING)
+        self.repair_providers: Dict[Target, BaseLLMProvider] = {}
+        self.follow_up_requests = 0
+        # Last request with a screenshot, the base of follow-ups
+        self.last_turn: Optional[ConversationTurn] = None
+        self.last_target: Optional[Target] = None
+        self.last_tier: Optional[str] = None
+        self.cascade: Optional[ModelCascade] = None
         
         self._initialize_providers()
+        
+        if self.config.ENABLE_RESPONSE_CACHE:
+            self.response_cache = ResponseCache(
+                path=self.config.RESPONSE_CACHE_PATH,
+                ttl=self.config.CACHE_TTL,
+                max_entries=self.config.RESPONSE_CACHE_MAX_ENTRIES
+            )
+        
+        if self.config.ENABLE_MODEL_CASCADE:
+            self.cascade = ModelCascade(ModelCascade.parse_targets(self.config.CASCADE_CHEAP_MODELS))
     
     def _initialize_providers(self):
-        """Initialize available providers based on configuration"""
-        # Initialize OpenRouter if API key is available
-        if self.config.OPENROUTER_API_KEY:
-            try:
-                self.providers['openrouter'] = OpenRouterProvider(
-                    api_key=self.config.OPENROUTER_API_KEY,
-                    models=self.config.OPENROUTER_MODELS,
-                    api_url=self.config.OPENROUTER_API_URL
-                )
-                logger.info(f"OpenRouter provider initialized with {len(self.config.OPENROUTER_MODELS)} models")
-            except Exception as e:
-                logger.error(f"Failed to initialize OpenRouter provider: {e}")
+        """
+        Collect the configured providers from the registry
         
-        # Initialize Google if API key is available
-        if self.config.GOOGLE_API_KEY:
+        Provider modules are only imported once a request is routed to them.
+        """
+        for name in self.registry.names():
             try:
-                self.providers['google'] = GoogleProvider(
-                    api_key=self.config.GOOGLE_API_KEY,
-                    models=self.config.GOOGLE_MODELS,
-                    api_url_template=self.config.GOOGLE_API_URL
-                )
-                logger.info(f"Google provider initialized with {len(self.config.GOOGLE_MODELS)} models")
+                kwargs = self.registry.get_spec(name).configure(self.config)
             except Exception as e:
-                logger.error(f"Failed to initialize Google provider: {e}")
+                logger.error(f"Failed to configure {name} provider: {e}")
+                continue
+            if kwargs:
+                self.provider_configs[name] = kwargs
+                logger.info(f"{name} provider configured with {len(kwargs['models'])} models")
         
-        if not self.providers:
+        if not self.provider_configs:
             raise ValueError("No LLM providers could be initialized. Check your API keys.")
         
         # Set initial provider based on DEFAULT_MODEL or first available
         self._set_initial_provider()
     
+    def _get_provider(self, name: str) -> BaseLLMProvider:
+        """
+        Get a provider instance, importing and creating it on first use
+        
+        Raises:
+            ProviderUnavailableError: If the provider cannot be created
+        """
+        provider = self.providers.get(name)
+        if provider is not None:
+            return provider
+        
+        if name not in self.provider_configs:
+            raise ProviderUnavailableError(f"Provider {name} is not configured")
+        
+        try:
+            provider = self.registry.create(name, **self.provider_configs[name])
+        except Exception as e:
+            logger.error(f"Failed to initialize {name} provider: {e}")
+            del self.provider_configs[name]
+            if self.current_provider == name and self.provider_configs:
+                self.current_provider = next(iter(self.provider_configs))
+            raise ProviderUnavailableError(f"Failed to initialize {name} provider: {e}")
+        
+        provider.rate_limiter = self.rate_limiter
+        provider.key_pool = self.key_pools.setdefault(name, provider.key_pool)
+        provider.generation_profiles = self.generation_profiles
+        provider.usage_tracker = self.usage_tracker
+        provider.request_timeout = self.config.REQUEST_TIMEOUT
+        self.providers[name] = provider
+        logger.info(f"{name} provider initialized with {len(provider.models)} models")
+        return provider
+    
+    def create_target_provider(self, target: Target, usage_tracker: Optional[UsageTracker] = None) -> BaseLLMProvider:
+        """
+        Create a separate provider instance serving only one model
+        
+        Used where several models of a provider are queried concurrently.
+        The instance shares the rate limiter, API key pool and generation
+        profiles.
+        
+        Args:
+            target: Provider/model pair
+            usage_tracker: Tracker for the instance's usage, defaults to the manager's
+        """
+        provider_name, model = target
+        if provider_name not in self.provider_configs:
+            raise ProviderUnavailableError(f"Provider {provider_name} is not configured")
+        provider = self.registry.create(provider_name, **dict(self.provider_configs[provider_name], models=[model]))
+        provider.rate_limiter = self.rate_limiter
+        provider.key_pool = self.key_pools.setdefault(provider_name, provider.key_pool)
+        provider.generation_profiles = self.generation_profiles
+        provider.usage_tracker = usage_tracker or self.usage_tracker
+        provider.request_timeout = self.config.REQUEST_TIMEOUT
+        return provider
+    
     def _set_initial_provider(self):
         """Set the initial provider based on configuration"""
         default_model = self.config.DEFAULT_MODEL.lower()
         
         # Try to match provider based on default model
-        if 'gemini' in default_model and 'google' in self.providers:
+        if 'gemini' in default_model and 'google' in self.provider_configs:
             self.current_provider = 'google'
-        elif ('openrouter' in default_model or 'llama' in default_model or 'qwen' in default_model) and 'openrouter' in self.providers:
+        elif ('openrouter' in default_model or 'llama' in default_model or 'qwen' in default_model) and 'openrouter' in self.provider_configs:
             self.current_provider = 'openrouter'
         else:
             # Use first available provider
-            self.current_provider = next(iter(self.providers.keys()))
+            self.current_provider = next(iter(self.provider_configs.keys()))
         
         logger.info(f"Initial provider set to: {self.current_provider}")
     
-    def send_request(self, prompt: str, image_b64: str, max_retries: int = 3) -> str:
+    def send_request(self, prompt: str, image_b64: Optional[str], max_retries: Optional[int] = None,
+                     stream: Optional[bool] = None, frame_hash: Optional[str] = None,
+                     system_prompt: Optional[str] = None, escalate: bool = False,
+                     deadline: Optional[Deadline] = None, follow_up: bool = False) -> str:
         """
         Send request with intelligent fallback between providers
         
+        Failed attempts are classified by the retry policy: retryable errors
+        are retried on the same model after a jittered backoff, all others
+        move on to the next target.
+        
         Args:
             prompt: Text prompt for the LLM
-            image_b64: Base64 encoded screenshot
-            max_retries: Maximum number of retry attempts per provider
+            image_b64: Base64 encoded screenshot, None for a text-only request
+            max_retries: Maximum number of attempts per provider (defaults
+                to Config.MAX_RETRIES)
+            stream: Stream the response and return as soon as the action is
+                complete (defaults to Config.ENABLE_STREAMING)
+            frame_hash: Hash of the screenshot; enables the response cache
+            system_prompt: Static session instructions, sent as system message
+            escalate: Skip the cheap cascade tier and ask the strong models
+            deadline: Time budget shared by all attempts; each attempt's
+                timeout is capped by what is left of it
+            follow_up: Allow a follow-up turn: if the screenshot is the one
+                the model received last, providers for which a follow-up is
+                cheaper (supports_follow_up) get the prompt as a follow-up to
+                that turn instead of the screenshot again
             
         Returns:
             Raw response string from LLM
+            
+        Raises:
+            DeadlineExceededError: If the budget ran out before any target answered
+            RateLimitError: If every target is cooling down
+            ProviderUnavailableError: If every target failed
         """
+        if stream is None:
+            stream = self.config.ENABLE_STREAMING
+        if max_retries is None:
+            max_retries = self.config.MAX_RETRIES
+        deadline = deadline or Deadline()
+        history = ()
+        if follow_up and self.last_turn is not None and self.last_turn.image_b64 == image_b64:
+            history = (self.last_turn,)
+        
+        if self.single_flight is None or frame_hash is None:
+            response = self._send_request(prompt, image_b64, max_retries, stream, frame_hash, system_prompt,
+                                          escalate, deadline, history)
+        else:
+            # Identical requests (same screen, prompt and preferred model) in
+            # flight at the same time, in any process, share one call
+            cache_prompt = f"{system_prompt}\n{prompt}" if system_prompt else prompt
+            key = self._cache_key(frame_hash, f"{int(escalate)}\n{cache_prompt}", self.current_provider)
+            response = self.single_flight.do(
+                key,
+                lambda: self._send_request(prompt, image_b64, max_retries, stream, frame_hash, system_prompt,
+                                           escalate, deadline, history),
+                timeout=deadline.remaining() if deadline.budget else None
+            )
+        
+        return response
+    
+    def _send_request(self, prompt: str, image_b64: Optional[str], max_retries: int, stream: bool,
+                      frame_hash: Optional[str], system_prompt: Optional[str], escalate: bool,
+                      deadline: Deadline, history: Sequence[ConversationTurn] = ()) -> str:
+        """Send one request through the cache, routing and retry policy (see send_request)"""
+        use_cache = self.response_cache is not None and frame_hash is not None
+        cache_prompt = f"{system_prompt}\n{prompt}" if system_prompt else prompt
+        if use_cache:
+            cached = self.response_cache.get(self._cache_key(frame_hash, cache_prompt, self.current_provider))
+            if cached is not None:
+                logger.info(f"Using cached response for {self.current_provider}")
+                self.last_target = None
+                self.last_tier = None
+                return cached
+        
         self.total_requests += 1
         last_error = None
+        rate_limit_waits = []
+        attempts: Dict[str, int] = {}
+        key_rotations: Dict[str, int] = {}
+        skipped_providers = set()
+        backoff_spent = 0.0
         
-        # Try current provider first
-        for provider_name in [self.current_provider] + [p for p in self.fallback_order if p != self.current_provider]:
-            if provider_name not in self.providers:
-                continue
-                
-            provider = self.providers[provider_name]
-            
-            for attempt in range(max_retries):
+        tiers = [(tier, self.router.rank(targets)) for tier, targets in self._get_tiers(escalate)]
+        if not any(targets for _, targets in tiers):
+            raise ProviderUnavailableError("All LLM targets have open circuit breakers")
+        
+        out_of_time = False
+        for tier, targets in tiers:
+            for provider_name, model in targets:
+                # Not worth starting an attempt that cannot finish in time
+                if deadline.remaining() < self.config.MIN_REQUEST_TIMEOUT:
+                    out_of_time = True
+                    break
+                if provider_name in skipped_providers or attempts.get(provider_name, 0) >= max_retries:
+                    continue
                 try:
-                    logger.info(f"Attempting request with {provider_name} (attempt {attempt + 1}/{max_retries})")
-                    response = provider.send_request(prompt, image_b64)
-                    
-                    # Success - update current provider if it changed
-                    if self.current_provider != provider_name:
-                        logger.info(f"Switching primary provider from {self.current_provider} to {provider_name}")
-                        self.current_provider = provider_name
-                        self.provider_switches += 1
-                    
-                    self.successful_requests += 1
-                    return response
-                    
-                except RateLimitError:
-                    logger.warning(f"Rate limit hit on {provider_name}, attempt {attempt + 1}")
-                    if provider.handle_rate_limit():
-                        continue  # Try again with same provider
-                    else:
-                        break  # Move to next provider
-                        
-                except APIError as e:
-                    logger.error(f"API error on {provider_name}: {e}")
+                    provider = self._get_provider(provider_name)
+                except ProviderUnavailableError as e:
                     last_error = e
-                    if attempt < max_retries - 1:
-                        backoff_time = provider._implement_backoff(attempt + 1)
-                        logger.info(f"Retrying {provider_name} after {backoff_time}s backoff")
-                        time.sleep(backoff_time)
-                    break  # Move to next provider after max retries
+                    continue
+                
+                # Route around cooling models instead of waiting for them
+                wait = provider.model_wait_time(model)
+                if wait > 0:
+                    logger.debug(f"Skipping {provider_name}/{model}: rate limited for {wait:.1f}s")
+                    rate_limit_waits.append(wait)
+                    continue
+                
+                provider.select_model(model)
+                target = (provider_name, model)
+                tier_info = f" [{tier} tier]" if tier else ""
+                
+                # A follow-up only pays off where the earlier screenshot is
+                # not billed again in full; others get the screenshot again
+                if (history and 'multi_turn' in self.registry.get_spec(provider_name).capabilities
+                        and provider.supports_follow_up()):
+                    request = (FOLLOW_UP_PREFIX + prompt, None, history)
+                    tier_info += " [follow-up]"
+                else:
+                    request = (prompt, image_b64, ())
+                target_attempt = 0
+                
+                while attempts.get(provider_name, 0) < max_retries:
+                    attempts[provider_name] = attempts.get(provider_name, 0) + 1
+                    target_attempt += 1
+                    timeout = deadline.cap(self.router.get_timeout(target, self.config.REQUEST_TIMEOUT))
                     
-                except Exception as e:
-                    logger.error(f"Unexpected error on {provider_name}: {e}")
-                    last_error = e
-                    break  # Move to next provider
+                    try:
+                        logger.info(f"Attempting request with {provider_name}/{model}{tier_info} "
+                                    f"(attempt {attempts[provider_name]}/{max_retries}, timeout {timeout:.1f}s)")
+                        start_time = time.time()
+                        try:
+                            response = self._send_to_provider(provider, *request, system_prompt, stream,
+                                                              timeout=timeout)
+                        except TruncatedResponseError as e:
+                            # Retry once on the same model with a larger output budget
+                            profile = self.generation_profiles.expanded(provider.get_generation_profile())
+                            logger.warning(f"Response from {provider_name}/{model} truncated ({e.finish_reason}), "
+                                           f"retrying with max_tokens={profile.max_tokens}")
+                            self.truncation_retries += 1
+                            response = self._send_to_provider(provider, *request, system_prompt, stream,
+                                                              profile, timeout)
+                        latency = time.time() - start_time
+                        self.router.record_success(target, latency)
+                        if self.cascade is not None:
+                            self.cascade.record_response(tier, latency)
+                        
+                        # Success - update current provider if it changed
+                        if self.current_provider != provider_name:
+                            logger.info(f"Switching primary provider from {self.current_provider} to {provider_name}")
+                            self.current_provider = provider_name
+                            self.provider_switches += 1
+                        
+                        self.last_target = target
+                        self.last_tier = tier
+                        self.successful_requests += 1
+                        if request[2]:
+                            self.follow_up_requests += 1
+                        if image_b64 is not None and not request[2]:
+                            # The turn that carried the frame; follow-ups keep
+                            # referring to it, so their cached prefix stays the same
+                            self.last_turn = ConversationTurn(prompt, image_b64, response)
+                        if use_cache:
+                            self._store_cached_response(frame_hash, cache_prompt, provider_name, response)
+                        return response
+                        
+                    except RateLimitError as e:
+                        logger.warning(f"Rate limit hit on {provider_name}/{model}")
+                        rate_limit_waits.append(provider.model_wait_time(model))
+                        last_error = last_error or e
+                        break
+                        
+                    except KeyRetiredError as e:
+                        # The pool retired the key; the model is fine, so repeat
+                        # with the next key without counting an attempt. Once no
+                        # key is left the provider raises AuthenticationError.
+                        logger.warning(f"{provider_name}/{model}: {e}, retrying with the next API key")
+                        self.errors_by_class['key_retired'] = self.errors_by_class.get('key_retired', 0) + 1
+                        key_rotations[provider_name] = key_rotations.get(provider_name, 0) + 1
+                        if key_rotations[provider_name] <= len(provider.key_pool):
+                            attempts[provider_name] -= 1
+                            target_attempt -= 1
+                        last_error = e
+                        
+                    except Exception as e:
+                        error_class = self.retry_policy.classify(e)
+                        rule = self.retry_policy.get_rule(provider_name, error_class)
+                        self.errors_by_class[error_class] = self.errors_by_class.get(error_class, 0) + 1
+                        if isinstance(e, TimeoutError):
+                            self.router.record_timeout(target, timeout)
+                            self.timeouts += 1
+                        else:
+                            logger.error(f"Request to {provider_name}/{model} failed ({error_class}): {e}")
+                            self.router.record_failure(target)
+                        last_error = e
+                        
+                        if rule.skip_provider:
+                            skipped_providers.add(provider_name)
+                            break
+                        delay = self.retry_policy.backoff(target_attempt) if rule.backoff else 0.0
+                        if not (rule.retryable and target_attempt < rule.max_attempts
+                                and backoff_spent + delay <= self.retry_policy.budget
+                                and deadline.remaining() - delay >= self.config.MIN_REQUEST_TIMEOUT):
+                            break
+                        logger.info(f"Retrying {provider_name}/{model} in {delay:.2f}s after {error_class}")
+                        backoff_spent += delay
+                        self.retries += 1
+                        time.sleep(delay)
+            if out_of_time:
+                break
+        
+        if out_of_time:
+            self.deadline_exceeded += 1
+            logger.error(f"Iteration deadline of {deadline.budget:.1f}s exceeded, last error: {last_error}")
+            raise DeadlineExceededError(f"No LLM response within {deadline.budget:.1f}s", deadline.budget)
+        
+        # Every target is cooling down: report when the first one is usable
+        # again instead of blocking here
+        if rate_limit_waits and (last_error is None or isinstance(last_error, RateLimitError)):
+            retry_after = min(rate_limit_waits)
+            logger.warning(f"All LLM providers are rate limited, next slot in {retry_after:.1f}s")
+            raise RateLimitError("All LLM providers are rate limited", retry_after=retry_after)
         
         # All providers failed
         error_msg = f"All LLM providers failed. Last error: {last_error}"
         logger.error(error_msg)
-        raise Exception(error_msg)
+        raise ProviderUnavailableError(error_msg) from last_error
+    
+    @staticmethod
+    def _send_to_provider(provider: BaseLLMProvider, prompt: str, image_b64: Optional[str],
+                          history: Sequence[ConversationTurn], system_prompt: Optional[str], stream: bool,
+                          profile: Optional[GenerationProfile] = None, timeout: Optional[float] = None) -> str:
+        """Send one request to the provider's current model"""
+        # Plugin providers without multi-turn support lack the argument
+        kwargs = {'history': history} if history else {}
+        if stream:
+            return provider.send_streaming_request(prompt, image_b64, system_prompt, profile, timeout, **kwargs)
+        return provider.send_request(prompt, image_b64, system_prompt, profile, timeout, **kwargs)
+    
+    def _get_targets(self) -> List[Target]:
+        """
+        List all provider/model pairs in configured preference order
+        
+        The current provider and its current model come first; the router
+        reorders them by measured health.
+        """
+        order = [self.current_provider] + [p for p in self.fallback_order if p != self.current_provider]
+        order += [p for p in self.provider_configs if p not in order]
+        
+        targets = []
+        for provider_name in order:
+            if provider_name not in self.provider_configs:
+                continue
+            # Providers that were not used yet are listed from their config
+            # without importing them
+            provider = self.providers.get(provider_name)
+            models = provider.models if provider else self.provider_configs[provider_name]['models']
+            current_model = provider.get_current_model() if provider else models[0]
+            targets.append((provider_name, current_model))
+            targets.extend((provider_name, model) for model in models if model != current_model)
+        return targets
+    
+    def get_available_targets(self) -> List[Target]:
+        """Get all configured provider/model pairs in preference order"""
+        return self._get_targets()
+    
+    def warm_up(self, force: bool = False) -> Dict[Target, ProbeResult]:
+        """
+        Probe every configured model once and seed the router with the results
+        
+        Probes run in parallel with a tiny request, which also opens the
+        providers' keep-alive connections. Results are persisted to the
+        latency profile; fresh entries from an earlier start are reused
+        instead of probing again. The fastest available model becomes the
+        current one, so the first iteration goes straight to it. Probes only
+        seed the router's ranking and are accounted in warmup_usage, not as
+        session traffic.
+        
+        Args:
+            force: Probe all models even if the profile has fresh entries
+            
+        Returns:
+            Probe result per target
+        """
+        profile = LatencyProfile(self.config.WARMUP_PROFILE_PATH, self.config.WARMUP_PROFILE_TTL)
+        targets = self._get_targets()
+        results = {} if force else {t: r for t, r in profile.load().items() if t in targets}
+        missing = [target for target in targets if target not in results]
+        
+        if missing:
+            logger.info(f"Probing {len(missing)} models ({len(results)} taken from the latency profile)")
+            # Created up front: _get_provider is not thread-safe, and the
+            # probes warm up the connection pools of these instances
+            shared = {}
+            for provider_name in dict.fromkeys(target[0] for target in missing):
+                try:
+                    shared[provider_name] = self._get_provider(provider_name)
+                except ProviderUnavailableError as e:
+                    logger.warning(f"Skipping warm-up of {provider_name}: {e}")
+            probed = {
+                target: ProbeResult(False, probed_at=time.time(), error='unavailable')
+                for target in missing if target[0] not in shared
+            }
+            probe_targets = [target for target in missing if target[0] in shared]
+            if probe_targets:
+                with ThreadPoolExecutor(max_workers=min(self.config.WARMUP_WORKERS, len(probe_targets))) as pool:
+                    futures = [pool.submit(self._probe_target, target, shared[target[0]]) for target in probe_targets]
+                    probed.update(zip(probe_targets, (future.result() for future in futures)))
+            # Rate limits say nothing about the model and are not persisted
+            profile.save({t: r for t, r in probed.items() if r.error != 'rate_limited'}, targets)
+            results.update(probed)
+        
+        for target, result in results.items():
+            self.router.seed(target, result.latency if result.available else None)
+            state = f"{result.latency:.2f}s" if result.available else f"unavailable ({result.error})"
+            logger.info(f"Warm-up {target[0]}/{target[1]}: {state}")
+        
+        available = sorted((r.latency, t) for t, r in results.items() if r.available)
+        if available:
+            provider_name, model = available[0][1]
+            self.current_provider = provider_name
+            self._get_provider(provider_name).select_model(model)
+            logger.info(f"Fastest model after warm-up: {provider_name}/{model} ({available[0][0]:.2f}s)")
+        else:
+            logger.warning("No model answered the warm-up probe")
+        return results
+    
+    def _probe_target(self, target: Target, shared: BaseLLMProvider) -> ProbeResult:
+        """Send the warm-up request to one model over the shared provider's connections"""
+        try:
+            provider = self.create_target_provider(target, self.warmup_usage)
+        except Exception as e:
+            return ProbeResult(False, probed_at=time.time(), error=type(e).__name__)
+        if hasattr(shared, 'session'):
+            provider.session = shared.session
+        profile = replace(provider.get_generation_profile(), max_tokens=WARMUP_MAX_TOKENS)
+        
+        start_time = time.time()
+        try:
+            provider.send_request(WARMUP_PROMPT, WARMUP_IMAGE_B64, profile=profile,
+                                  timeout=self.config.WARMUP_TIMEOUT)
+        except TruncatedResponseError:
+            # Answered, only hit the tiny output budget
+            pass
+        except RateLimitError:
+            return ProbeResult(False, probed_at=start_time, error='rate_limited')
+        except Exception as e:
+            return ProbeResult(False, probed_at=start_time, error=self.retry_policy.classify(e))
+        return ProbeResult(True, time.time() - start_time, start_time)
+    
+    def _get_tiers(self, escalate: bool = False) -> List[Tuple[Optional[str], List[Target]]]:
+        """
+        Group the targets into cascade tiers, tried in order
+        
+        Without a cascade all targets form a single unnamed tier.
+        """
+        targets = self._get_targets()
+        if self.cascade is None:
+            return [(None, targets)]
+        return self.cascade.split(targets, escalate)
+    
+    def report_parse_result(self, success: bool):
+        """
+        Report whether the last LLM response could be parsed into a valid action
+        
+        Feeds the parse-failure rate used for routing and the cascade hit rate.
+        """
+        if self.last_target is not None:
+            self.router.record_parse_result(self.last_target, success)
+        if not success and self.cascade is not None:
+            self.cascade.record_rejection(self.last_tier, 'parse_failure')
+    
+    def report_no_effect(self):
+        """
+        Report that the action from the last LLM response did not change the screen
+        """
+        if self.cascade is not None:
+            self.cascade.record_rejection(self.last_tier, 'no_effect')
+    
+    def repair_response(self, response: str, error: str,
+                        deadline: Optional[Deadline] = None) -> Optional[Dict[str, Any]]:
+        """
+        Ask a fast model to turn an unparseable response into a valid action
+        
+        Sends the broken response and the action schema as a text-only
+        request, which is much cheaper than a new iteration with a fresh
+        screenshot. Targets with a closed breaker are tried best first, the
+        cheap cascade tier before the strong one. The repair bypasses the
+        router, the cascade and last_target, so it neither skews their
+        statistics nor becomes the target of report_parse_result; its tokens
+        are counted in repair_usage.
+        
+        Args:
+            response: Raw response that failed to parse or validate
+            error: Why it was rejected
+            deadline: Iteration deadline; the repair never outlives it
+            
+        Returns:
+            The repaired action, or None if the repair failed
+        """
+        budget = self.config.REPAIR_TIMEOUT
+        if deadline is not None and deadline.budget:
+            budget = min(budget, deadline.remaining())
+        if budget < self.config.MIN_REQUEST_TIMEOUT:
+            logger.info("Not enough time left to repair the response")
+            return None
+        
+        prompt = REPAIR_PROMPT.format(
+            error=error,
+            schema=json.dumps(build_action_schema(), ensure_ascii=False, separators=(',', ':')),
+            response=response[:REPAIR_MAX_RESPONSE_CHARS]
+        )
+        self.repair_attempts += 1
+        start_time = time.time()
+        try:
+            repaired = self._send_repair(prompt, Deadline(budget))
+        finally:
+            self.repair_latency += time.time() - start_time
+        if repaired is None:
+            return None
+        
+        action_data = RobustJSONParser.parse_llm_response(repaired)
+        if action_data is None or not RobustJSONParser.validate_action_data(action_data):
+            logger.warning("Repaired response is still not a valid action")
+            return None
+        self.repair_successes += 1
+        if self.last_turn is not None and self.last_turn.response == response:
+            # Follow-ups continue from the action that was actually executed
+            self.last_turn = replace(self.last_turn, response=json.dumps(action_data, ensure_ascii=False))
+        logger.info(f"Repaired response into '{action_data['action']}' action "
+                    f"in {time.time() - start_time:.2f}s")
+        return action_data
+    
+    def _send_repair(self, prompt: str, deadline: Deadline) -> Optional[str]:
+        """Send a repair prompt to the first target that answers in time (see repair_response)"""
+        targets = [target for _, tier in self._get_tiers() for target in self.router.closed(tier)]
+        for target in targets:
+            if deadline.remaining() < self.config.MIN_REQUEST_TIMEOUT:
+                logger.warning("Response repair ran out of time")
+                return None
+            try:
+                provider = self._get_repair_provider(target)
+                return provider.send_request(prompt, None, timeout=deadline.remaining())
+            except Exception as e:
+                logger.warning(f"Response repair on {'/'.join(target)} failed: {e}")
+        logger.warning("Response repair failed on all targets")
+        return None
+    
+    def _get_repair_provider(self, target: Target) -> BaseLLMProvider:
+        """Provider instance for repairs on one model, reusing the main provider's connections"""
+        provider = self.repair_providers.get(target)
+        if provider is None:
+            provider = self.repair_providers[target] = self.create_target_provider(target, self.repair_usage)
+            shared = self._get_provider(target[0])
+            if hasattr(shared, 'session'):
+                provider.session = shared.session
+        return provider
+    
+    def _cache_key(self, frame_hash: str, prompt: str, provider_name: str) -> str:
+        """Build the response cache key for the provider's current model"""
+        model = f"{provider_name}:{self._get_provider(provider_name).get_current_model()}"
+        return ResponseCache.make_key(frame_hash, prompt, model)
+    
+    def _store_cached_response(self, frame_hash: str, prompt: str, provider_name: str, response: str):
+        """Cache a response, but only if it contains a valid action"""
+        action_data = RobustJSONParser.parse_llm_response(response)
+        if action_data is None or not RobustJSONParser.validate_action_data(action_data):
+            logger.debug("Not caching response without a valid action")
+            return
+        
+        model = self.providers[provider_name].get_current_model()
+        self.response_cache.put(self._cache_key(frame_hash, prompt, provider_name), response, model)
     
     def get_current_provider_info(self) -> Dict[str, Any]:
         """Get information about the current provider"""
-        if self.current_provider and self.current_provider in self.providers:
-            provider = self.providers[self.current_provider]
+        if self.current_provider and self.current_provider in self.provider_configs:
+            provider = self._get_provider(self.current_provider)
             return {
                 'name': self.current_provider,
                 'current_model': provider.get_current_model(),
@@ -151,13 +704,43 @@ class LLMManager:
             'successful_requests': self.successful_requests,
             'success_rate': self.successful_requests / max(self.total_requests, 1),
             'provider_switches': self.provider_switches,
+            'truncation_retries': self.truncation_retries,
+            'timeouts': self.timeouts,
+            'deadline_exceeded': self.deadline_exceeded,
+            'retries': self.retries,
+            'errors_by_class': dict(self.errors_by_class),
+            'follow_up_requests': self.follow_up_requests,
+            'repair': {
+                'attempts': self.repair_attempts,
+                'successes': self.repair_successes,
+                'success_rate': self.repair_successes / max(self.repair_attempts, 1),
+                'avg_latency': self.repair_latency / max(self.repair_attempts, 1),
+                'usage': self.repair_usage.get_stats()['session']
+            },
             'current_provider': self.current_provider,
+            'prompt_tokens': sum(p.prompt_tokens for p in self.providers.values()),
+            'cached_tokens': sum(p.cached_tokens for p in self.providers.values()),
             'providers': {}
         }
         
         for name, provider in self.providers.items():
             stats['providers'][name] = provider.get_stats()
         
+        stats['rate_limits'] = self.rate_limiter.get_stats()
+        stats['routing'] = self.router.get_stats()
+        stats['usage'] = self.usage_tracker.get_stats()
+        if self.warmup_usage.session.responses:
+            stats['warmup_usage'] = self.warmup_usage.get_stats()['session']
+        
+        if self.response_cache is not None:
+            stats['response_cache'] = self.response_cache.get_stats()
+        
+        if self.single_flight is not None:
+            stats['single_flight'] = self.single_flight.get_stats()
+        
+        if self.cascade is not None:
+            stats['cascade'] = self.cascade.get_stats()
+        
         return stats
     
     def switch_provider(self, provider_name: str) -> bool:
@@ -170,7 +753,7 @@ class LLMManager:
         Returns:
             True if switch was successful, False otherwise
         """
-        if provider_name in self.providers:
+        if provider_name in self.provider_configs:
             old_provider = self.current_provider
             self.current_provider = provider_name
             self.provider_switches += 1
@@ -182,4 +765,4 @@ class LLMManager:
     
     def get_available_providers(self) -> List[str]:
         """Get list of available provider names"""
-        return list(self.providers.keys())
\ No newline at end of file
+        return list(self.provider_configs.keys())
\ No newline at end of file
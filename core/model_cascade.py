@@ -0,0 +1,112 @@
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from core.provider_router import Target
+
+logger = logging.getLogger(__name__)
+
+class ModelCascade:
+    """
+    Cheap-first model cascade
+
+    Requests go to the cheap tier first and only escalate to the strong tier
+    when the caller reports that a cheap answer was not good enough (parse or
+    validation failure, or an action without visible effect).
+    """
+
+    CHEAP = 'cheap'
+    STRONG = 'strong'
+
+    def __init__(self, cheap_targets: Iterable[Target]):
+        self.cheap_targets = set(cheap_targets)
+        self.escalations: Dict[str, int] = {}
+        self._stats = {
+            tier: {'requests': 0, 'rejections': 0, 'total_latency': 0.0}
+            for tier in (self.CHEAP, self.STRONG)
+        }
+
+    @staticmethod
+    def parse_targets(specs: Iterable[str]) -> List[Target]:
+        """
+        Parse 'provider:model' strings from the configuration
+
+        Args:
+            specs: e.g. ['google:gemini-1.5-flash-8b']
+
+        Returns:
+            List of (provider, model) targets
+        """
+        targets = []
+        for spec in specs:
+            spec = spec.strip()
+            if not spec:
+                continue
+            provider, sep, model = spec.partition(':')
+            if not sep or not model:
+                logger.warning(f"Ignoring invalid cascade target '{spec}', expected provider:model")
+                continue
+            targets.append((provider, model))
+        return targets
+
+    def split(self, targets: List[Target], escalate: bool = False) -> List[Tuple[str, List[Target]]]:
+        """
+        Split routing targets into the tiers to try, in order
+
+        Args:
+            targets: All available targets in preference order
+            escalate: Skip the cheap tier
+
+        Returns:
+            List of (tier name, targets) pairs; empty tiers are omitted
+        """
+        cheap = [target for target in targets if target in self.cheap_targets]
+        strong = [target for target in targets if target not in self.cheap_targets]
+
+        if escalate:
+            return [(self.STRONG, strong)] if strong else [(self.CHEAP, cheap)]
+        return [(tier, tier_targets) for tier, tier_targets in ((self.CHEAP, cheap), (self.STRONG, strong))
+                if tier_targets]
+
+    def record_response(self, tier: str, latency: float):
+        """Record a response served by a tier"""
+        self._stats[tier]['requests'] += 1
+        self._stats[tier]['total_latency'] += latency
+
+    def record_rejection(self, tier: Optional[str], reason: str):
+        """
+        Record that a tier's response was not good enough
+
+        Args:
+            tier: Tier that produced the response
+            reason: 'parse_failure' or 'no_effect'
+        """
+        if tier is None:
+            return
+        self._stats[tier]['rejections'] += 1
+        if tier == self.CHEAP:
+            self.escalations[reason] = self.escalations.get(reason, 0) + 1
+            logger.info(f"Escalating to strong tier after cheap-tier {reason.replace('_', ' ')}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-tier hit rates and the estimated latency saved"""
+        tiers = {}
+        for tier, stats in self._stats.items():
+            requests = stats['requests']
+            tiers[tier] = {
+                'requests': requests,
+                'rejections': stats['rejections'],
+                'hit_rate': (requests - stats['rejections']) / max(requests, 1),
+                'avg_latency': stats['total_latency'] / requests if requests else None
+            }
+
+        cheap, strong = tiers[self.CHEAP], tiers[self.STRONG]
+        latency_saved = None
+        if cheap['avg_latency'] is not None and strong['avg_latency'] is not None:
+            cheap_hits = cheap['requests'] - cheap['rejections']
+            latency_saved = cheap_hits * (strong['avg_latency'] - cheap['avg_latency'])
+
+        return {
+            'tiers': tiers,
+            'escalations': dict(self.escalations),
+            'estimated_latency_saved': latency_saved
+        }
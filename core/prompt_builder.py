@@ -0,0 +1,168 @@
+import json
+import logging
+import math
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from utils.json_parser import ACTION_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Rough ratio for German prose mixed with JSON; real tokenizers vary by model
+CHARS_PER_TOKEN = 3.5
+
+SECTIONS = ('system', 'task', 'history', 'recovery')
+
+# Short notes per action in the grammar; actions without a note and with
+# the same fields share a line
+ACTION_HINTS = {
+    'key': 'z.B. enter, ctrl+c',
+    'scroll': 'clicks negativ = nach unten',
+    'next_prompt': 'bei Unsicherheit weitere Anweisung anfordern',
+    'complete': 'Aufgabe erledigt, optional message',
+    'error': 'bei Problemen',
+    'plan': 'Liste von Aktionen für vorhersehbare Abfolgen; "verify_change":true nach Schritten, '
+            'deren Wirkung sichtbar sein muss, sonst wird der Rest verworfen'
+}
+
+SYSTEM_RULES = (
+    "Du steuerst eine GUI anhand von Screenshots. Antworte nur mit einem gültigen JSON-Objekt "
+    "mit präzisen Pixel-Koordinaten, z.B. {\"action\":\"click\",\"x\":100,\"y\":200}."
+)
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+def build_action_grammar() -> str:
+    """
+    Build a compact one-line-per-action description from ACTION_FIELDS
+
+    Lines have the form 'action|action: field,field (note)'.
+    """
+    groups: Dict[Tuple[Tuple[str, ...], Optional[str]], List[str]] = {}
+    for action, fields in ACTION_FIELDS.items():
+        # Actions with a note get a line of their own
+        key = (tuple(fields), action) if action in ACTION_HINTS else (tuple(fields), None)
+        groups.setdefault(key, []).append(action)
+
+    lines = []
+    for (fields, noted_action), actions in groups.items():
+        line = '|'.join(actions)
+        if fields:
+            line += ': ' + ','.join(fields)
+        if noted_action:
+            line += f" ({ACTION_HINTS[noted_action]})"
+        lines.append(line)
+    return '\n'.join(lines)
+
+def build_system_prompt() -> str:
+    """Build the static system prompt: rules and action grammar"""
+    return f"{SYSTEM_RULES}\nAktionen (Pflichtfelder):\n{build_action_grammar()}"
+
+@dataclass
+class BuiltPrompt:
+    """User prompt of one request with its estimated tokens per section"""
+    text: str
+    tokens: Dict[str, int]
+    trimmed: bool = False
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.tokens.values())
+
+class PromptBuilder:
+    """
+    Assembles the prompts of a session within a token budget
+
+    The system prompt is a compact action grammar generated from
+    ACTION_FIELDS. The user prompt consists of the task, the last executed
+    actions (history) and, after a failed step, a short recovery note.
+    If the estimated total exceeds the budget, history entries are dropped
+    oldest first and the recovery note is shortened; the task is never cut.
+    """
+
+    def __init__(self, budget: int, history_size: int = 3):
+        self.budget = budget
+        self.system_prompt = build_system_prompt()
+        self.system_tokens = estimate_tokens(self.system_prompt)
+        self._history: Deque[str] = deque(maxlen=history_size)
+        self.prompts = 0
+        self.trimmed = 0
+        self.over_budget = 0
+        self._section_totals = dict.fromkeys(SECTIONS, 0)
+
+    def record_action(self, action_data: Dict[str, Any]):
+        """Remember an executed action for the history section"""
+        if self._history.maxlen:
+            self._history.append(json.dumps(action_data, ensure_ascii=False, separators=(',', ':')))
+
+    @staticmethod
+    def _assemble(task: str, history: List[str], hint: Optional[str], recovery: Optional[str]) -> Dict[str, str]:
+        parts = {'task': f"Aufgabe: {task}", 'history': '', 'recovery': ''}
+        history_lines = []
+        if history:
+            history_lines.append('Letzte Aktionen: ' + ' '.join(history))
+        if hint:
+            history_lines.append(f"Auf einem sehr ähnlichen Bildschirm war erfolgreich: {hint}")
+        parts['history'] = '\n'.join(history_lines)
+        if recovery:
+            parts['recovery'] = f"Problem im letzten Schritt: {recovery}"
+        return parts
+
+    def build(self, task: str, hint: Optional[Dict[str, Any]] = None,
+              recovery: Optional[str] = None) -> BuiltPrompt:
+        """
+        Build the user prompt for the next request
+
+        Args:
+            task: Current task or instruction
+            hint: Action that succeeded on a very similar screen
+            recovery: What went wrong in the previous step, if anything
+
+        Returns:
+            Prompt text and estimated tokens per section, including the
+            system prompt
+        """
+        history = list(self._history)
+        hint_text = json.dumps(hint, ensure_ascii=False, separators=(',', ':')) if hint else None
+        trimmed = False
+
+        while True:
+            parts = self._assemble(task, history, hint_text, recovery)
+            tokens = {'system': self.system_tokens}
+            tokens.update({section: estimate_tokens(text) for section, text in parts.items()})
+            excess = sum(tokens.values()) - self.budget
+            if excess <= 0:
+                break
+            if history:
+                history.pop(0)
+            elif recovery:
+                # Keep what fits, at least drop the overflow
+                keep = max(len(recovery) - math.ceil(excess * CHARS_PER_TOKEN), 0)
+                recovery = recovery[:keep].rstrip() or None
+            else:
+                self.over_budget += 1
+                logger.warning(f"Prompt of ~{sum(tokens.values())} tokens exceeds the budget of {self.budget}")
+                break
+            trimmed = True
+
+        self.prompts += 1
+        if trimmed:
+            self.trimmed += 1
+        for section, count in tokens.items():
+            self._section_totals[section] += count
+        text = '\n'.join(part for part in (parts['task'], parts['history'], parts['recovery']) if part)
+        return BuiltPrompt(text, tokens, trimmed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Average estimated tokens per section and budget enforcement counts"""
+        prompts = max(self.prompts, 1)
+        return {
+            'prompts': self.prompts,
+            'budget': self.budget,
+            'avg_tokens': {section: round(total / prompts, 1) for section, total in self._section_totals.items()},
+            'trimmed': self.trimmed,
+            'over_budget': self.over_budget
+        }
@@ -0,0 +1,305 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A routing target is a (provider name, model name) pair
+Target = Tuple[str, str]
+
+# Number of recent latencies kept per target for percentile estimates
+LATENCY_WINDOW = 50
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one routing target
+
+    Opens after failure_threshold consecutive failures, allows a single probe
+    request (half-open) after reset_timeout seconds and closes again on the
+    first success. Further callers are rejected while the probe is in flight;
+    a probe that never reports back (e.g. ranked but not sent) is given up
+    after another reset_timeout.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.probe_in_flight = False
+        self.probe_started = 0.0
+
+    def allow_request(self, now: Optional[float] = None) -> bool:
+        """Check whether a request may be sent to the target"""
+        if self.state == self.CLOSED:
+            return True
+        now = now or time.time()
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        elif self.probe_in_flight and now - self.probe_started < self.reset_timeout:
+            return False
+        self.probe_in_flight = True
+        self.probe_started = now
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self, now: Optional[float] = None):
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = now or time.time()
+
+class TargetHealth:
+    """
+    Exponentially weighted health metrics of one routing target
+    """
+
+    def __init__(self, alpha: float, breaker: CircuitBreaker):
+        self.alpha = alpha
+        self.breaker = breaker
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.parse_failure_rate = 0.0
+        self.requests = 0
+        # Warm-up probe result; orders the target until real traffic arrives
+        self.seeded = False
+        self.probe_latency: Optional[float] = None
+        self.parse_checks = 0
+        self.timeouts = 0
+        self.latency_samples = deque(maxlen=LATENCY_WINDOW)
+
+    def _ewma(self, current: float, sample: float) -> float:
+        return self.alpha * sample + (1 - self.alpha) * current
+
+    def seed(self, latency: Optional[float]):
+        """
+        Take a warm-up probe as the initial estimate
+        
+        The probe is not a request: it is neither a latency sample nor does
+        it touch the error rate or the breaker, and it only stands in for
+        the latency until the first real response.
+        """
+        self.seeded = True
+        self.probe_latency = latency
+    
+    def record_success(self, latency: float):
+        self.requests += 1
+        self.latency = latency if self.latency is None else self._ewma(self.latency, latency)
+        self.error_rate = self._ewma(self.error_rate, 0.0)
+        self.breaker.record_success()
+        self.latency_samples.append(latency)
+
+    def record_timeout(self, timeout: float):
+        """Count a timed-out request; its timeout is a lower bound of the latency"""
+        self.timeouts += 1
+        self.latency_samples.append(timeout)
+        self.record_failure()
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank latency percentile over the recent samples"""
+        if not self.latency_samples:
+            return None
+        ordered = sorted(self.latency_samples)
+        return ordered[max(math.ceil(q / 100 * len(ordered)), 1) - 1]
+
+    def record_failure(self):
+        self.requests += 1
+        self.error_rate = self._ewma(self.error_rate, 1.0)
+        self.breaker.record_failure()
+
+    def record_parse_result(self, success: bool):
+        self.parse_checks += 1
+        self.parse_failure_rate = self._ewma(self.parse_failure_rate, 0.0 if success else 1.0)
+
+    def score(self) -> Optional[float]:
+        """
+        Expected seconds per usable response (lower is better)
+
+        Latency is inflated by the chance that the response is an error or
+        unparseable and has to be repeated.
+        """
+        latency = self.latency if self.latency is not None else self.probe_latency
+        if latency is None:
+            return None
+        success_rate = max((1 - self.error_rate) * (1 - self.parse_failure_rate), 0.05)
+        return latency / success_rate
+
+class ProviderRouter:
+    """
+    Routes requests to the fastest healthy provider/model pair
+
+    Targets without latency samples are tried first, in configured order, so
+    every target gets measured once (optimistic initialisation); afterwards
+    the lowest score wins. A warm-up probe stands in for the first sample.
+    Targets that have only ever failed (or failed their probe) come last, and
+    targets with an open circuit breaker are skipped until their half-open
+    probe is due.
+    """
+
+    def __init__(self, alpha: float = 0.3, failure_threshold: int = 3, reset_timeout: float = 60.0,
+                 timeout_factor: float = 3.0, timeout_min_samples: int = 5, min_timeout: float = 2.0):
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.timeout_factor = timeout_factor
+        self.timeout_min_samples = timeout_min_samples
+        self.min_timeout = min_timeout
+        self.decisions = 0
+        self.last_decision: Optional[Target] = None
+        self._health: Dict[Target, TargetHealth] = {}
+        self._lock = threading.Lock()
+
+    def _get_health(self, target: Target) -> TargetHealth:
+        if target not in self._health:
+            breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            self._health[target] = TargetHealth(self.alpha, breaker)
+        return self._health[target]
+
+    def rank(self, targets: List[Target]) -> List[Target]:
+        """
+        Order targets by health score, dropping those with an open breaker
+
+        Args:
+            targets: Candidate targets in configured preference order
+
+        Returns:
+            Targets to try, best first
+        """
+        now = time.time()
+        measured = []
+        unmeasured = []
+        failing = []
+        with self._lock:
+            for order, target in enumerate(targets):
+                health = self._get_health(target)
+                if not health.breaker.allow_request(now):
+                    logger.debug(f"Circuit open for {'/'.join(target)}, skipping")
+                    continue
+                score = health.score()
+                if score is not None:
+                    measured.append((score, order, target))
+                elif health.requests == 0 and not health.seeded:
+                    unmeasured.append(target)
+                else:
+                    failing.append(target)
+
+        ranked = unmeasured + [target for _, _, target in sorted(measured)] + failing
+        if ranked:
+            self.decisions += 1
+            if ranked[0] != self.last_decision:
+                logger.info(f"Routing to {'/'.join(ranked[0])} ({self.describe(ranked[0])})")
+            self.last_decision = ranked[0]
+        return ranked
+
+    def closed(self, targets: List[Target]) -> List[Target]:
+        """
+        Targets with a closed breaker, best score first, without side effects
+
+        Unlike rank this neither claims a half-open probe nor counts as a
+        routing decision, so side requests (response repairs) can pick a
+        target without disturbing the routing of the main traffic.
+        Unmeasured targets follow the measured ones in configured order.
+        """
+        with self._lock:
+            healths = [(order, target, self._health.get(target)) for order, target in enumerate(targets)]
+            usable = [
+                (health.score() if health else None, order, target) for order, target, health in healths
+                if health is None or health.breaker.state == CircuitBreaker.CLOSED
+            ]
+        measured = sorted(entry for entry in usable if entry[0] is not None)
+        return [target for _, _, target in measured] + [target for score, _, target in usable if score is None]
+
+    def describe(self, target: Target) -> str:
+        """Human-readable health summary of a target for routing logs"""
+        health = self._get_health(target)
+        if health.latency is None:
+            return 'no samples yet'
+        return (f"latency {health.latency:.2f}s, errors {health.error_rate:.0%}, "
+                f"parse failures {health.parse_failure_rate:.0%}, circuit {health.breaker.state}")
+
+    def record_success(self, target: Target, latency: float):
+        with self._lock:
+            self._get_health(target).record_success(latency)
+
+    def seed(self, target: Target, latency: Optional[float]):
+        """Seed a target from a warm-up probe; None marks a probe that failed"""
+        with self._lock:
+            self._get_health(target).seed(latency)
+    
+    def record_failure(self, target: Target):
+        with self._lock:
+            health = self._get_health(target)
+            was_open = health.breaker.state == CircuitBreaker.OPEN
+            health.record_failure()
+            if health.breaker.state == CircuitBreaker.OPEN and not was_open:
+                logger.warning(f"Circuit opened for {'/'.join(target)} after "
+                               f"{health.breaker.consecutive_failures} consecutive failures")
+
+    def record_timeout(self, target: Target, timeout: float):
+        with self._lock:
+            self._get_health(target).record_timeout(timeout)
+        logger.warning(f"{'/'.join(target)} timed out after {timeout:.1f}s")
+
+    def get_timeout(self, target: Target, default: float) -> float:
+        """
+        Request timeout for a target derived from its observed latency
+
+        Args:
+            target: Routing target
+            default: Timeout used until enough samples exist, also the upper bound
+
+        Returns:
+            timeout_factor x p95 latency, clamped to [min_timeout, default]
+        """
+        with self._lock:
+            health = self._get_health(target)
+            if len(health.latency_samples) < self.timeout_min_samples:
+                return default
+            p95 = health.latency_percentile(95)
+        return min(max(self.timeout_factor * p95, self.min_timeout), default)
+
+    def record_parse_result(self, target: Target, success: bool):
+        with self._lock:
+            self._get_health(target).record_parse_result(success)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get routing statistics per target"""
+        with self._lock:
+            targets = {
+                '/'.join(target): {
+                    'latency_ewma': health.latency,
+                    'error_rate': health.error_rate,
+                    'parse_failure_rate': health.parse_failure_rate,
+                    'score': health.score(),
+                    'requests': health.requests,
+                    'latency_p95': health.latency_percentile(95),
+                    'probe_latency': health.probe_latency,
+                    'timeouts': health.timeouts,
+                    'circuit_state': health.breaker.state,
+                    'circuit_opened': health.breaker.times_opened
+                }
+                for target, health in self._health.items()
+            }
+        return {
+            'decisions': self.decisions,
+            'last_decision': '/'.join(self.last_decision) if self.last_decision else None,
+            'targets': targets
+        }
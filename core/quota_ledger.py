@@ -0,0 +1,170 @@
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from core.rate_limiter import SHARED_QUOTA, RateLimiter, TokenBucket, parse_rate_limit_reset
+
+logger = logging.getLogger(__name__)
+
+# Primary key of a bucket row: (provider, scope, key id, period)
+BucketKey = Tuple[str, str, str, str]
+
+class SharedQuotaLedger(RateLimiter):
+    """
+    Rate limiter whose buckets and cooldowns live in a SQLite file
+
+    All processes on the host that open the same file share one quota per
+    provider, model and API key instead of each assuming the full limit.
+    Every check-and-take runs in an IMMEDIATE transaction, so two processes
+    can never spend the same token. Daily quotas also survive restarts.
+    """
+
+    def __init__(self, path: str, quotas: Optional[Mapping[str, Mapping[str, Mapping[str, int]]]] = None,
+                 busy_timeout: float = 5.0):
+        super().__init__(quotas)
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            'provider TEXT, scope TEXT, key_id TEXT, period TEXT, tokens REAL, updated REAL, '
+            'PRIMARY KEY (provider, scope, key_id, period))'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cooldowns ('
+            'provider TEXT, model TEXT, key_id TEXT, until REAL, '
+            'PRIMARY KEY (provider, model, key_id))'
+        )
+        logger.info(f"Shared quota ledger opened at {path}")
+
+    @contextmanager
+    def _transaction(self, write: bool = True) -> Iterator[sqlite3.Connection]:
+        """Serialise access within the process and, for writes, across processes"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def _load_buckets(self, conn: sqlite3.Connection, provider: str, model: str,
+                      key_id: str) -> List[Tuple[BucketKey, TokenBucket]]:
+        """Read the buckets of a target; missing ones start full"""
+        buckets = []
+        for scope, period, limit, seconds in self._bucket_specs(provider, model):
+            bucket = TokenBucket(limit, limit / seconds)
+            row = conn.execute(
+                'SELECT tokens, updated FROM buckets WHERE provider = ? AND scope = ? AND key_id = ? AND period = ?',
+                (provider, scope, key_id, period)
+            ).fetchone()
+            if row is not None:
+                bucket.tokens, bucket.updated = min(row[0], limit), row[1]
+            buckets.append(((provider, scope, key_id, period), bucket))
+        return buckets
+
+    @staticmethod
+    def _store_buckets(conn: sqlite3.Connection, buckets: List[Tuple[BucketKey, TokenBucket]]):
+        conn.executemany(
+            'INSERT OR REPLACE INTO buckets (provider, scope, key_id, period, tokens, updated) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [key + (bucket.tokens, bucket.updated) for key, bucket in buckets]
+        )
+
+    @staticmethod
+    def _load_cooldown(conn: sqlite3.Connection, provider: str, model: str, key_id: str, now: float) -> float:
+        row = conn.execute(
+            'SELECT MAX(until) FROM cooldowns WHERE provider = ? AND model IN (?, ?) AND key_id = ?',
+            (provider, model, SHARED_QUOTA, key_id)
+        ).fetchone()
+        return max((row[0] or 0.0) - now, 0.0)
+
+    def wait_time(self, provider: str, model: str, key_id: str = '') -> float:
+        """
+        Seconds until a request to the target would be allowed (no token taken)
+        """
+        now = time.time()
+        with self._transaction(write=False) as conn:
+            waits = [self._load_cooldown(conn, provider, model, key_id, now)]
+            waits.extend(bucket.wait_time(now) for _, bucket in self._load_buckets(conn, provider, model, key_id))
+        return max(waits)
+
+    def try_acquire(self, provider: str, model: str, key_id: str = '') -> float:
+        """
+        Take a request token for the target if one is available
+
+        Returns:
+            0.0 if the request may be sent, otherwise seconds to wait
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            buckets = self._load_buckets(conn, provider, model, key_id)
+            waits = [self._load_cooldown(conn, provider, model, key_id, now)]
+            waits.extend(bucket.wait_time(now) for _, bucket in buckets)
+            wait = max(waits)
+            if wait <= 0:
+                for _, bucket in buckets:
+                    bucket.take(now)
+                self._store_buckets(conn, buckets)
+        if wait > 0:
+            self.throttled += 1
+            return wait
+        return 0.0
+
+    def cool_down(self, provider: str, model: str, seconds: float, key_id: str = ''):
+        """Block a target for the given number of seconds in all processes"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM cooldowns WHERE until < ?', (now,))
+            conn.execute(
+                'INSERT INTO cooldowns (provider, model, key_id, until) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (provider, model, key_id) DO UPDATE SET until = MAX(until, excluded.until)',
+                (provider, model, key_id, now + seconds)
+            )
+        self.cooldowns_applied += 1
+        logger.info(f"{provider}/{model} cooling down for {seconds:.1f}s")
+
+    def update_from_headers(self, provider: str, model: str, headers: Mapping[str, str], key_id: str = ''):
+        """
+        Adjust the shared state from X-RateLimit-* response headers
+
+        Args:
+            provider: Provider name
+            model: Model the response belongs to
+            headers: Response headers (case-insensitive mapping)
+            key_id: Masked identifier of the API key used
+        """
+        try:
+            remaining = float(headers.get('X-RateLimit-Remaining'))
+        except (TypeError, ValueError):
+            return
+
+        now = time.time()
+        with self._transaction() as conn:
+            buckets = self._load_buckets(conn, provider, model, key_id)
+            for _, bucket in buckets:
+                bucket.limit_remaining(remaining, now)
+            self._store_buckets(conn, buckets)
+
+        if remaining < 1:
+            reset = parse_rate_limit_reset(headers.get('X-RateLimit-Reset'), now)
+            if reset:
+                self.cool_down(provider, model, reset, key_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get limiter statistics; cooling targets include those set by other processes"""
+        now = time.time()
+        with self._transaction(write=False) as conn:
+            rows = conn.execute('SELECT provider, model, key_id, until FROM cooldowns WHERE until > ?',
+                                (now,)).fetchall()
+        return {
+            'throttled_requests': self.throttled,
+            'cooldowns_applied': self.cooldowns_applied,
+            'cooling_targets': {
+                '/'.join(part for part in row[:3] if part): round(row[3] - now, 1) for row in rows
+            },
+            'ledger': self.path
+        }
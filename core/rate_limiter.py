@@ -0,0 +1,209 @@
+import email.utils
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Quota entry applying to all models of a provider together
+SHARED_QUOTA = '*'
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to capacity tokens, refilled continuously
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.time()
+
+    def _refill(self, now: float):
+        elapsed = max(now - self.updated, 0.0)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        if self.refill_per_second <= 0:
+            return float('inf')
+        return (1 - self.tokens) / self.refill_per_second
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def limit_remaining(self, remaining: float, now: float):
+        """Clamp the local estimate to the server-reported remaining quota"""
+        self._refill(now)
+        self.tokens = min(self.tokens, remaining)
+
+class RateLimiter:
+    """
+    Client-side rate limiting per provider, model and API key
+
+    Quotas are configured per provider as {model: {'rpm': n, 'rpd': n}}; the
+    model name '*' declares a quota shared by all models of the provider.
+    Cooldowns from 429 responses and Retry-After headers are tracked per
+    target, so callers can route around a cooling model instead of sleeping.
+    """
+
+    def __init__(self, quotas: Optional[Mapping[str, Mapping[str, Mapping[str, int]]]] = None):
+        self.quotas = quotas or {}
+        self.throttled = 0
+        self.cooldowns_applied = 0
+        self._buckets: Dict[Tuple[str, str, str, str], TokenBucket] = {}
+        self._cooldowns: Dict[Tuple[str, str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def _bucket_specs(self, provider: str, model: str) -> List[Tuple[str, str, int, int]]:
+        """Quotas that apply to a model as (scope, period, limit, period seconds)"""
+        specs = []
+        provider_quotas = self.quotas.get(provider, {})
+        for scope in (model, SHARED_QUOTA):
+            quota = provider_quotas.get(scope)
+            if not quota:
+                continue
+            for period, seconds in (('rpm', 60), ('rpd', 86400)):
+                limit = quota.get(period)
+                if limit:
+                    specs.append((scope, period, limit, seconds))
+        return specs
+
+    def _get_buckets(self, provider: str, model: str, key_id: str) -> List[TokenBucket]:
+        """Get (lazily creating) all buckets that apply to a target"""
+        buckets = []
+        for scope, period, limit, seconds in self._bucket_specs(provider, model):
+            bucket_key = (provider, scope, key_id, period)
+            if bucket_key not in self._buckets:
+                self._buckets[bucket_key] = TokenBucket(limit, limit / seconds)
+            buckets.append(self._buckets[bucket_key])
+        return buckets
+
+    def _cooldown_remaining(self, provider: str, model: str, key_id: str, now: float) -> float:
+        until = max(
+            self._cooldowns.get((provider, model, key_id), 0.0),
+            self._cooldowns.get((provider, SHARED_QUOTA, key_id), 0.0)
+        )
+        return max(until - now, 0.0)
+
+    def wait_time(self, provider: str, model: str, key_id: str = '') -> float:
+        """
+        Seconds until a request to the target would be allowed (no token taken)
+        """
+        now = time.time()
+        with self._lock:
+            waits = [self._cooldown_remaining(provider, model, key_id, now)]
+            waits.extend(bucket.wait_time(now) for bucket in self._get_buckets(provider, model, key_id))
+        return max(waits)
+
+    def try_acquire(self, provider: str, model: str, key_id: str = '') -> float:
+        """
+        Take a request token for the target if one is available
+
+        Returns:
+            0.0 if the request may be sent, otherwise seconds to wait
+        """
+        now = time.time()
+        with self._lock:
+            buckets = self._get_buckets(provider, model, key_id)
+            waits = [self._cooldown_remaining(provider, model, key_id, now)]
+            waits.extend(bucket.wait_time(now) for bucket in buckets)
+            wait = max(waits)
+            if wait > 0:
+                self.throttled += 1
+                return wait
+            for bucket in buckets:
+                bucket.take(now)
+        return 0.0
+
+    def cool_down(self, provider: str, model: str, seconds: float, key_id: str = ''):
+        """Block a target for the given number of seconds"""
+        with self._lock:
+            key = (provider, model, key_id)
+            self._cooldowns[key] = max(self._cooldowns.get(key, 0.0), time.time() + seconds)
+            self.cooldowns_applied += 1
+        logger.info(f"{provider}/{model} cooling down for {seconds:.1f}s")
+
+    def update_from_headers(self, provider: str, model: str, headers: Mapping[str, str], key_id: str = ''):
+        """
+        Adjust local state from X-RateLimit-* response headers
+
+        Args:
+            provider: Provider name
+            model: Model the response belongs to
+            headers: Response headers (case-insensitive mapping)
+            key_id: Masked identifier of the API key used
+        """
+        remaining = _parse_float(headers.get('X-RateLimit-Remaining'))
+        if remaining is None:
+            return
+
+        now = time.time()
+        with self._lock:
+            for bucket in self._get_buckets(provider, model, key_id):
+                bucket.limit_remaining(remaining, now)
+
+        if remaining < 1:
+            reset = parse_rate_limit_reset(headers.get('X-RateLimit-Reset'), now)
+            if reset:
+                self.cool_down(provider, model, reset, key_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get limiter statistics"""
+        now = time.time()
+        with self._lock:
+            cooling = {
+                '/'.join(part for part in key if part): round(until - now, 1)
+                for key, until in self._cooldowns.items() if until > now
+            }
+        return {
+            'throttled_requests': self.throttled,
+            'cooldowns_applied': self.cooldowns_applied,
+            'cooling_targets': cooling
+        }
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Parse a Retry-After header (delta seconds or HTTP date)
+
+    Returns:
+        Seconds to wait, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    seconds = _parse_float(value)
+    if seconds is not None:
+        return max(seconds, 0.0)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at - (now or time.time()), 0.0)
+
+def parse_rate_limit_reset(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Parse an X-RateLimit-Reset header into seconds from now
+
+    Accepts epoch milliseconds (OpenRouter), epoch seconds or delta seconds.
+    """
+    reset = _parse_float(value)
+    if reset is None:
+        return None
+    now = now or time.time()
+    if reset > 1e12:
+        reset /= 1000.0
+    if reset > 1e9:
+        return max(reset - now, 0.0)
+    return max(reset, 0.0)
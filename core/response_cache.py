@@ -0,0 +1,143 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """
+    Persistent SQLite cache for LLM responses keyed by screen, prompt and model
+    """
+
+    def __init__(self, path: str, ttl: float = 300, max_entries: int = 1000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, model TEXT, response TEXT, '
+            'created REAL, last_access REAL)'
+        )
+        self._conn.commit()
+        logger.info(f"Response cache opened at {path} (ttl={ttl}s, max_entries={max_entries})")
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Collapse whitespace so formatting-only prompt changes still hit"""
+        return ' '.join(prompt.split())
+
+    @classmethod
+    def make_key(cls, frame_hash: str, prompt: str, model: str) -> str:
+        """
+        Build the cache key for a request
+
+        Args:
+            frame_hash: Hash of the screenshot sent with the request
+            prompt: Full text prompt
+            model: Provider-qualified model name
+
+        Returns:
+            Hex digest identifying the request
+        """
+        material = '\x00'.join([frame_hash, cls.normalize_prompt(prompt), model])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response
+
+        Args:
+            key: Key from make_key
+
+        Returns:
+            Cached response or None if missing or expired
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT response, created FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            self.hits += 1
+
+        logger.debug(f"Response cache hit: {key[:8]}...")
+        return row[0]
+
+    def put(self, key: str, response: str, model: str):
+        """
+        Store a response and evict old entries if the cache is full
+
+        Args:
+            key: Key from make_key
+            response: Raw LLM response
+            model: Model that produced the response
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, model, response, created, last_access) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, model, response, now, now)
+            )
+            self.stores += 1
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Drop expired entries, then least recently used ones beyond max_entries"""
+        cursor = self._conn.execute('DELETE FROM responses WHERE created < ?', (now - self.ttl,))
+        evicted = cursor.rowcount
+
+        count = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        if count > self.max_entries:
+            cursor = self._conn.execute(
+                'DELETE FROM responses WHERE key IN '
+                '(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)',
+                (count - self.max_entries,)
+            )
+            evicted += cursor.rowcount
+
+        if evicted:
+            self.evictions += evicted
+            logger.debug(f"Evicted {evicted} entries from response cache")
+
+    def clear(self):
+        """Remove all cached responses"""
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._conn.commit()
+        logger.info("Response cache cleared")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / max(lookups, 1),
+            'stores': self.stores,
+            'evictions': self.evictions
+        }
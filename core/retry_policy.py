@@ -0,0 +1,98 @@
+import logging
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional
+
+from core.exceptions import (
+    APIError, AuthenticationError, InvalidRequestError, InvalidResponseError, KeyRetiredError, NetworkError,
+    RateLimitError, ServerError, TimeoutError, TruncatedResponseError
+)
+
+logger = logging.getLogger(__name__)
+
+# Policy entry applying to all providers without their own entry
+DEFAULT_POLICY = '*'
+
+@dataclass(frozen=True)
+class RetryRule:
+    """
+    How to react to one class of errors
+
+    Attributes:
+        retryable: Retry the same target after a backoff
+        max_attempts: Attempts on the same target, including the first one
+        skip_provider: Do not try the provider's other models either (e.g.
+            an invalid API key)
+        backoff: Wait before retrying; off for errors that are resolved by
+            the next attempt itself (e.g. switching to another API key)
+    """
+    retryable: bool = False
+    max_attempts: int = 1
+    skip_provider: bool = False
+    backoff: bool = True
+
+# Used for error classes without an entry in the matrix
+FATAL = RetryRule()
+
+class RetryPolicy:
+    """
+    Declarative retry matrix per error class and provider
+
+    The matrix is configured as {provider: {error_class: rule kwargs}}; the
+    provider '*' holds the defaults, provider entries override single error
+    classes. Retries on the same target wait a jittered exponential backoff
+    ("full jitter"), limited by a per-request backoff budget. Errors that
+    are not retried still fall back to the next target.
+    """
+
+    def __init__(self, matrix: Optional[Mapping[str, Mapping[str, Mapping[str, Any]]]] = None,
+                 base_delay: float = 1.0, max_delay: float = 10.0, budget: float = 15.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self._rules: Dict[str, Dict[str, RetryRule]] = {
+            provider: {error_class: RetryRule(**rule) for error_class, rule in rules.items()}
+            for provider, rules in (matrix or {}).items()
+        }
+
+    @staticmethod
+    def classify(error: Exception) -> str:
+        """Map an exception to its error class in the retry matrix"""
+        if isinstance(error, RateLimitError):
+            return 'rate_limit'
+        if isinstance(error, TimeoutError):
+            return 'timeout'
+        if isinstance(error, KeyRetiredError):
+            return 'key_retired'
+        if isinstance(error, AuthenticationError):
+            return 'auth'
+        if isinstance(error, TruncatedResponseError):
+            return 'truncated'
+        if isinstance(error, InvalidResponseError):
+            return 'invalid_response'
+        if isinstance(error, ServerError):
+            return 'server_error'
+        if isinstance(error, InvalidRequestError):
+            return 'invalid_request'
+        if isinstance(error, NetworkError):
+            return 'network'
+        if isinstance(error, APIError) and error.status_code:
+            return 'server_error' if error.status_code >= 500 else 'invalid_request'
+        return 'unknown'
+
+    def get_rule(self, provider: str, error_class: str) -> RetryRule:
+        """Get the rule for an error class, preferring the provider's own entry"""
+        for scope in (provider, DEFAULT_POLICY):
+            rule = self._rules.get(scope, {}).get(error_class)
+            if rule is not None:
+                return rule
+        return FATAL
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Delay before the next attempt on the same target
+
+        Args:
+            attempt: Number of the attempt that just failed (starting from 1)
+        """
+        return random.uniform(0, min(self.base_delay * (2 ** (attempt - 1)), self.max_delay))
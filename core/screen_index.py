@@ -0,0 +1,206 @@
+import json
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+def compute_dhash(image: Image.Image, hash_size: int = 16) -> int:
+    """
+    Compute a difference hash (dHash) of an image
+
+    Args:
+        image: PIL Image object
+        hash_size: Hash grid size; the hash has hash_size**2 bits
+
+    Returns:
+        Perceptual hash as integer
+    """
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count('1')
+
+@dataclass
+class SimilarScreen:
+    """A previously seen screen returned by ScreenSimilarityIndex.nearest"""
+    entry_id: int
+    distance: int
+    phash: int
+    action: Dict[str, Any]
+    frame_hash: Optional[str] = None
+
+class ScreenSimilarityIndex:
+    """
+    Near-duplicate screen lookup over perceptual hashes
+
+    Uses multi-index hashing: each hash is split into max_distance + 1
+    chunks, so any stored hash within max_distance shares at least one chunk
+    exactly with the query. Lookups only compare the candidates found in
+    those chunk buckets instead of scanning every stored frame.
+    """
+
+    def __init__(self, hash_bits: int = 256, max_distance: int = 10,
+                 max_entries: int = 100000, path: Optional[str] = None):
+        self.hash_bits = hash_bits
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.path = path
+        self.lookups = 0
+        self.matches = 0
+
+        self._chunks = self._split_chunks(hash_bits, max_distance + 1)
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in self._chunks]
+        self._entries: 'OrderedDict[int, Tuple[int, str, Dict[str, Any], Optional[str]]]' = OrderedDict()
+        self._ids: Dict[Tuple[int, str], int] = {}
+        self._next_id = 0
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @staticmethod
+    def _split_chunks(hash_bits: int, count: int) -> List[Tuple[int, int]]:
+        """Split the hash into (shift, mask) pairs of near-equal width"""
+        chunks = []
+        shift = 0
+        for i in range(count):
+            width = hash_bits // count + (1 if i < hash_bits % count else 0)
+            chunks.append((shift, (1 << width) - 1))
+            shift += width
+        return chunks
+
+    def _chunk_values(self, phash: int) -> List[int]:
+        return [(phash >> shift) & mask for shift, mask in self._chunks]
+
+    def add(self, phash: int, action: Dict[str, Any], context: str = '',
+            frame_hash: Optional[str] = None):
+        """
+        Record the action that succeeded on a screen
+
+        Args:
+            phash: Perceptual hash of the screen
+            action: Action data that was executed successfully
+            context: Prompt the action was produced for
+            frame_hash: Exact hash of the frame, if known
+        """
+        entry_id = self._ids.get((phash, context))
+        if entry_id is not None:
+            self._entries[entry_id] = (phash, context, action, frame_hash)
+            self._entries.move_to_end(entry_id)
+            return
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (phash, context, action, frame_hash)
+        self._ids[(phash, context)] = entry_id
+        for bucket, value in zip(self._buckets, self._chunk_values(phash)):
+            bucket.setdefault(value, []).append(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int):
+        phash, context, _, _ = self._entries.pop(entry_id)
+        del self._ids[(phash, context)]
+        for bucket, value in zip(self._buckets, self._chunk_values(phash)):
+            ids = bucket[value]
+            ids.remove(entry_id)
+            if not ids:
+                del bucket[value]
+
+    def nearest(self, phash: int, context: str = '',
+                max_distance: Optional[int] = None) -> Optional[SimilarScreen]:
+        """
+        Find the closest previously seen screen for the same context
+
+        Args:
+            phash: Perceptual hash of the current screen
+            context: Prompt the action is requested for
+            max_distance: Maximum Hamming distance (at most the index's)
+
+        Returns:
+            Closest match or None if nothing is within max_distance
+        """
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        self.lookups += 1
+
+        best = None
+        best_distance = max_distance + 1
+        seen = set()
+        for bucket, value in zip(self._buckets, self._chunk_values(phash)):
+            for entry_id in bucket.get(value, ()):
+                if entry_id in seen:
+                    continue
+                seen.add(entry_id)
+                entry = self._entries[entry_id]
+                if entry[1] != context:
+                    continue
+                distance = hamming_distance(entry[0], phash)
+                if distance < best_distance:
+                    best, best_distance = entry_id, distance
+                    if distance == 0:
+                        break
+            if best_distance == 0:
+                break
+
+        if best is None:
+            return None
+
+        self.matches += 1
+        entry_phash, _, action, frame_hash = self._entries[best]
+        return SimilarScreen(best, best_distance, entry_phash, action, frame_hash)
+
+    def save(self, path: Optional[str] = None):
+        """Persist the index as JSON"""
+        path = path or self.path
+        if not path:
+            return
+        entries = [
+            {'phash': format(phash, 'x'), 'context': context, 'action': action, 'frame_hash': frame_hash}
+            for phash, context, action, frame_hash in self._entries.values()
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'hash_bits': self.hash_bits, 'entries': entries}, f)
+        logger.debug(f"Saved {len(entries)} screens to similarity index {path}")
+
+    def load(self, path: str):
+        """Load entries persisted with save()"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Failed to load similarity index {path}: {e}")
+            return
+
+        if data.get('hash_bits') != self.hash_bits:
+            logger.warning(f"Ignoring similarity index {path} with different hash size")
+            return
+
+        for entry in data.get('entries', []):
+            self.add(int(entry['phash'], 16), entry['action'], entry.get('context', ''), entry.get('frame_hash'))
+        logger.info(f"Loaded {len(self._entries)} screens into similarity index")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics"""
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'max_distance': self.max_distance,
+            'lookups': self.lookups,
+            'matches': self.matches,
+            'match_rate': self.matches / max(self.lookups, 1)
+        }
@@ -7,6 +7,8 @@ from typing import Optional, Tuple
 from PIL import Image
 from io import BytesIO
 
+from core.screen_index import compute_dhash
+
 logger = logging.getLogger(__name__)
 
 class ScreenshotManager:
@@ -21,6 +23,11 @@ class ScreenshotManager:
         self.cache = {}
         self.cache_order = []
         self.last_hash = None
+        self.last_phash: Optional[int] = None
+        self.last_unchanged = False
+        # Frame compared by check_screen_changed; kept apart from last_hash so
+        # plan checkpoints do not hide a change from the next get_screenshot
+        self.checkpoint_hash = None
         self.screenshot_count = 0
         self.cache_hits = 0
         
@@ -36,51 +43,86 @@ class ScreenshotManager:
         """
         self.screenshot_count += 1
         
-        if not force_new:
-            # Check if screen has changed
-            current_hash = self._get_screen_hash()
-            if current_hash == self.last_hash and self.last_hash in self.cache:
-                logger.debug("Using cached screenshot (screen unchanged)")
-                self.cache_hits += 1
-                return self.cache[current_hash]
+        # Hash the full frame: a corner-only hash misses changes elsewhere on
+        # screen and would hand out stale screenshots
+        screenshot = self._capture_screenshot()
+        current_hash = self._get_screen_hash(screenshot)
+        self.last_unchanged = current_hash == self.last_hash
+        self.last_hash = current_hash
+        self.checkpoint_hash = current_hash
+        self.last_phash = compute_dhash(screenshot)
         
-        # Take new screenshot
-        screenshot_b64 = self._take_new_screenshot()
+        if not force_new and current_hash in self.cache:
+            logger.debug("Using cached screenshot (screen unchanged)")
+            self.cache_hits += 1
+            return self.cache[current_hash]
         
-        # Update cache
-        current_hash = self._get_screen_hash()
+        # Encode new screenshot
+        screenshot_b64 = self._encode_screenshot(screenshot)
         self._update_cache(current_hash, screenshot_b64)
-        self.last_hash = current_hash
         
         logger.debug(f"New screenshot taken and cached (hash: {current_hash[:8]}...)")
         return screenshot_b64
     
-    def _take_new_screenshot(self) -> str:
+    def check_screen_changed(self) -> bool:
         """
-        Take a new screenshot and optimize it
+        Check whether the screen changed since the last capture or check
+        
+        Only hashes the frame; the PNG is encoded by the next get_screenshot
+        call if the new frame is actually sent anywhere. last_hash and
+        last_unchanged keep describing the last frame from get_screenshot.
         
         Returns:
-            Base64 encoded optimized screenshot
+            True if the screen content differs from the previous frame
         """
-        try:
-            # Take screenshot
-            screenshot = pyautogui.screenshot()
-            
-            # Optimize screenshot
-            optimized_screenshot = self._optimize_screenshot(screenshot)
-            
-            # Convert to base64
-            buffer = BytesIO()
-            optimized_screenshot.save(buffer, format='PNG', optimize=True)
-            screenshot_b64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            
-            logger.debug(f"Screenshot taken: {optimized_screenshot.size}, {len(screenshot_b64)} chars")
-            return screenshot_b64
+        current_hash = self._get_screen_hash(self._capture_screenshot())
+        changed = current_hash != self.checkpoint_hash
+        self.checkpoint_hash = current_hash
+        return changed
+    
+    @staticmethod
+    def compute_frame_hash(screenshot_b64: str) -> str:
+        """
+        Get a content hash of a full screenshot
+        
+        Args:
+            screenshot_b64: Base64 encoded screenshot
             
+        Returns:
+            SHA-256 hex digest identifying the frame
+        """
+        return hashlib.sha256(screenshot_b64.encode('ascii')).hexdigest()
+    
+    def _capture_screenshot(self) -> Image.Image:
+        """
+        Capture the screen and optimize the image
+        
+        Returns:
+            Optimized PIL Image object
+        """
+        try:
+            return self._optimize_screenshot(pyautogui.screenshot())
         except Exception as e:
             logger.error(f"Failed to take screenshot: {e}")
             raise
     
+    def _encode_screenshot(self, screenshot: Image.Image) -> str:
+        """
+        Encode an optimized screenshot as base64 PNG
+        
+        Args:
+            screenshot: Optimized PIL Image object
+            
+        Returns:
+            Base64 encoded screenshot
+        """
+        buffer = BytesIO()
+        screenshot.save(buffer, format='PNG', optimize=True)
+        screenshot_b64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        
+        logger.debug(f"Screenshot taken: {screenshot.size}, {len(screenshot_b64)} chars")
+        return screenshot_b64
+    
     def _optimize_screenshot(self, screenshot: Image.Image) -> Image.Image:
         """
         Optimize screenshot for better API performance
@@ -108,28 +150,17 @@ class ScreenshotManager:
         
         return screenshot
     
-    def _get_screen_hash(self) -> str:
+    def _get_screen_hash(self, screenshot: Image.Image) -> str:
         """
-        Get a hash of the current screen for change detection
+        Get a hash of the screen content for change detection
         
+        Args:
+            screenshot: Optimized PIL Image object
+            
         Returns:
-            MD5 hash of screen content
+            MD5 hash of the raw pixel data
         """
-        try:
-            # Take a small screenshot for hashing
-            small_screenshot = pyautogui.screenshot(region=(0, 0, 200, 200))
-            
-            # Convert to bytes
-            buffer = BytesIO()
-            small_screenshot.save(buffer, format='PNG')
-            screenshot_bytes = buffer.getvalue()
-            
-            # Calculate hash
-            return hashlib.md5(screenshot_bytes).hexdigest()
-            
-        except Exception as e:
-            logger.warning(f"Failed to calculate screen hash: {e}")
-            return str(time.time())  # Fallback to timestamp
+        return hashlib.md5(screenshot.tobytes()).hexdigest()
     
     def _update_cache(self, hash_key: str, screenshot_b64: str):
         """
@@ -182,6 +213,9 @@ class ScreenshotManager:
         self.cache.clear()
         self.cache_order.clear()
         self.last_hash = None
+        self.checkpoint_hash = None
+        self.last_phash = None
+        self.last_unchanged = False
         logger.info("Screenshot cache cleared")
     
     def get_cache_stats(self) -> dict:
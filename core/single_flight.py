@@ -0,0 +1,141 @@
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from core.exceptions import DeadlineExceededError
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """
+    Collapses identical calls of all processes sharing a SQLite file into one
+
+    The first caller of a key claims it in an IMMEDIATE transaction and runs
+    the function; callers arriving while the claim is open poll the file and
+    receive the stored response. If the leader fails, its claim is removed
+    and the next waiting caller runs the call itself. A claim older than
+    lease_ttl is treated as abandoned (crashed process). Finished responses
+    are only handed to callers that were already waiting, so nothing is
+    cached; rows are kept for result_ttl seconds so slow pollers find them.
+    """
+
+    def __init__(self, path: str, lease_ttl: float = 120.0, result_ttl: float = 10.0,
+                 poll_interval: float = 0.05, busy_timeout: float = 5.0):
+        self.path = path
+        self.lease_ttl = lease_ttl
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.calls = 0
+        self.coalesced = 0
+        self.takeovers = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS flights ('
+            'key TEXT PRIMARY KEY, owner TEXT, started REAL, finished REAL, response TEXT)'
+        )
+        logger.info(f"Single-flight table opened at {path} (lease_ttl={lease_ttl}s)")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Serialise access within the process and across processes"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def _claim(self, key: str, arrived: float) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Claim a key or look up the call holding it
+
+        Returns:
+            (owner token, None) if this caller leads the call,
+            (None, response) if a call it waited for has finished,
+            (None, None) if another call is still in flight
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                'DELETE FROM flights WHERE (finished IS NULL AND started < ?) OR finished < ?',
+                (now - self.lease_ttl, now - self.result_ttl)
+            )
+            row = conn.execute('SELECT finished, response FROM flights WHERE key = ?', (key,)).fetchone()
+            if row is not None and row[0] is None:
+                return None, None
+            if row is not None and row[0] >= arrived:
+                return None, row[1]
+            # Free, or finished before this caller arrived: run it again
+            owner = uuid.uuid4().hex
+            conn.execute('INSERT OR REPLACE INTO flights (key, owner, started) VALUES (?, ?, ?)', (key, owner, now))
+        return owner, None
+
+    def _finish(self, key: str, owner: str, response: Optional[str]):
+        """Publish the response of a claim, or release the claim if response is None"""
+        with self._transaction() as conn:
+            if response is None:
+                conn.execute('DELETE FROM flights WHERE key = ? AND owner = ?', (key, owner))
+            else:
+                conn.execute('UPDATE flights SET finished = ?, response = ? WHERE key = ? AND owner = ?',
+                             (time.time(), response, key, owner))
+
+    def do(self, key: str, fn: Callable[[], str], timeout: Optional[float] = None) -> str:
+        """
+        Run fn unless an identical call is in flight, then share its response
+
+        Args:
+            key: Identity of the call
+            fn: Function performing the call, returning the response text
+            timeout: Seconds a waiting caller waits for the in-flight call;
+                without one it waits until the call's lease expires
+
+        Raises:
+            DeadlineExceededError: If a waiting caller's timeout ran out
+        """
+        arrived = time.time()
+        waiting = False
+        while True:
+            owner, response = self._claim(key, arrived)
+            if response is not None:
+                self.coalesced += 1
+                logger.info(f"Received response of identical request {key[:8]} from another caller")
+                return response
+            if owner is not None:
+                break
+            if not waiting:
+                waiting = True
+                logger.info(f"Waiting for identical in-flight request {key[:8]}...")
+            if timeout is not None and time.time() - arrived >= timeout:
+                raise DeadlineExceededError(f"In-flight request {key[:8]} did not finish within {timeout:.1f}s",
+                                            timeout)
+            time.sleep(self.poll_interval)
+
+        self.calls += 1
+        if waiting:
+            # The previous leader failed or was abandoned
+            self.takeovers += 1
+        response = None
+        try:
+            response = fn()
+            return response
+        finally:
+            self._finish(key, owner, response)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._transaction() as conn:
+            in_flight = conn.execute('SELECT COUNT(*) FROM flights WHERE finished IS NULL').fetchone()[0]
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'takeovers': self.takeovers,
+            'in_flight': in_flight,
+            'path': self.path
+        }
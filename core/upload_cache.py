@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class UploadCache:
+    """
+    Maps frame hashes to remote file handles of a provider until they expire
+
+    Frames are only worth uploading once they are sent a second time (an
+    unchanged screen, a retry or a fallback to another model), so the cache
+    also counts how often each frame was used.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.uploads = 0
+        self.invalidations = 0
+        self._handles: Dict[str, Tuple[str, float]] = {}
+        self._uses: 'OrderedDict[str, int]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record_use(self, frame_hash: str) -> int:
+        """
+        Count a request containing the frame
+
+        Returns:
+            Number of requests that contained the frame so far
+        """
+        with self._lock:
+            uses = self._uses.pop(frame_hash, 0) + 1
+            self._uses[frame_hash] = uses
+            while len(self._uses) > self.max_entries:
+                self._uses.popitem(last=False)
+            return uses
+
+    def get(self, frame_hash: str) -> Optional[str]:
+        """Get the handle of an uploaded frame unless it is about to expire"""
+        with self._lock:
+            entry = self._handles.get(frame_hash)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._handles[frame_hash]
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, frame_hash: str, handle: str, expires_at: Optional[float] = None):
+        """
+        Remember the handle of an uploaded frame
+
+        Args:
+            frame_hash: Hash of the frame (see ScreenshotManager.compute_frame_hash)
+            handle: Provider URI or name of the uploaded file
+            expires_at: Expiry reported by the provider, capped by the ttl
+        """
+        now = time.time()
+        expiry = now + self.ttl if expires_at is None else min(expires_at, now + self.ttl)
+        with self._lock:
+            self.uploads += 1
+            self._handles[frame_hash] = (handle, expiry)
+            if len(self._handles) > self.max_entries:
+                expired = [key for key, (_, until) in self._handles.items() if until <= now]
+                for key in expired or [next(iter(self._handles))]:
+                    del self._handles[key]
+
+    def invalidate(self, handle: str):
+        """Forget a handle the provider no longer accepts"""
+        with self._lock:
+            for frame_hash, (cached_handle, _) in list(self._handles.items()):
+                if cached_handle == handle:
+                    del self._handles[frame_hash]
+                    self.invalidations += 1
+        logger.info(f"Dropped uploaded file {handle} from the upload cache")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._handles),
+                'uploads': self.uploads,
+                'hits': self.hits,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,159 @@
+import logging
+import threading
+from typing import Any, Dict, Mapping, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Pricing entry applying to all models of a provider without their own entry
+DEFAULT_PRICE = '*'
+
+TOKENS_PER_PRICE_UNIT = 1_000_000
+
+class UsageTotals:
+    """
+    Token counts and estimated cost summed over a number of responses
+    """
+
+    def __init__(self):
+        self.responses = 0
+        self.prompt_tokens = 0
+        self.image_tokens = 0
+        self.cached_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.estimated_responses = 0
+
+    def add(self, prompt_tokens: int, image_tokens: int, cached_tokens: int, output_tokens: int, cost: float,
+            estimated: bool = False):
+        self.responses += 1
+        if estimated:
+            self.estimated_responses += 1
+        self.prompt_tokens += prompt_tokens
+        self.image_tokens += image_tokens
+        self.cached_tokens += cached_tokens
+        self.output_tokens += output_tokens
+        self.cost += cost
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'responses': self.responses,
+            'prompt_tokens': self.prompt_tokens,
+            'image_tokens': self.image_tokens,
+            'cached_tokens': self.cached_tokens,
+            'output_tokens': self.output_tokens,
+            'cost': self.cost,
+            'estimated_responses': self.estimated_responses
+        }
+
+class UsageTracker:
+    """
+    Token and cost accounting per model, iteration and session
+
+    Prices are configured per provider as {model: {'input': usd, 'cached_input':
+    usd, 'output': usd}} in USD per million tokens; model entries match by
+    prefix and '*' applies to all other models of the provider. Image tokens
+    are part of the prompt tokens and billed as input. A cost reported by the
+    API takes precedence over the estimate. Responses whose token counts are
+    themselves estimates (streams cancelled before the usage event) are
+    counted separately.
+    """
+
+    def __init__(self, pricing: Optional[Mapping[str, Mapping[str, Mapping[str, float]]]] = None):
+        self.pricing = pricing or {}
+        self.session = UsageTotals()
+        self.iteration = UsageTotals()
+        self.iterations = 0
+        self.models: Dict[Tuple[str, str], UsageTotals] = {}
+        self.unpriced_models: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def get_price(self, provider: str, model: str) -> Optional[Mapping[str, float]]:
+        """Get the price entry for a model (longest prefix match, then '*')"""
+        provider_prices = self.pricing.get(provider, {})
+        matches = [prefix for prefix in provider_prices if prefix != DEFAULT_PRICE and model.startswith(prefix)]
+        if matches:
+            return provider_prices[max(matches, key=len)]
+        return provider_prices.get(DEFAULT_PRICE)
+
+    def estimate_cost(self, provider: str, model: str, prompt_tokens: int, cached_tokens: int,
+                      output_tokens: int) -> Optional[float]:
+        """
+        Estimate the cost of one response in USD
+
+        Returns:
+            Estimated cost, or None if no price is configured for the model
+        """
+        price = self.get_price(provider, model)
+        if price is None:
+            return None
+        input_price = price.get('input', 0.0)
+        cached_price = price.get('cached_input', input_price)
+        cost = (
+            (prompt_tokens - cached_tokens) * input_price
+            + cached_tokens * cached_price
+            + output_tokens * price.get('output', 0.0)
+        )
+        return cost / TOKENS_PER_PRICE_UNIT
+
+    def record(self, provider: str, model: str, prompt_tokens: int, image_tokens: int = 0,
+               cached_tokens: int = 0, output_tokens: int = 0, cost: Optional[float] = None,
+               estimated: bool = False) -> float:
+        """
+        Record the usage of one response
+
+        Args:
+            provider: Provider name
+            model: Model that produced the response
+            prompt_tokens: Input tokens including image and cached tokens
+            image_tokens: Input tokens spent on the screenshot
+            cached_tokens: Input tokens served from the provider's prompt cache
+            output_tokens: Generated tokens (including thinking tokens)
+            cost: Cost reported by the API in USD, if any
+            estimated: Token counts are a client-side estimate, not reported
+                by the API
+
+        Returns:
+            Cost attributed to the response in USD
+        """
+        if cost is None:
+            cost = self.estimate_cost(provider, model, prompt_tokens, cached_tokens, output_tokens)
+        if cost is None:
+            name = f"{provider}/{model}"
+            if name not in self.unpriced_models:
+                logger.info(f"No pricing configured for {name}, counting its cost as 0")
+                self.unpriced_models.add(name)
+            cost = 0.0
+
+        with self._lock:
+            totals = self.models.setdefault((provider, model), UsageTotals())
+            for target in (totals, self.iteration, self.session):
+                target.add(prompt_tokens, image_tokens, cached_tokens, output_tokens, cost, estimated)
+        return cost
+
+    def start_iteration(self):
+        """Start accounting a new automation iteration"""
+        with self._lock:
+            if self.iteration.responses:
+                self.iterations += 1
+            self.iteration = UsageTotals()
+
+    def get_iteration_usage(self) -> Dict[str, Any]:
+        """Get the usage of the current iteration"""
+        with self._lock:
+            return self.iteration.as_dict()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get session totals, per-model usage and the average per iteration"""
+        with self._lock:
+            iterations = self.iterations + (1 if self.iteration.responses else 0)
+            return {
+                'session': self.session.as_dict(),
+                'iterations': iterations,
+                'avg_cost_per_iteration': self.session.cost / max(iterations, 1),
+                'avg_prompt_tokens_per_iteration': self.session.prompt_tokens / max(iterations, 1),
+                'models': {
+                    f"{provider}/{model}": totals.as_dict()
+                    for (provider, model), totals in self.models.items()
+                },
+                'unpriced_models': sorted(self.unpriced_models)
+            }
@@ -221,7 +221,7 @@ def main():
     }
     
     # Konfiguration prüfen
-    if not Config.validate_config():
+    if Config.failed_validations():
         print("❌ Konfiguration ungültig. Bitte überprüfen Sie Ihre .env-Datei.")
         return
     
@@ -5,6 +5,7 @@ Modular architecture with improved error handling and performance
 """
 
 import argparse
+import json
 import logging
 import sys
 import time
@@ -19,9 +20,14 @@ from config import Config
 from core.llm_manager import LLMManager
 from core.screenshot_manager import ScreenshotManager
 from core.action_executor import ActionExecutor
+from core.deadline import Deadline
+from core.evaluation import Evaluator, format_report, load_cases
+from core.model_cascade import ModelCascade
+from core.prompt_builder import PromptBuilder
+from core.screen_index import ScreenSimilarityIndex, SimilarScreen
 from core.exceptions import (
     LLMAutomationError, ConfigurationError, ProviderUnavailableError,
-    MaxIterationsError, JSONParsingError, ActionValidationError
+    MaxIterationsError, JSONParsingError, ActionValidationError, RateLimitError, DeadlineExceededError
 )
 from utils.json_parser import RobustJSONParser
 
@@ -36,13 +42,14 @@ class EnhancedLLMAutomationApp:
         self.setup_logging()
         
         # Validate configuration
-        validation_status = Config.validate_config()
-        if not all(validation_status.values()):
-            failed_validations = [k for k, v in validation_status.items() if not v]
+        failed_validations = Config.failed_validations()
+        if failed_validations:
             raise ConfigurationError(f"Configuration validation failed: {failed_validations}")
         
         # Initialize components
         self.llm_manager = LLMManager(self.config)
+        if self.config.ENABLE_WARMUP_PROBE:
+            self.llm_manager.warm_up()
         if provider:
             self.llm_manager.switch_provider(provider)
         self.screenshot_manager = ScreenshotManager(
@@ -50,8 +57,25 @@ class EnhancedLLMAutomationApp:
             compression_quality=85,
             resize_factor=0.8
         )
-        self.action_executor = ActionExecutor(self.config)
+        self.action_executor = ActionExecutor(
+            self.config,
+            screen_change_check=self.screenshot_manager.check_screen_changed
+        )
         self.json_parser = RobustJSONParser()
+        self.screen_index = None
+        if self.config.ENABLE_SCREEN_INDEX:
+            self.screen_index = ScreenSimilarityIndex(
+                max_distance=self.config.SCREEN_INDEX_HINT_DISTANCE,
+                max_entries=self.config.SCREEN_INDEX_MAX_ENTRIES,
+                path=self.config.SCREEN_INDEX_PATH
+            )
+        self.last_reused_screen = None
+        self.escalate_next = False
+        self.expect_screen_change = False
+        # What went wrong in the previous iteration, told to the model once
+        self.recovery_note: Optional[str] = None
+        self.prompt_builder = PromptBuilder(self.config.PROMPT_TOKEN_BUDGET, self.config.PROMPT_HISTORY_SIZE)
+        self.system_prompt = self.prompt_builder.system_prompt
         
         # Application state
         self.iteration_count = 0
@@ -61,6 +85,8 @@ class EnhancedLLMAutomationApp:
             'successful_actions': 0,
             'llm_requests': 0,
             'screenshots_taken': 0,
+            'time_to_action': [],
+            'similar_screen_hits': 0,
             'errors': []
         }
         
@@ -79,34 +105,6 @@ class EnhancedLLMAutomationApp:
             ]
         )
     
-    def create_system_prompt(self) -> str:
-        """Create the system prompt for the LLM"""
-        return """
-Du bist ein KI-Assistent für GUI-Automatisierung. Du kannst Screenshots analysieren und Aktionen ausführen.
-
-Verfügbare Aktionen:
-1. click - Klicke auf eine Position: {"action": "click", "x": 100, "y": 200}
-2. double_click - Doppelklick: {"action": "double_click", "x": 100, "y": 200}
-3. right_click - Rechtsklick: {"action": "right_click", "x": 100, "y": 200}
-4. type - Text eingeben: {"action": "type", "text": "Hallo Welt"}
-5. key - Taste drücken: {"action": "key", "key": "enter"} oder {"action": "key", "key": "ctrl+c"}
-6. scroll - Scrollen: {"action": "scroll", "x": 500, "y": 300, "clicks": -3}
-7. move_mouse - Maus bewegen: {"action": "move_mouse", "x": 100, "y": 200}
-8. navigate - URL öffnen: {"action": "navigate", "url": "https://example.com"}
-9. wait - Warten: {"action": "wait", "seconds": 2}
-10. next_prompt - Nächste Anweisung anfordern: {"action": "next_prompt", "prompt": "Beschreibung"}
-11. complete - Aufgabe abgeschlossen: {"action": "complete", "message": "Erfolgreich"}
-12. error - Fehler melden: {"action": "error", "message": "Fehlerbeschreibung"}
-
-WICHTIG:
-- Antworte IMMER mit gültigem JSON
-- Analysiere den Screenshot sorgfältig
-- Verwende präzise Koordinaten
-- Bei Unsicherheit verwende 'next_prompt' für weitere Anweisungen
-- Bei Problemen verwende 'error' mit Beschreibung
-- Bei erfolgreicher Aufgabenerledigung verwende 'complete'
-"""
-    
     def run_automation(self, user_prompt: str) -> bool:
         """Run the automation process with enhanced error handling"""
         try:
@@ -116,52 +114,59 @@ WICHTIG:
             while self.iteration_count < self.config.MAX_ITERATIONS:
                 self.iteration_count += 1
                 self.logger.info(f"Iteration {self.iteration_count}/{self.config.MAX_ITERATIONS}")
+                self.llm_manager.usage_tracker.start_iteration()
+                deadline = Deadline(self.config.ITERATION_DEADLINE)
                 
                 try:
                     # Take screenshot
-                    screenshot_path = self.screenshot_manager.get_screenshot()
-                    if not screenshot_path:
+                    image_b64 = self.screenshot_manager.get_screenshot()
+                    if not image_b64:
                         raise LLMAutomationError("Failed to capture screenshot")
                     
                     self.session_stats['screenshots_taken'] += 1
                     
-                    # Send to LLM
-                    system_prompt = self.create_system_prompt()
-                    full_prompt = f"{system_prompt}\n\nUser: {current_prompt}"
-                    
-                    # Convert screenshot to base64
-                    import base64
-                    with open(screenshot_path, 'rb') as img_file:
-                        image_b64 = base64.b64encode(img_file.read()).decode('utf-8')
-                    
-                    self.logger.debug(f"Sending request to LLM with prompt length: {len(full_prompt)}")
-                    self.logger.debug(f"Image base64 length: {len(image_b64)}")
-                    
-                    response = self.llm_manager.send_request(
-                        prompt=full_prompt,
-                        image_b64=image_b64
-                    )
-                    
-                    self.logger.debug(f"LLM response received: {response is not None}")
-                    if response:
-                        self.logger.debug(f"Response length: {len(str(response))}")
+                    # Ask a stronger model if the last answer was unusable or
+                    # the last action did not change anything
+                    escalate = self.escalate_next
+                    if self.expect_screen_change and self.screenshot_manager.last_unchanged:
+                        self.logger.info("Previous action had no visible effect")
+                        self.llm_manager.report_no_effect()
+                        escalate = True
+                        self.recovery_note = "Die letzte Aktion hatte keine sichtbare Wirkung."
+                    self.escalate_next = False
+                    self.expect_screen_change = False
                     
-                    if not response:
-                        raise LLMAutomationError("No response from LLM")
-                    
-                    self.session_stats['llm_requests'] += 1
-                    
-                    # Parse JSON response
-                    try:
-                        action_data = self.json_parser.parse_json(response)
-                        if not self.json_parser.validate_action(action_data):
-                            raise ActionValidationError("Invalid action data", action_data)
-                    except Exception as e:
-                        raise JSONParsingError(f"Failed to parse LLM response: {e}", response)
+                    # Reuse the action from a near-identical screen or ask the LLM
+                    request_prompt = current_prompt
+                    similar_screen = self._find_similar_screen(request_prompt)
+                    if self._can_reuse_similar_action(similar_screen):
+                        self.logger.info(f"Reusing action from similar screen (distance {similar_screen.distance})")
+                        action_data = dict(similar_screen.action)
+                        self.last_reused_screen = similar_screen.entry_id
+                        self.session_stats['similar_screen_hits'] += 1
+                    else:
+                        # The manager sends a follow-up only if the model already has this frame
+                        action_data = self._request_action(request_prompt, image_b64, similar_screen, escalate,
+                                                           deadline, self.config.ENABLE_FOLLOW_UP_TURNS)
+                        self.last_reused_screen = None
+                    self.recovery_note = None
                     
                     # Execute action
+                    successful_before = self.action_executor.successful_actions
                     result = self.action_executor.execute_action(action_data)
                     self.session_stats['total_actions'] += 1
+                    self.prompt_builder.record_action(action_data)
+                    
+                    # An aborted plan still ran some steps; it counts for no-effect
+                    # detection but is not worth replaying
+                    plan_aborted = action_data['action'] == 'plan' and self.action_executor.last_plan_aborted
+                    if self.action_executor.successful_actions > successful_before:
+                        if not plan_aborted:
+                            self._remember_screen_action(request_prompt, image_b64, action_data)
+                        self.expect_screen_change = (
+                            self.last_reused_screen is None
+                            and action_data['action'] in ActionExecutor.SCREEN_CHANGING_ACTIONS
+                        )
                     
                     if result == "COMPLETE":
                         self.logger.info("Task completed successfully")
@@ -185,9 +190,24 @@ WICHTIG:
                 except (JSONParsingError, ActionValidationError) as e:
                     self.logger.error(f"Iteration {self.iteration_count} failed: {e}")
                     self.session_stats['errors'].append(str(e))
+                    self.escalate_next = True
+                    
+                    # Continue with the same task and a recovery note
+                    self.recovery_note = str(e)
+                    continue
+                    
+                except DeadlineExceededError as e:
+                    # Retry the same step with a fresh budget
+                    self.logger.warning(f"Iteration {self.iteration_count}: {e}")
+                    self.session_stats['errors'].append(str(e))
+                    continue
                     
-                    # Try to continue with a recovery prompt
-                    current_prompt = f"Es gab einen Fehler: {e}. Bitte analysiere den aktuellen Screenshot und fahre fort."
+                except RateLimitError as e:
+                    # Only raised when every provider and model is cooling down
+                    wait = min(e.retry_after or self.config.RATE_LIMIT_BACKOFF, self.config.RATE_LIMIT_BACKOFF)
+                    self.logger.warning(f"All models rate limited, waiting {wait:.1f}s")
+                    self.session_stats['errors'].append(str(e))
+                    time.sleep(wait)
                     continue
                     
                 except Exception as e:
@@ -196,7 +216,7 @@ WICHTIG:
                     
                     # Try to recover
                     if self.iteration_count < self.config.MAX_ITERATIONS - 1:
-                        current_prompt = "Bitte analysiere den aktuellen Screenshot und fahre mit der Aufgabe fort."
+                        self.recovery_note = str(e)
                         continue
                     else:
                         break
@@ -215,8 +235,99 @@ WICHTIG:
             self.session_stats['errors'].append(str(e))
             return False
         finally:
+            if self.screen_index is not None:
+                self.screen_index.save()
             self._log_session_summary()
     
+    def _request_action(self, prompt: str, image_b64: str, similar_screen: Optional[SimilarScreen],
+                        escalate: bool = False, deadline: Optional[Deadline] = None,
+                        follow_up: bool = False) -> dict:
+        """Ask the LLM for the next action and parse its response"""
+        built = self.prompt_builder.build(
+            prompt,
+            hint=similar_screen.action if similar_screen is not None else None,
+            recovery=self.recovery_note
+        )
+        full_prompt = built.text
+        self.logger.info(
+            "Prompt tokens (est.): " + ", ".join(f"{section} {count}" for section, count in built.tokens.items())
+            + f", total {built.total_tokens}" + (" (trimmed to budget)" if built.trimmed else "")
+        )
+        
+        self.logger.debug(f"Sending request to LLM with prompt length: {len(full_prompt)}")
+        self.logger.debug(f"Image base64 length: {len(image_b64)}")
+        
+        request_start = time.time()
+        response = self.llm_manager.send_request(
+            prompt=full_prompt,
+            image_b64=image_b64,
+            frame_hash=ScreenshotManager.compute_frame_hash(image_b64),
+            system_prompt=self.system_prompt,
+            escalate=escalate,
+            deadline=deadline,
+            follow_up=follow_up
+        )
+        time_to_action = time.time() - request_start
+        
+        self.logger.debug(f"LLM response received: {response is not None}")
+        if response:
+            self.logger.debug(f"Response length: {len(str(response))}")
+        
+        if not response:
+            raise LLMAutomationError("No response from LLM")
+        
+        self.logger.info(f"Time to action: {time_to_action:.2f}s")
+        self._log_iteration_usage()
+        self.session_stats['time_to_action'].append(time_to_action)
+        self.session_stats['llm_requests'] += 1
+        
+        # Parse JSON response
+        try:
+            action_data = self.json_parser.parse_llm_response(response)
+            if not self.json_parser.validate_action_data(action_data):
+                raise ActionValidationError("Invalid action data", action_data)
+        except Exception as e:
+            self.llm_manager.report_parse_result(False)
+            # A text-only repair is much cheaper than a new iteration with a
+            # fresh screenshot
+            if self.config.ENABLE_RESPONSE_REPAIR:
+                action_data = self.llm_manager.repair_response(response, str(e), deadline)
+                if action_data is not None:
+                    return action_data
+            raise JSONParsingError(f"Failed to parse LLM response: {e}", response)
+        
+        self.llm_manager.report_parse_result(True)
+        return action_data
+    
+    def _find_similar_screen(self, prompt: str) -> Optional[SimilarScreen]:
+        """Look up the closest previously seen screen for this prompt"""
+        if self.screen_index is None or self.screenshot_manager.last_phash is None:
+            return None
+        return self.screen_index.nearest(
+            self.screenshot_manager.last_phash,
+            context=prompt,
+            max_distance=self.config.SCREEN_INDEX_HINT_DISTANCE
+        )
+    
+    def _can_reuse_similar_action(self, similar_screen: Optional[SimilarScreen]) -> bool:
+        """Check whether a similar screen is close enough to skip the LLM call"""
+        if similar_screen is None or similar_screen.distance > self.config.SCREEN_INDEX_HIT_DISTANCE:
+            return False
+        # Never replay the same stored action twice in a row; if it had no
+        # effect the screen is unchanged and we would loop
+        return similar_screen.entry_id != self.last_reused_screen
+    
+    def _remember_screen_action(self, prompt: str, image_b64: str, action_data: dict):
+        """Store a successfully executed action for the current screen"""
+        if self.screen_index is None or self.screenshot_manager.last_phash is None:
+            return
+        self.screen_index.add(
+            self.screenshot_manager.last_phash,
+            action_data,
+            context=prompt,
+            frame_hash=ScreenshotManager.compute_frame_hash(image_b64)
+        )
+    
     def _log_session_summary(self):
         """Log session statistics and summary"""
         duration = time.time() - self.session_stats['start_time']
@@ -226,6 +337,10 @@ WICHTIG:
         self.logger.info(f"Iterations: {self.iteration_count}")
         self.logger.info(f"Screenshots taken: {self.session_stats['screenshots_taken']}")
         self.logger.info(f"LLM requests: {self.session_stats['llm_requests']}")
+        
+        if self.session_stats['time_to_action']:
+            avg_time_to_action = sum(self.session_stats['time_to_action']) / len(self.session_stats['time_to_action'])
+            self.logger.info(f"Average time to action: {avg_time_to_action:.2f}s")
         self.logger.info(f"Total actions: {self.session_stats['total_actions']}")
         self.logger.info(f"Successful actions: {self.session_stats['successful_actions']}")
         
@@ -244,9 +359,76 @@ WICHTIG:
         screenshot_stats = self.screenshot_manager.get_cache_stats()
         
         self.logger.info("=== Component Statistics ===")
+        self._log_usage_summary(llm_stats['usage'], llm_stats['successful_requests'])
+        if 'cascade' in llm_stats:
+            self._log_cascade_summary(llm_stats['cascade'])
+        if llm_stats['follow_up_requests']:
+            self.logger.info(f"Follow-up requests without screenshot: {llm_stats['follow_up_requests']}")
+        repair = llm_stats['repair']
+        if repair['attempts']:
+            self.logger.info(
+                f"Response repairs: {repair['successes']}/{repair['attempts']} successful "
+                f"({repair['success_rate']:.0%}), avg latency {repair['avg_latency']:.2f}s, "
+                f"estimated cost ${repair['usage']['cost']:.4f}"
+            )
         self.logger.info(f"LLM Manager: {llm_stats}")
         self.logger.info(f"Action Executor: {action_stats}")
+        if action_stats['plans_executed']:
+            self.logger.info(
+                f"Plans: {action_stats['plans_executed']} executed, {action_stats['plans_aborted']} aborted, "
+                f"{action_stats['plan_steps_executed']} steps in {action_stats['plans_executed']} LLM calls"
+            )
         self.logger.info(f"Screenshot Manager: {screenshot_stats}")
+        self.logger.info(f"Prompt Builder: {self.prompt_builder.get_stats()}")
+        if self.screen_index is not None:
+            self.logger.info(f"Similar screen hits: {self.session_stats['similar_screen_hits']}")
+            self.logger.info(f"Screen Index: {self.screen_index.get_stats()}")
+    
+    def _log_iteration_usage(self):
+        """Log the tokens and estimated cost of the current iteration so far"""
+        usage = self.llm_manager.usage_tracker.get_iteration_usage()
+        if not usage['responses']:
+            return
+        self.logger.info(
+            f"Iteration usage: {usage['prompt_tokens']} prompt tokens ({usage['image_tokens']} image, "
+            f"{usage['cached_tokens']} cached), {usage['output_tokens']} output tokens, "
+            f"estimated cost ${usage['cost']:.5f}"
+        )
+    
+    def _log_usage_summary(self, usage_stats: dict, successful_requests: int):
+        """Log session token usage and estimated cost, per model"""
+        session = usage_stats['session']
+        self.logger.info(
+            f"Tokens: {session['prompt_tokens']} prompt ({session['image_tokens']} image, "
+            f"{session['cached_tokens']} cached), {session['output_tokens']} output "
+            f"(usage reported for {session['responses']}/{successful_requests} responses)"
+        )
+        if session['estimated_responses']:
+            self.logger.info(f"  {session['estimated_responses']} of them estimated (stream cancelled before usage)")
+        self.logger.info(
+            f"Estimated cost: ${session['cost']:.4f} "
+            f"(avg ${usage_stats['avg_cost_per_iteration']:.5f} and "
+            f"{usage_stats['avg_prompt_tokens_per_iteration']:.0f} prompt tokens per iteration)"
+        )
+        for model, usage in usage_stats['models'].items():
+            self.logger.info(
+                f"  {model}: {usage['responses']} responses, {usage['prompt_tokens']} prompt / "
+                f"{usage['output_tokens']} output tokens, ${usage['cost']:.4f}"
+            )
+    
+    def _log_cascade_summary(self, cascade_stats: dict):
+        """Log per-tier hit rates and latency saved by the model cascade"""
+        for tier, stats in cascade_stats['tiers'].items():
+            if not stats['requests']:
+                continue
+            self.logger.info(
+                f"Cascade {tier} tier: {stats['requests']} requests, hit rate {stats['hit_rate']:.0%}, "
+                f"avg latency {stats['avg_latency']:.2f}s"
+            )
+        if cascade_stats['escalations']:
+            self.logger.info(f"Cascade escalations: {cascade_stats['escalations']}")
+        if cascade_stats['estimated_latency_saved'] is not None:
+            self.logger.info(f"Estimated latency saved by cascade: {cascade_stats['estimated_latency_saved']:.2f}s")
 
 def select_provider(config: Config) -> str:
     """Select the best available LLM provider"""
@@ -256,9 +438,43 @@ def select_provider(config: Config) -> str:
         return 'openrouter'
     elif validation_status.get('google_available', False):
         return 'google'
+    elif validation_status.get('local_available', False):
+        return 'local'
     else:
         raise ProviderUnavailableError("No LLM providers available. Please configure API keys.")
 
+def run_evaluation(config: Config, args) -> int:
+    """Evaluate models on a directory of recorded frames and print the report"""
+    logging.basicConfig(level=getattr(logging, config.LOG_LEVEL), format=config.LOG_FORMAT)
+    
+    cases = load_cases(args.eval)
+    if not cases:
+        print(f"No evaluation cases found in {args.eval}")
+        return 1
+    
+    llm_manager = LLMManager(config)
+    targets = None
+    if args.eval_models:
+        targets = ModelCascade.parse_targets(args.eval_models.split(','))
+    
+    evaluator = Evaluator(
+        llm_manager,
+        prompt_builder=PromptBuilder(config.PROMPT_TOKEN_BUDGET, history_size=0),
+        workers=args.eval_workers or config.EVAL_WORKERS,
+        tolerance=args.eval_tolerance if args.eval_tolerance is not None else config.EVAL_COORDINATE_TOLERANCE,
+        max_wait=config.MAX_WAIT_TIME
+    )
+    report = evaluator.run(cases, targets)
+    
+    print(f"\nEvaluation on {len(cases)} frames:")
+    print(format_report(report))
+    
+    if args.eval_output:
+        with open(args.eval_output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nReport written to {args.eval_output}")
+    return 0
+
 def main():
     """Main entry point with enhanced argument parsing and error handling"""
     parser = argparse.ArgumentParser(
@@ -269,6 +485,7 @@ Examples:
   python main.py "Öffne Google und suche nach Python"
   python main.py --provider google "Navigiere zu Wikipedia"
   python main.py --validate-config
+  python main.py --eval recordings/ --eval-workers 8
         """
     )
     
@@ -280,7 +497,7 @@ Examples:
     
     parser.add_argument(
         '--provider',
-        choices=['openrouter', 'google', 'auto'],
+        choices=['openrouter', 'google', 'local', 'auto'],
         default='auto',
         help='LLM provider to use (default: auto-select)'
     )
@@ -291,6 +508,35 @@ Examples:
         help='Validate configuration and exit'
     )
     
+    parser.add_argument(
+        '--eval',
+        metavar='DIR',
+        help='Evaluate all configured models on recorded frames in DIR and exit'
+    )
+    
+    parser.add_argument(
+        '--eval-models',
+        help='Comma-separated provider:model pairs to evaluate (default: all configured)'
+    )
+    
+    parser.add_argument(
+        '--eval-workers',
+        type=int,
+        help='Concurrent evaluation requests (default: EVAL_WORKERS)'
+    )
+    
+    parser.add_argument(
+        '--eval-tolerance',
+        type=float,
+        help='Allowed coordinate deviation in pixels (default: EVAL_COORDINATE_TOLERANCE)'
+    )
+    
+    parser.add_argument(
+        '--eval-output',
+        metavar='FILE',
+        help='Write the evaluation report as JSON to FILE'
+    )
+    
     parser.add_argument(
         '--log-level',
         choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
@@ -323,19 +569,25 @@ Examples:
                 status = "✓" if value else "✗"
                 print(f"  {status} {key}: {value}")
             
-            if all(validation_status.values()):
+            if not config.failed_validations(validation_status):
                 print("\n✓ Configuration is valid")
                 return 0
             else:
                 print("\n✗ Configuration has issues")
                 return 1
         
+        if args.eval:
+            return run_evaluation(config, args)
+        
         # Require prompt if not validating config
         if not args.prompt:
-            parser.error("Prompt is required unless using --validate-config")
+            parser.error("Prompt is required unless using --validate-config or --eval")
         
         # Select provider
-        if args.provider == 'auto':
+        if args.provider == 'auto' and config.ENABLE_WARMUP_PROBE:
+            # The warm-up probe picks the fastest available model
+            provider = None
+        elif args.provider == 'auto':
             provider = select_provider(config)
             print(f"Auto-selected provider: {provider}")
         else:
@@ -344,7 +596,7 @@ Examples:
         # Initialize and run application
         app = EnhancedLLMAutomationApp(provider=provider)
         
-        print(f"Starting automation with provider: {provider}")
+        print(f"Starting automation with provider: {provider or app.llm_manager.current_provider}")
         print(f"Task: {args.prompt}")
         print("Press Ctrl+C to stop\n")
         
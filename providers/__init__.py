@@ -1,7 +1,26 @@
 """LLM Provider modules"""
 
-from .base_provider import BaseLLMProvider
-from .openrouter_provider import OpenRouterProvider
-from .google_provider import GoogleProvider
+import importlib
 
-__all__ = ['BaseLLMProvider', 'OpenRouterProvider', 'GoogleProvider']
\ No newline at end of file
+from .registry import ProviderRegistry, ProviderSpec
+
+# Provider classes are imported on first attribute access (PEP 562) so that
+# importing the package does not pull in every backend
+_LAZY_ATTRIBUTES = {
+    'BaseLLMProvider': '.base_provider',
+    'OpenRouterProvider': '.openrouter_provider',
+    'GoogleProvider': '.google_provider',
+    'LocalProvider': '.local_provider',
+}
+
+__all__ = ['BaseLLMProvider', 'OpenRouterProvider', 'GoogleProvider', 'LocalProvider', 'ProviderRegistry', 'ProviderSpec']
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
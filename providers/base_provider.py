@@ -1,51 +1,395 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Set, Sequence
+import json
 import time
 import logging
+import threading
+
+import requests
+from urllib3.exceptions import ReadTimeoutError
+
+from core.api_key_pool import ApiKeyPool
+from core.exceptions import (
+    APIError, AuthenticationError, InvalidRequestError, KeyRetiredError, RateLimitError, ServerError,
+    TimeoutError, TruncatedResponseError
+)
+from core.conversation import ConversationTurn
+from core.generation_profile import GenerationProfile, GenerationProfiles
+from core.prompt_builder import estimate_tokens
+from core.rate_limiter import parse_retry_after
+from utils.json_parser import IncrementalJSONParser
 
 logger = logging.getLogger(__name__)
 
+# Rough input tokens of one resized screenshot, used only when a provider
+# reports no usage (vision models bill roughly 1000-1800 tokens for it)
+ESTIMATED_IMAGE_TOKENS = 1500
+
+# Parameter names an API error must mention to count as a rejected response
+# schema; other 400s (bad image, context too long) keep structured output on
+STRUCTURED_OUTPUT_ERROR_MARKERS = ('response_format', 'responseschema', 'response_schema')
+
+# Leading base64 characters of the image formats sent to providers
+IMAGE_SIGNATURES = (('iVBORw0KGgo', 'image/png'), ('/9j/', 'image/jpeg'))
+
+def image_mime_type(image_b64: str) -> str:
+    """MIME type of a base64 encoded image; screenshots are PNG, recorded frames may be JPEG"""
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if image_b64.startswith(signature):
+            return mime_type
+    return 'image/png'
+
 class BaseLLMProvider(ABC):
     """
     Abstract base class for LLM providers
     """
     
+    # Short provider name used for routing, rate limits and logs
+    name = 'base'
+    
     def __init__(self, api_key: str, models: List[str]):
-        self.api_key = api_key
+        # One key or several comma-separated ones, rotated per request
+        self.key_pool = ApiKeyPool(ApiKeyPool.parse(api_key))
+        self._request_key = threading.local()
         self.models = models
         self.current_model_index = 0
         self.request_count = 0
         self.error_count = 0
         self.last_request_time = 0
+        self.streamed_requests = 0
+        self.early_stops = 0
+        self.total_time_to_action = 0.0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.output_tokens = 0
+        self.image_tokens = 0
+        self.estimated_usage = 0
+        self.rate_limiter = None
+        self.usage_tracker = None
+        self.rate_limit_hits: Dict[str, int] = {}
+        self.structured_output = False
+        self.structured_output_unsupported: Set[str] = set()
+        self.generation_profiles: Optional[GenerationProfiles] = None
+        self.truncated_responses = 0
+        self.request_timeout = 30.0
         
     @abstractmethod
-    def send_request(self, prompt: str, image_b64: str) -> str:
+    def send_request(self, prompt: str, image_b64: Optional[str], system_prompt: Optional[str] = None,
+                     profile: Optional[GenerationProfile] = None, timeout: Optional[float] = None,
+                     history: Sequence[ConversationTurn] = ()) -> str:
         """
         Send a request to the LLM provider
         
         Args:
             prompt: The text prompt
-            image_b64: Base64 encoded screenshot
+            image_b64: Base64 encoded screenshot, None for a text-only request
+            system_prompt: Static instructions sent as system message
+            profile: Generation budget, defaults to the current model's profile
+            timeout: Seconds to wait for the response, defaults to request_timeout
+            history: Earlier turns of the conversation, oldest first (only
+                for providers with the 'multi_turn' capability)
             
         Returns:
             Raw response string from the API
         """
         pass
     
-    @abstractmethod
+    def send_streaming_request(self, prompt: str, image_b64: Optional[str], system_prompt: Optional[str] = None,
+                               profile: Optional[GenerationProfile] = None, timeout: Optional[float] = None,
+                               history: Sequence[ConversationTurn] = ()) -> str:
+        """
+        Send a streaming request and return as soon as the action is complete
+        
+        The stream is consumed only until the first complete action object
+        has arrived; closing the stream afterwards cancels the remaining
+        generation so trailing tokens are not paid for.
+        
+        Args:
+            prompt: The text prompt
+            image_b64: Base64 encoded screenshot, None for a text-only request
+            system_prompt: Static instructions sent as system message
+            profile: Generation budget, defaults to the current model's profile
+            timeout: Seconds until the action must be complete, defaults to
+                request_timeout
+            history: Earlier turns of the conversation, oldest first
+            
+        Returns:
+            JSON text of the action, or the full streamed text if no
+            complete action object was found
+            
+        Raises:
+            TimeoutError: If the stream did not complete an action in time
+        """
+        profile = profile or self.get_generation_profile()
+        timeout = timeout or self.request_timeout
+        parser = IncrementalJSONParser()
+        start_time = time.time()
+        # Plugin providers without multi-turn support lack the argument
+        kwargs = {'history': history} if history else {}
+        chunks = self._stream_chunks(prompt, image_b64, system_prompt, profile, timeout, **kwargs)
+        self.streamed_requests += 1
+        
+        try:
+            for chunk in chunks:
+                # The read timeout only bounds the gap between chunks
+                if time.time() - start_time > timeout:
+                    self.error_count += 1
+                    raise TimeoutError(f"{self.name} stream exceeded {timeout:.1f}s", provider=self.name)
+                action_json = parser.feed(chunk)
+                if action_json is not None:
+                    self.early_stops += 1
+                    self.total_time_to_action += time.time() - start_time
+                    logger.debug(f"Action received after {time.time() - start_time:.2f}s, cancelling stream")
+                    return action_json
+        finally:
+            chunks.close()
+        
+        self.total_time_to_action += time.time() - start_time
+        if profile.stop_sequences:
+            return GenerationProfile.restore_stop_sequence(parser.buffer)
+        return parser.buffer
+    
+    def _stream_chunks(self, prompt: str, image_b64: Optional[str], system_prompt: Optional[str] = None,
+                       profile: Optional[GenerationProfile] = None, timeout: Optional[float] = None,
+                       history: Sequence[ConversationTurn] = ()) -> Iterator[str]:
+        """
+        Yield response text chunks as they arrive
+        
+        Providers without streaming support fall back to a single chunk
+        containing the complete response. Implementations must release the
+        underlying connection when the generator is closed.
+        """
+        kwargs = {'history': history} if history else {}
+        yield self.send_request(prompt, image_b64, system_prompt, profile, timeout, **kwargs)
+    
+    def get_generation_profile(self, model: Optional[str] = None) -> GenerationProfile:
+        """
+        Get the generation budget for a model
+        
+        Args:
+            model: Model name, defaults to the current model
+        """
+        if self.generation_profiles is None:
+            return GenerationProfile()
+        return self.generation_profiles.get(model or self.get_current_model())
+    
+    def _finish_response(self, text: str, profile: GenerationProfile, truncated: bool,
+                         finish_reason: Optional[str] = None) -> str:
+        """
+        Post-process a complete response text
+        
+        Restores a closing brace removed by a stop sequence and raises if the
+        model ran out of output tokens before completing an action.
+        
+        Raises:
+            TruncatedResponseError: If the response was cut off without an action
+        """
+        if profile.stop_sequences and not truncated:
+            text = GenerationProfile.restore_stop_sequence(text)
+        if truncated and IncrementalJSONParser().feed(text) is None:
+            self.raise_truncated(finish_reason)
+        return text
+    
+    def raise_truncated(self, finish_reason: Optional[str]):
+        """Count and raise a truncated response of the current model"""
+        self.truncated_responses += 1
+        model = self.get_current_model()
+        logger.warning(f"{self.name}/{model} hit its output limit ({finish_reason}) before completing an action")
+        raise TruncatedResponseError(f"Response from {model} was truncated", self.name, finish_reason)
+    
+    @staticmethod
+    def _is_timeout(error: requests.exceptions.RequestException) -> bool:
+        """Whether a requests error is a timeout; while streaming, read timeouts arrive as ConnectionError"""
+        if isinstance(error, requests.exceptions.Timeout):
+            return True
+        return any(isinstance(arg, ReadTimeoutError) for arg in error.args)
+    
+    @staticmethod
+    def _iter_sse_events(response) -> Iterator[Dict[str, Any]]:
+        """
+        Parse server-sent events from a streaming HTTP response
+        
+        Args:
+            response: Streaming requests response
+            
+        Returns:
+            Iterator over the decoded JSON payloads of all data events
+        """
+        response.encoding = 'utf-8'
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or line.startswith(':') or not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            yield json.loads(data)
+    
     def handle_rate_limit(self) -> bool:
         """
-        Handle rate limit by switching models or implementing backoff
+        Handle rate limit by switching to a model that is not cooling down
+        
+        Never sleeps; the caller routes to another provider when this fails.
         
         Returns:
             True if rate limit was handled, False if no more options
         """
-        pass
+        for offset in range(1, len(self.models)):
+            index = (self.current_model_index + offset) % len(self.models)
+            if self.model_wait_time(self.models[index]) == 0:
+                self.current_model_index = index
+                logger.info(f"Switched to {self.name} model: {self.get_current_model()}")
+                return True
+        
+        logger.warning(f"All {self.name} models are cooling down")
+        return False
+    
+    def _use_structured_output(self) -> bool:
+        """Check whether to request schema-constrained JSON from the current model"""
+        return self.structured_output and self.get_current_model() not in self.structured_output_unsupported
+    
+    def _structured_output_rejected(self, response, requested: bool) -> bool:
+        """
+        Check whether the API rejected a request because of its response schema
+        
+        Only a 400 whose error body names the schema parameter counts. The
+        model is remembered so later requests are sent without schema and the
+        caller can resend the request once, after taking a new rate-limit
+        token.
+        
+        Args:
+            response: HTTP response of the request
+            requested: Whether the request contained a response schema
+        """
+        if not requested or response.status_code != 400:
+            return False
+        body = response.text.lower()
+        if not any(marker in body for marker in STRUCTURED_OUTPUT_ERROR_MARKERS):
+            return False
+        model = self.get_current_model()
+        self.structured_output_unsupported.add(model)
+        logger.info(f"{self.name}/{model} rejected structured output ({response.status_code}), "
+                    f"retrying without response schema")
+        response.close()
+        return True
+    
+    @property
+    def api_key(self) -> str:
+        """API key of the calling thread's current request"""
+        return getattr(self._request_key, 'key', None) or self.key_pool.default()[0]
+    
+    @property
+    def key_id(self) -> str:
+        """Masked id of the API key of the calling thread's current request"""
+        return getattr(self._request_key, 'key_id', None) or self.key_pool.default()[1]
+    
+    def model_wait_time(self, model: Optional[str] = None) -> float:
+        """
+        Seconds until a model may be used again according to the rate limiter
+        
+        The model is usable as soon as one of the provider's keys is.
+        
+        Args:
+            model: Model name, defaults to the current model
+        """
+        if self.rate_limiter is None:
+            return 0.0
+        model = model or self.get_current_model()
+        waits = [self.rate_limiter.wait_time(self.name, model, key_id) for _, key_id in self.key_pool.active()]
+        # Without active keys the request fails on acquire instead
+        return min(waits, default=0.0)
+    
+    def _acquire_rate_limit(self):
+        """
+        Pick the API key for the next request and take a request token for it
+        
+        Keys are rotated per request; keys throttled for the current model
+        are skipped.
+        
+        Raises:
+            AuthenticationError: If every API key of the provider was retired
+            RateLimitError: If the model is throttled locally on all keys; no request is sent
+        """
+        if self.key_pool.exhausted:
+            raise AuthenticationError(f"All {self.name} API keys were rejected", provider=self.name)
+        model = self.get_current_model()
+        waits = []
+        for key, key_id in self.key_pool.rotation():
+            wait = self.rate_limiter.try_acquire(self.name, model, key_id) if self.rate_limiter else 0.0
+            if wait <= 0:
+                self._request_key.key = key
+                self._request_key.key_id = key_id
+                self.key_pool.record_request(key_id)
+                return
+            waits.append(wait)
+        raise RateLimitError(
+            f"{self.name} model {model} is rate limited for {min(waits):.1f}s",
+            provider=self.name,
+            retry_after=min(waits)
+        )
+    
+    def _update_rate_limits(self, response):
+        """Feed rate-limit headers of a response into the rate limiter"""
+        model = self.get_current_model()
+        if response.status_code != 429:
+            self.rate_limit_hits.pop(model, None)
+        if self.rate_limiter is not None:
+            self.rate_limiter.update_from_headers(self.name, model, response.headers, self.key_id)
+    
+    def _rate_limit_error(self, response, message: str) -> RateLimitError:
+        """
+        Build the error for a 429 response and put the model on cooldown
+        
+        The cooldown honours Retry-After (or the provider's equivalent) and
+        falls back to exponential backoff over consecutive 429s.
+        """
+        model = self.get_current_model()
+        self.rate_limit_hits[model] = self.rate_limit_hits.get(model, 0) + 1
+        
+        retry_after = self._parse_retry_after(response)
+        if retry_after is None:
+            retry_after = self._implement_backoff(self.rate_limit_hits[model])
+        
+        self.key_pool.record_rate_limit(self.key_id)
+        if self.rate_limiter is not None:
+            self.rate_limiter.cool_down(self.name, model, retry_after, self.key_id)
+        
+        return RateLimitError(message, provider=self.name, retry_after=retry_after)
+    
+    def _is_auth_failure(self, response) -> bool:
+        """Check whether a response rejects the API key itself"""
+        return response.status_code in (401, 403)
+    
+    def _status_error(self, response, message: str) -> APIError:
+        """
+        Build the error for a non-200, non-429 response, classified by status code
+        
+        A rejected API key is retired; if other keys are left, the error is
+        a KeyRetiredError so the request can be repeated with the next key.
+        """
+        status = response.status_code
+        if self._is_auth_failure(response):
+            self.key_pool.retire(self.key_id, f"HTTP {status}")
+            error_type = KeyRetiredError if self.key_pool.active_count() else AuthenticationError
+        elif status >= 500:
+            error_type = ServerError
+        elif status >= 400:
+            error_type = InvalidRequestError
+        else:
+            error_type = APIError
+        return error_type(message, provider=self.name, status_code=status)
+    
+    def _parse_retry_after(self, response) -> Optional[float]:
+        """Get the server-requested delay from a 429 response"""
+        return parse_retry_after(response.headers.get('Retry-After'))
     
     def get_current_model(self) -> str:
         """Get the currently selected model"""
         return self.models[self.current_model_index]
     
+    def select_model(self, model: str):
+        """Make the given model the current one"""
+        self.current_model_index = self.models.index(model)
+    
     def switch_model(self) -> bool:
         """
         Switch to the next available model
@@ -59,6 +403,16 @@ class BaseLLMProvider(ABC):
             return True
         return False
     
+    def supports_follow_up(self) -> bool:
+        """
+        Whether a follow-up turn is cheaper than sending the screenshot again
+
+        History is resent with every request of a stateless API, so this only
+        holds where the earlier image is served from a prompt cache or an
+        uploaded file instead of being billed in full again.
+        """
+        return False
+    
     def reset_model_index(self):
         """Reset to the first model"""
         self.current_model_index = 0
@@ -75,7 +429,19 @@ class BaseLLMProvider(ABC):
             'request_count': self.request_count,
             'error_count': self.error_count,
             'error_rate': self.error_count / max(self.request_count, 1),
-            'last_request_time': self.last_request_time
+            'last_request_time': self.last_request_time,
+            'streamed_requests': self.streamed_requests,
+            'early_stops': self.early_stops,
+            'avg_time_to_action': self.total_time_to_action / max(self.streamed_requests, 1),
+            'prompt_tokens': self.prompt_tokens,
+            'cached_tokens': self.cached_tokens,
+            'output_tokens': self.output_tokens,
+            'image_tokens': self.image_tokens,
+            'estimated_usage': self.estimated_usage,
+            'cached_token_ratio': self.cached_tokens / max(self.prompt_tokens, 1),
+            'structured_output_unsupported': sorted(self.structured_output_unsupported),
+            'truncated_responses': self.truncated_responses,
+            'api_keys': self.key_pool.get_stats()
         }
     
     def _log_request(self, success: bool = True):
@@ -85,6 +451,67 @@ class BaseLLMProvider(ABC):
         if not success:
             self.error_count += 1
     
+    def _record_usage(self, prompt_tokens: int, cached_tokens: int, output_tokens: int,
+                      image_tokens: int = 0, cost: Optional[float] = None, estimated: bool = False):
+        """
+        Record token usage reported by the API
+        
+        Args:
+            prompt_tokens: Input tokens including cached and image ones
+            cached_tokens: Input tokens served from the provider's prompt cache
+            output_tokens: Generated tokens
+            image_tokens: Input tokens spent on the screenshot, if reported
+            cost: Cost of the response in USD, if reported
+            estimated: Counts are a client-side estimate
+        """
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        self.output_tokens += output_tokens
+        self.image_tokens += image_tokens
+        logger.debug(f"Token usage: {prompt_tokens} prompt ({image_tokens} image, {cached_tokens} cached), "
+                     f"{output_tokens} output")
+        if self.usage_tracker is not None:
+            self.usage_tracker.record(
+                self.name, self.get_current_model(),
+                prompt_tokens=prompt_tokens,
+                image_tokens=image_tokens,
+                cached_tokens=cached_tokens,
+                output_tokens=output_tokens,
+                cost=cost,
+                estimated=estimated
+            )
+    
+    def _record_estimated_usage(self, prompt: str, image_b64: Optional[str], system_prompt: Optional[str],
+                                history: Sequence[ConversationTurn], output_text: str):
+        """
+        Record estimated usage of a response the API reported no usage for
+        
+        Streams that are cancelled once the action is complete never see the
+        final event that carries the usage block, but are still billed for
+        the prompt and the tokens generated so far.
+        
+        Args:
+            prompt: User prompt of the request
+            image_b64: Screenshot sent with the prompt, if any
+            system_prompt: System prompt of the request
+            history: Earlier turns sent with the request
+            output_text: Text received before the stream ended
+        """
+        texts = [prompt, system_prompt or '']
+        images = 1 if image_b64 else 0
+        for turn in history:
+            texts.extend((turn.prompt, turn.response))
+            images += 1 if turn.image_b64 else 0
+        image_tokens = images * ESTIMATED_IMAGE_TOKENS
+        self.estimated_usage += 1
+        self._record_usage(
+            prompt_tokens=sum(estimate_tokens(text) for text in texts) + image_tokens,
+            cached_tokens=0,
+            output_tokens=estimate_tokens(output_text),
+            image_tokens=image_tokens,
+            estimated=True
+        )
+    
     def _implement_backoff(self, attempt: int) -> float:
         """
         Calculate backoff delay for retries
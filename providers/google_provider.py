@@ -1,126 +1,546 @@
 import requests
+import base64
+import hashlib
 import json
 import time
 import logging
-from typing import Dict, Any
-from .base_provider import BaseLLMProvider
-from .openrouter_provider import RateLimitError, APIError
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple, Sequence
+from urllib.parse import urlsplit
+from core.exceptions import (
+    InvalidResponseError, NetworkError, RateLimitError, ServerError, TimeoutError
+)
+from core.conversation import ConversationTurn
+from core.deadline import Deadline
+from core.generation_profile import GenerationProfile
+from core.prompt_builder import estimate_tokens
+from core.rate_limiter import parse_retry_after
+from core.upload_cache import UploadCache
+from utils.json_parser import build_action_schema
+from .base_provider import BaseLLMProvider, image_mime_type
 
 logger = logging.getLogger(__name__)
 
+# Smallest prompt Gemini accepts for explicit context caching (models with a
+# higher minimum reject smaller prompts, which is then remembered). The
+# built-in system prompt of PromptBuilder stays far below it, so context
+# caching only applies to custom, large system prompts.
+CONTEXT_CACHE_MIN_TOKENS = 1024
+
+# Error texts of a cachedContents request that will never succeed
+CONTEXT_CACHE_REJECTIONS = ('too small', 'min_total_token_count', 'not supported', 'does not support')
+
+def to_gemini_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a JSON schema to Gemini's OpenAPI subset (upper-case type names)"""
+    converted = {}
+    for key, value in schema.items():
+        if key == 'type':
+            converted[key] = value.upper()
+        elif key == 'properties':
+            converted[key] = {name: to_gemini_schema(prop) for name, prop in value.items()}
+        elif key == 'items':
+            converted[key] = to_gemini_schema(value)
+        else:
+            converted[key] = value
+    return converted
+
 class GoogleProvider(BaseLLMProvider):
     """
     Google Gemini API provider implementation
     """
     
-    def __init__(self, api_key: str, models: list, api_url_template: str = None):
+    name = 'google'
+    
+    def __init__(self, api_key: str, models: list, api_url_template: str = None, context_cache_ttl: int = 0,
+                 structured_output: bool = False, file_upload_ttl: int = 0):
         super().__init__(api_key, models)
+        self.structured_output = structured_output
         self.api_url_template = api_url_template or 'https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent'
+        self.context_cache_ttl = context_cache_ttl
+        self.context_caches: Dict[Tuple[str, str, str], Tuple[str, float]] = {}
+        self.context_cache_unsupported: Set[Tuple[str, str, str]] = set()
+        self.upload_cache = UploadCache(file_upload_ttl) if file_upload_ttl else None
+        self.upload_failures = 0
+        # Reuses connections across requests (keep-alive)
+        self.session = requests.Session()
+    
+    def _get_headers(self) -> Dict[str, str]:
+        """Request headers with the API key of the current request"""
+        return {'Content-Type': 'application/json', 'x-goog-api-key': self.api_key}
     
     def _get_api_url(self) -> str:
         """Get API URL for current model"""
         return self.api_url_template.format(model=self.get_current_model())
     
-    def send_request(self, prompt: str, image_b64: str) -> str:
+    def _get_stream_api_url(self) -> str:
+        """Get streaming API URL for current model"""
+        return self._get_api_url().replace(':generateContent', ':streamGenerateContent')
+    
+    def _get_cached_contents_url(self) -> str:
+        """Get the cachedContents endpoint belonging to the API URL"""
+        return self.api_url_template.split('/models/')[0] + '/cachedContents'
+    
+    def _setup_timeout(self, deadline: Optional[Deadline]) -> float:
+        """Timeout of a preparatory call (cache creation, upload) within the request's deadline"""
+        return deadline.cap(self.request_timeout) if deadline is not None else self.request_timeout
+    
+    def _get_cached_content(self, system_prompt: str, deadline: Optional[Deadline] = None) -> Optional[str]:
         """
-        Send request to Google Gemini API
+        Get a cachedContents handle for the system prompt, creating it once
+        
+        Args:
+            system_prompt: System prompt to cache
+            deadline: Deadline of the request the handle is needed for
+        
+        Only system prompts of at least CONTEXT_CACHE_MIN_TOKENS are cached;
+        smaller ones, like the built-in prompt, are skipped without a request.
+        
+        Returns:
+            Resource name of the cached content, or None if context caching is
+            disabled, the prompt is too small or caching is not available for
+            the current model
         """
+        if not self.context_cache_ttl:
+            return None
+        
+        model = self.get_current_model()
+        # Cached contents belong to the project of the API key
+        key = (model, self.key_id, hashlib.sha256(system_prompt.encode('utf-8')).hexdigest())
+        if key in self.context_cache_unsupported:
+            return None
+        if estimate_tokens(system_prompt) < CONTEXT_CACHE_MIN_TOKENS:
+            # Would be rejected as too small; not worth the round trip
+            self.context_cache_unsupported.add(key)
+            return None
+        
+        cached = self.context_caches.get(key)
+        if cached and cached[1] > time.time() + 30:
+            return cached[0]
+        
+        timeout = self._setup_timeout(deadline)
+        if timeout <= 0:
+            return None
         payload = {
-            'contents': [{
-                'parts': [
-                    {
-                        'text': prompt
-                    },
-                    {
-                        'inline_data': {
-                            'mime_type': 'image/png',
-                            'data': image_b64
-                        }
-                    }
-                ]
-            }],
+            'model': f'models/{model}',
+            'systemInstruction': {'parts': [{'text': system_prompt}]},
+            'ttl': f'{self.context_cache_ttl}s'
+        }
+        
+        try:
+            response = self.session.post(
+                self._get_cached_contents_url(),
+                headers=self._get_headers(),
+                json=payload,
+                timeout=timeout
+            )
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Failed to register Gemini context cache: {type(e).__name__}")
+            return None
+        
+        if response.status_code != 200:
+            if self._context_cache_rejected(response):
+                logger.info(f"Gemini context caching unavailable for {model}: {response.status_code}, "
+                            f"using systemInstruction")
+                self.context_cache_unsupported.add(key)
+            else:
+                # Rate limits and server errors are transient, try again next time
+                logger.warning(f"Failed to register Gemini context cache for {model}: {response.status_code}")
+            return None
+        
+        try:
+            name = response.json().get('name')
+        except ValueError:
+            logger.warning(f"Gemini context cache response for {model} is not JSON, using systemInstruction")
+            return None
+        if not name:
+            self.context_cache_unsupported.add(key)
+            return None
+        
+        self.context_caches[key] = (name, time.time() + self.context_cache_ttl)
+        logger.info(f"Registered Gemini context cache {name} for {model}")
+        return name
+    
+    @staticmethod
+    def _context_cache_rejected(response: requests.Response) -> bool:
+        """Whether the API refused to cache the prompt for good (too small or model without caching)"""
+        if response.status_code not in (400, 404):
+            return False
+        body = response.text.lower()
+        return any(reason in body for reason in CONTEXT_CACHE_REJECTIONS)
+    
+    def _get_upload_url(self) -> str:
+        """Get the Files API upload endpoint belonging to the API URL"""
+        parts = urlsplit(self.api_url_template.split('/models/')[0])
+        return f"{parts.scheme}://{parts.netloc}/upload{parts.path}/files"
+    
+    def _upload_file(self, image_b64: str,
+                     deadline: Optional[Deadline] = None) -> Optional[Tuple[str, Optional[float]]]:
+        """
+        Upload a screenshot via the Files API (resumable protocol)
+        
+        Args:
+            image_b64: Base64 encoded screenshot
+            deadline: Deadline of the request the file is needed for
+        
+        Returns:
+            File URI and expiry timestamp, or None if the upload failed
+        """
+        try:
+            data = base64.b64decode(image_b64, validate=True)
+        except ValueError:
+            logger.warning("Frame is not valid base64, sending it inline")
+            return None
+        if self._setup_timeout(deadline) <= 0:
+            return None
+        try:
+            start = self.session.post(
+                self._get_upload_url(),
+                headers={
+                    'x-goog-api-key': self.api_key,
+                    'X-Goog-Upload-Protocol': 'resumable',
+                    'X-Goog-Upload-Command': 'start',
+                    'X-Goog-Upload-Header-Content-Length': str(len(data)),
+                    'X-Goog-Upload-Header-Content-Type': image_mime_type(image_b64),
+                    'Content-Type': 'application/json'
+                },
+                json={'file': {'display_name': 'ki-browser-frame'}},
+                timeout=self._setup_timeout(deadline)
+            )
+            upload_url = start.headers.get('X-Goog-Upload-URL')
+            if start.status_code != 200 or not upload_url:
+                logger.warning(f"Gemini file upload could not be started: {start.status_code}")
+                return None
+            if self._setup_timeout(deadline) <= 0:
+                return None
+            
+            response = self.session.post(
+                upload_url,
+                headers={
+                    'Content-Length': str(len(data)),
+                    'X-Goog-Upload-Offset': '0',
+                    'X-Goog-Upload-Command': 'upload, finalize'
+                },
+                data=data,
+                timeout=self._setup_timeout(deadline)
+            )
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Gemini file upload failed: {type(e).__name__}")
+            return None
+        
+        if response.status_code != 200:
+            logger.warning(f"Gemini file upload failed: {response.status_code}")
+            return None
+        
+        try:
+            file_info = response.json().get('file', {})
+        except ValueError:
+            logger.warning("Gemini file upload response is not JSON, sending the frame inline")
+            return None
+        if not file_info.get('uri'):
+            return None
+        
+        expires_at = None
+        if file_info.get('expirationTime'):
+            try:
+                # RFC 3339 with up to nanoseconds, e.g. 2025-01-03T10:00:00.123456789Z
+                expires_at = datetime.fromisoformat(file_info['expirationTime'][:19] + '+00:00').timestamp()
+            except ValueError:
+                pass
+        logger.info(f"Uploaded frame to Gemini Files API as {file_info.get('name')} ({len(data)} bytes)")
+        return file_info['uri'], expires_at
+    
+    def _build_image_part(self, image_b64: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        Build the screenshot part of a request
+        
+        A frame is sent inline the first time. If the same frame is sent
+        again, it is uploaded once via the Files API and referenced by URI
+        until the file expires.
+        """
+        if self.upload_cache is not None:
+            # Same hash as ScreenshotManager.compute_frame_hash; files belong
+            # to the project of the API key
+            frame_hash = f"{self.key_id}:{hashlib.sha256(image_b64.encode('ascii')).hexdigest()}"
+            uri = self.upload_cache.get(frame_hash)
+            if uri is None and self.upload_cache.record_use(frame_hash) > 1:
+                uploaded = self._upload_file(image_b64, deadline)
+                if uploaded:
+                    uri = uploaded[0]
+                    self.upload_cache.put(frame_hash, uri, uploaded[1])
+                else:
+                    self.upload_failures += 1
+            if uri:
+                return {'file_data': {'mime_type': image_mime_type(image_b64), 'file_uri': uri}}
+        
+        return {
+            'inline_data': {
+                'mime_type': image_mime_type(image_b64),
+                'data': image_b64
+            }
+        }
+    
+    def _build_user_parts(self, prompt: str, image_b64: Optional[str],
+                          deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
+        """Build the parts of a user turn with the screenshot attached, if any"""
+        parts = [{'text': prompt}]
+        if image_b64:
+            parts.append(self._build_image_part(image_b64, deadline))
+        return parts
+    
+    def _build_payload(self, prompt: str, image_b64: Optional[str], system_prompt: Optional[str] = None,
+                       profile: Optional[GenerationProfile] = None,
+                       history: Sequence[ConversationTurn] = (),
+                       deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        Build the generateContent payload
+        
+        Creating the context cache and uploading frames count against the
+        deadline of the request.
+        """
+        profile = profile or self.get_generation_profile()
+        contents = []
+        for turn in history:
+            # An earlier frame is sent again, so the upload cache references
+            # it by file URI instead of embedding it
+            contents.append({'role': 'user', 'parts': self._build_user_parts(turn.prompt, turn.image_b64, deadline)})
+            contents.append({'role': 'model', 'parts': [{'text': turn.response}]})
+        contents.append({'role': 'user', 'parts': self._build_user_parts(prompt, image_b64, deadline)})
+        payload = {
+            'contents': contents,
             'generationConfig': {
-                'maxOutputTokens': 500,
+                'maxOutputTokens': profile.max_tokens,
                 'temperature': 0.1
             }
         }
         
-        headers = {
-            'Content-Type': 'application/json'
-        }
+        if profile.stop_sequences:
+            payload['generationConfig']['stopSequences'] = list(profile.stop_sequences)
+        if profile.thinking_budget is not None:
+            payload['generationConfig']['thinkingConfig'] = {'thinkingBudget': profile.thinking_budget}
         
-        params = {
-            'key': self.api_key
-        }
+        if self._use_structured_output():
+            payload['generationConfig']['responseMimeType'] = 'application/json'
+            payload['generationConfig']['responseSchema'] = to_gemini_schema(build_action_schema())
+        
+        if system_prompt:
+            cached_content = self._get_cached_content(system_prompt, deadline)
+            if cached_content:
+                payload['cachedContent'] = cached_content
+            else:
+                payload['systemInstruction'] = {'parts': [{'text': system_prompt}]}
+        
+        return payload
+    
+    def _request_timeout(self, deadline: Deadline) -> float:
+        """Time left for the generateContent call after cache creation and uploads"""
+        if deadline.expired():
+            self._log_request(False)
+            raise TimeoutError("Google request timeout (setup used the whole budget)", provider=self.name)
+        return deadline.remaining()
+    
+    def _post(self, payload: Dict[str, Any], stream: bool = False,
+              timeout: Optional[float] = None) -> requests.Response:
+        """POST a payload, resending it once without schema if the model rejects structured output"""
+        timeout = timeout or self.request_timeout
+        url = self._get_stream_api_url() if stream else self._get_api_url()
+        params = {'alt': 'sse'} if stream else {}
+        headers = self._get_headers()
+        
+        response = self.session.post(url, headers=headers, params=params, json=payload, timeout=timeout, stream=stream)
+        if self._structured_output_rejected(response, 'responseSchema' in payload['generationConfig']):
+            generation_config = dict(payload['generationConfig'])
+            del generation_config['responseMimeType'], generation_config['responseSchema']
+            payload = dict(payload, generationConfig=generation_config)
+            self._acquire_rate_limit()
+            headers = self._get_headers()
+            response = self.session.post(url, headers=headers, params=params, json=payload, timeout=timeout, stream=stream)
+        if response.status_code in (400, 403, 404):
+            self._drop_rejected_files(payload)
+        return response
+    
+    def _drop_rejected_files(self, payload: Dict[str, Any]):
+        """Forget uploaded files of a rejected request; they may have expired or been deleted"""
+        if self.upload_cache is None:
+            return
+        for content in payload['contents']:
+            for part in content['parts']:
+                if 'file_data' in part:
+                    self.upload_cache.invalidate(part['file_data']['file_uri'])
+    
+    def _parse_retry_after(self, response: requests.Response) -> Optional[float]:
+        """Get the retry delay from Retry-After or the RetryInfo error detail"""
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is not None:
+            return retry_after
+        
+        try:
+            details = response.json().get('error', {}).get('details', [])
+        except (ValueError, AttributeError):
+            return None
+        
+        for detail in details:
+            if detail.get('@type', '').endswith('google.rpc.RetryInfo'):
+                # Duration format, e.g. "13s" or "1.5s"
+                return parse_retry_after(detail.get('retryDelay', '').rstrip('s'))
+        return None
+    
+    def _is_auth_failure(self, response: requests.Response) -> bool:
+        # Invalid keys get a 400 (API_KEY_INVALID); a 403 may also concern an
+        # uploaded file of another project
+        if response.status_code == 401:
+            return True
+        return response.status_code in (400, 403) and 'api key' in response.text.lower().replace('_', ' ')
+    
+    def _check_response_status(self, response: requests.Response):
+        """Raise the matching error for a non-200 response"""
+        self._update_rate_limits(response)
+        if response.status_code == 429:
+            logger.warning("Rate limit hit on Google Gemini")
+            raise self._rate_limit_error(response, "Google Gemini rate limit exceeded")
+        elif response.status_code != 200:
+            logger.error(f"Google API error: {response.status_code} - {response.text}")
+            raise self._status_error(response, f"Google API error: {response.status_code}")
+    
+    def _record_response_usage(self, usage: Dict[str, Any]):
+        """Record token usage from a Gemini usageMetadata block"""
+        image_tokens = sum(
+            detail.get('tokenCount', 0) for detail in usage.get('promptTokensDetails', [])
+            if detail.get('modality') == 'IMAGE'
+        )
+        # Thinking tokens are billed as output but not part of candidatesTokenCount
+        self._record_usage(
+            prompt_tokens=usage.get('promptTokenCount', 0),
+            cached_tokens=usage.get('cachedContentTokenCount', 0),
+            output_tokens=usage.get('candidatesTokenCount', 0) + usage.get('thoughtsTokenCount', 0),
+            image_tokens=image_tokens
+        )
+    
+    def send_request(self, prompt: str, image_b64: Optional[str], system_prompt: Optional[str] = None,
+                     profile: Optional[GenerationProfile] = None, timeout: Optional[float] = None,
+                     history: Sequence[ConversationTurn] = ()) -> str:
+        """
+        Send request to Google Gemini API
+        """
+        profile = profile or self.get_generation_profile()
+        # Pick the key first: cached contents and uploaded files belong to it
+        self._acquire_rate_limit()
+        deadline = Deadline(timeout or self.request_timeout)
+        payload = self._build_payload(prompt, image_b64, system_prompt, profile, history, deadline)
         
         try:
             logger.debug(f"Sending request to Google with model: {self.get_current_model()}")
-            response = requests.post(
-                self._get_api_url(),
-                headers=headers,
-                params=params,
-                json=payload,
-                timeout=30
-            )
+            response = self._post(payload, timeout=self._request_timeout(deadline))
             
             self._log_request(response.status_code == 200)
-            
-            if response.status_code == 429:
-                logger.warning("Rate limit hit on Google Gemini")
-                raise RateLimitError("Google Gemini rate limit exceeded")
-            elif response.status_code != 200:
-                logger.error(f"Google API error: {response.status_code} - {response.text}")
-                raise APIError(f"Google API error: {response.status_code}")
+            self._check_response_status(response)
             
             response_data = response.json()
             
             if 'candidates' not in response_data or not response_data['candidates']:
                 logger.error("Invalid Google response structure")
-                raise APIError("Invalid response structure from Google")
+                raise InvalidResponseError("Invalid response structure from Google", provider=self.name)
+            
+            if response_data.get('usageMetadata'):
+                self._record_response_usage(response_data['usageMetadata'])
             
             candidate = response_data['candidates'][0]
+            finish_reason = candidate.get('finishReason')
             if 'content' not in candidate or 'parts' not in candidate['content']:
+                # Thinking models can spend the whole budget before answering
+                if finish_reason == 'MAX_TOKENS':
+                    self.raise_truncated(finish_reason)
                 logger.error("Missing content in Google response")
-                raise APIError("Missing content in Google response")
+                raise InvalidResponseError("Missing content in Google response", provider=self.name)
             
-            content = candidate['content']['parts'][0]['text']
+            content = ''.join(
+                part['text'] for part in candidate['content']['parts']
+                if 'text' in part and not part.get('thought')
+            )
             logger.debug(f"Received response from Google: {len(content)} characters")
             
-            return content
+            return self._finish_response(content, profile, finish_reason == 'MAX_TOKENS', finish_reason)
             
         except requests.exceptions.Timeout:
             self._log_request(False)
             logger.error("Google request timeout")
-            raise APIError("Google request timeout")
+            raise TimeoutError("Google request timeout", provider=self.name)
         except requests.exceptions.RequestException as e:
             self._log_request(False)
             logger.error(f"Google request failed: {e}")
-            raise APIError(f"Google request failed: {e}")
+            raise NetworkError(f"Google request failed: {e}", provider=self.name)
         except json.JSONDecodeError as e:
             self._log_request(False)
             logger.error(f"Failed to parse Google response: {e}")
-            raise APIError(f"Invalid JSON response from Google: {e}")
+            raise InvalidResponseError(f"Invalid JSON response from Google: {e}", provider=self.name)
         except KeyError as e:
             self._log_request(False)
             logger.error(f"Missing key in Google response: {e}")
-            raise APIError(f"Missing key in Google response: {e}")
+            raise InvalidResponseError(f"Missing key in Google response: {e}", provider=self.name)
     
-    def handle_rate_limit(self) -> bool:
+    def _stream_chunks(self, prompt: str, image_b64: Optional[str], system_prompt: Optional[str] = None,
+                       profile: Optional[GenerationProfile] = None, timeout: Optional[float] = None,
+                       history: Sequence[ConversationTurn] = ()) -> Iterator[str]:
         """
-        Handle rate limit by switching models or implementing backoff
+        Stream text parts from Gemini via streamGenerateContent (SSE)
         """
-        logger.info("Handling Google rate limit")
-        
-        # Try switching to next model
-        if self.switch_model():
-            logger.info(f"Switched to Google model: {self.get_current_model()}")
-            return True
+        self._acquire_rate_limit()
+        deadline = Deadline(timeout or self.request_timeout)
+        payload = self._build_payload(prompt, image_b64, system_prompt, profile, history, deadline)
+        usage = None
+        finish_reason = None
         
-        # If no more models, implement backoff
-        logger.warning("No more Google models available, implementing backoff")
-        backoff_time = self._implement_backoff(1)
-        time.sleep(backoff_time)
+        try:
+            logger.debug(f"Streaming request to Google with model: {self.get_current_model()}")
+            response = self._post(payload, stream=True, timeout=self._request_timeout(deadline))
+        except requests.exceptions.Timeout:
+            self._log_request(False)
+            logger.error("Google request timeout")
+            raise TimeoutError("Google request timeout", provider=self.name)
+        except requests.exceptions.RequestException as e:
+            self._log_request(False)
+            logger.error(f"Google request failed: {e}")
+            raise NetworkError(f"Google request failed: {e}", provider=self.name)
         
-        # Reset to first model after backoff
-        self.reset_model_index()
-        return True
\ No newline at end of file
+        try:
+            self._log_request(response.status_code == 200)
+            self._check_response_status(response)
+            
+            for event in self._iter_sse_events(response):
+                if 'error' in event:
+                    logger.error(f"Google stream error: {event['error']}")
+                    raise ServerError(f"Google stream error: {event['error']}", provider=self.name)
+                
+                # Every event carries the running usage totals
+                usage = event.get('usageMetadata') or usage
+                
+                for candidate in event.get('candidates', [])[:1]:
+                    finish_reason = candidate.get('finishReason') or finish_reason
+                    for part in candidate.get('content', {}).get('parts', []):
+                        # Skip thought summaries of thinking models
+                        if part.get('text') and not part.get('thought'):
+                            yield part['text']
+            
+            # Only reached if no complete action arrived before the stream ended
+            if finish_reason == 'MAX_TOKENS':
+                self.raise_truncated(finish_reason)
+                            
+        except requests.exceptions.RequestException as e:
+            if self._is_timeout(e):
+                logger.error("Google stream timeout")
+                raise TimeoutError("Google stream timeout", provider=self.name)
+            logger.error(f"Google stream interrupted: {e}")
+            raise NetworkError(f"Google stream interrupted: {e}", provider=self.name)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse Google stream event: {e}")
+            raise InvalidResponseError(f"Invalid JSON event from Google stream: {e}", provider=self.name)
+        finally:
+            response.close()
+            if usage:
+                self._record_response_usage(usage)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get provider statistics including uploaded frames"""
+        stats = super().get_stats()
+        if self.upload_cache is not None:
+            stats['file_uploads'] = dict(self.upload_cache.get_stats(), failures=self.upload_failures)
+        return stats
@@ -0,0 +1,137 @@
+import requests
+import time
+import logging
+from typing import Dict, Any, Iterator, Optional, Sequence
+from core.exceptions import APIError, NetworkError
+from core.conversation import ConversationTurn
+from core.generation_profile import GenerationProfile
+from .openrouter_provider import OpenRouterProvider
+
+logger = logging.getLogger(__name__)
+
+class LocalProvider(OpenRouterProvider):
+    """
+    Provider for local OpenAI-compatible servers (llama.cpp, vLLM, Ollama)
+
+    Uses the chat-completions wire format of OpenRouterProvider without the
+    OpenRouter-specific extensions. A cheap health probe against the /models
+    endpoint lets requests fail fast while the server is down, so routing
+    moves on without waiting for a connection timeout.
+    """
+
+    name = 'local'
+    label = 'Local endpoint'
+
+    def __init__(self, models: list, api_url: str = None, api_key: str = None, structured_output: bool = False,
+                 health_check_interval: float = 30.0, health_check_timeout: float = 2.0):
+        super().__init__(api_key or '', models, api_url or 'http://localhost:8080/v1/chat/completions',
+                         structured_output)
+        self.headers = {'Content-Type': 'application/json'}
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.healthy: Optional[bool] = None
+        self.last_health_check = 0.0
+        self.health_check_failures = 0
+
+    def _get_models_url(self) -> str:
+        """Get the /models endpoint belonging to the chat-completions URL"""
+        return self.api_url.rsplit('/chat/completions', 1)[0] + '/models'
+
+    def check_health(self, force: bool = False) -> bool:
+        """
+        Probe whether the local server is reachable
+
+        The result is cached for health_check_interval seconds.
+
+        Args:
+            force: Probe even if a cached result is available
+
+        Returns:
+            True if the server answered the /models probe
+        """
+        now = time.time()
+        if not force and self.healthy is not None and now - self.last_health_check < self.health_check_interval:
+            return self.healthy
+
+        try:
+            response = self.session.get(self._get_models_url(), headers=self._get_headers(),
+                                        timeout=self.health_check_timeout)
+            healthy = response.status_code == 200
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"Local endpoint health probe failed: {e}")
+            healthy = False
+
+        if not healthy:
+            self.health_check_failures += 1
+        if healthy != self.healthy:
+            logger.info(f"Local endpoint {self._get_models_url()} is {'up' if healthy else 'down'}")
+        self.healthy = healthy
+        self.last_health_check = now
+        return healthy
+
+    def _require_health(self):
+        """
+        Raises:
+            NetworkError: If the local server did not answer the health probe
+        """
+        if not self.check_health():
+            raise NetworkError(f"Local endpoint {self.api_url} is not reachable", provider=self.name)
+
+    def _uses_cache_control(self) -> bool:
+        return False
+
+    def _build_payload(self, prompt: str, image_b64: Optional[str], system_prompt: Optional[str] = None,
+                       profile: Optional[GenerationProfile] = None,
+                       history: Sequence[ConversationTurn] = ()) -> Dict[str, Any]:
+        """Build a plain chat-completions payload without OpenRouter extensions"""
+        payload = super()._build_payload(prompt, image_b64, system_prompt, profile, history)
+        payload.pop('usage', None)
+        payload.pop('reasoning', None)
+        return payload
+
+    def _post(self, payload: Dict[str, Any], stream: bool = False,
+              timeout: Optional[float] = None) -> requests.Response:
+        if stream:
+            # vLLM and llama.cpp only report usage in streams when asked to
+            payload = dict(payload, stream_options={'include_usage': True})
+        return super()._post(payload, stream, timeout)
+
+    def _record_response_usage(self, usage: Dict[str, Any]):
+        # Some servers report an empty usage block, e.g. before the final event
+        if usage.get('prompt_tokens') is not None:
+            super()._record_response_usage(usage)
+
+    def send_request(self, prompt: str, image_b64: Optional[str], system_prompt: Optional[str] = None,
+                     profile: Optional[GenerationProfile] = None, timeout: Optional[float] = None,
+                     history: Sequence[ConversationTurn] = ()) -> str:
+        """
+        Send request to the local server
+        """
+        self._require_health()
+        try:
+            return super().send_request(prompt, image_b64, system_prompt, profile, timeout, history)
+        except APIError:
+            # Re-probe before the next request instead of trusting the cache
+            self.healthy = None
+            raise
+
+    def _stream_chunks(self, prompt: str, image_b64: Optional[str], system_prompt: Optional[str] = None,
+                       profile: Optional[GenerationProfile] = None, timeout: Optional[float] = None,
+                       history: Sequence[ConversationTurn] = ()) -> Iterator[str]:
+        """
+        Stream content deltas from the local server
+        """
+        self._require_health()
+        try:
+            yield from super()._stream_chunks(prompt, image_b64, system_prompt, profile, timeout, history)
+        except APIError:
+            self.healthy = None
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get provider statistics including the endpoint health"""
+        stats = super().get_stats()
+        stats['endpoint'] = self.api_url
+        stats['healthy'] = self.healthy
+        stats['health_check_failures'] = self.health_check_failures
+        return stats
@@ -1,120 +1,281 @@
 import requests
 import json
-import time
 import logging
-from typing import Dict, Any
-from .base_provider import BaseLLMProvider
+from typing import Dict, Any, Iterator, Optional, Sequence
+from core.exceptions import (
+    InvalidResponseError, NetworkError, RateLimitError, ServerError, TimeoutError
+)
+from core.conversation import ConversationTurn
+from core.generation_profile import GenerationProfile
+from utils.json_parser import build_action_schema
+from .base_provider import BaseLLMProvider, image_mime_type
 
 logger = logging.getLogger(__name__)
 
+# Model prefixes for which OpenRouter honours cache_control breakpoints
+CACHE_CONTROL_MODEL_PREFIXES = ('anthropic/', 'google/gemini')
+
 class OpenRouterProvider(BaseLLMProvider):
     """
     OpenRouter API provider implementation
     """
     
-    def __init__(self, api_key: str, models: list, api_url: str = None):
+    name = 'openrouter'
+    # Service name used in log and error messages
+    label = 'OpenRouter'
+    
+    def __init__(self, api_key: str, models: list, api_url: str = None, structured_output: bool = False):
         super().__init__(api_key, models)
         self.api_url = api_url or 'https://openrouter.ai/api/v1/chat/completions'
+        self.structured_output = structured_output
+        # Reuses connections across requests (keep-alive)
+        self.session = requests.Session()
         self.headers = {
-            'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json',
             'HTTP-Referer': 'https://github.com/ki-browser',
             'X-Title': 'KI-Browser Automation'
         }
     
-    def send_request(self, prompt: str, image_b64: str) -> str:
-        """
-        Send request to OpenRouter API
-        """
+    def _get_headers(self) -> Dict[str, str]:
+        """Request headers with the API key of the current request"""
+        if not self.api_key:
+            return self.headers
+        return dict(self.headers, Authorization=f'Bearer {self.api_key}')
+    
+    def _uses_cache_control(self) -> bool:
+        """Whether the current model honours cache_control breakpoints"""
+        return self.get_current_model().startswith(CACHE_CONTROL_MODEL_PREFIXES)
+    
+    def supports_follow_up(self) -> bool:
+        """Only models with cache_control read the earlier screenshot from the prompt cache"""
+        return self._uses_cache_control()
+    
+    def _build_system_message(self, system_prompt: str) -> Dict[str, Any]:
+        """Build the system message, marked cacheable where supported"""
+        if self._uses_cache_control():
+            return {
+                'role': 'system',
+                'content': [
+                    {
+                        'type': 'text',
+                        'text': system_prompt,
+                        'cache_control': {'type': 'ephemeral'}
+                    }
+                ]
+            }
+        return {'role': 'system', 'content': system_prompt}
+    
+    @staticmethod
+    def _build_user_message(prompt: str, image_b64: Optional[str]) -> Dict[str, Any]:
+        """Build a user message with the screenshot attached, if any"""
+        content = [
+            {
+                'type': 'text',
+                'text': prompt
+            }
+        ]
+        if image_b64:
+            content.append({
+                'type': 'image_url',
+                'image_url': {
+                    'url': f'data:{image_mime_type(image_b64)};base64,{image_b64}'
+                }
+            })
+        return {'role': 'user', 'content': content}
+    
+    def _build_payload(self, prompt: str, image_b64: Optional[str], system_prompt: Optional[str] = None,
+                       profile: Optional[GenerationProfile] = None,
+                       history: Sequence[ConversationTurn] = ()) -> Dict[str, Any]:
+        """Build the chat-completions payload for the current model"""
+        messages = []
+        if system_prompt:
+            messages.append(self._build_system_message(system_prompt))
+        
+        for index, turn in enumerate(history):
+            message = self._build_user_message(turn.prompt, turn.image_b64)
+            if index == len(history) - 1 and self._uses_cache_control():
+                # Cache everything up to the last earlier screenshot, so the
+                # follow-up only pays for its new text
+                message['content'][-1]['cache_control'] = {'type': 'ephemeral'}
+            messages.append(message)
+            messages.append({'role': 'assistant', 'content': turn.response})
+        messages.append(self._build_user_message(prompt, image_b64))
+        
+        profile = profile or self.get_generation_profile()
         payload = {
             'model': self.get_current_model(),
-            'messages': [
-                {
-                    'role': 'user',
-                    'content': [
-                        {
-                            'type': 'text',
-                            'text': prompt
-                        },
-                        {
-                            'type': 'image_url',
-                            'image_url': {
-                                'url': f'data:image/png;base64,{image_b64}'
-                            }
-                        }
-                    ]
-                }
-            ],
-            'max_tokens': 500,
-            'temperature': 0.1
+            'messages': messages,
+            'max_tokens': profile.max_tokens,
+            'temperature': 0.1,
+            # Ask OpenRouter to include the billed cost in the usage block
+            'usage': {'include': True}
         }
+        if profile.stop_sequences:
+            payload['stop'] = list(profile.stop_sequences)
+        if profile.reasoning_effort:
+            payload['reasoning'] = {'effort': profile.reasoning_effort}
+        
+        if self._use_structured_output():
+            payload['response_format'] = {
+                'type': 'json_schema',
+                'json_schema': {
+                    'name': 'gui_action',
+                    'strict': False,
+                    'schema': build_action_schema()
+                }
+            }
+        
+        return payload
+    
+    def _post(self, payload: Dict[str, Any], stream: bool = False,
+              timeout: Optional[float] = None) -> requests.Response:
+        """POST a payload, resending it once without schema if the model rejects structured output"""
+        timeout = timeout or self.request_timeout
+        response = self.session.post(self.api_url, headers=self._get_headers(), json=payload, timeout=timeout, stream=stream)
+        if self._structured_output_rejected(response, 'response_format' in payload):
+            payload = dict(payload)
+            del payload['response_format']
+            self._acquire_rate_limit()
+            response = self.session.post(self.api_url, headers=self._get_headers(), json=payload, timeout=timeout, stream=stream)
+        return response
+    
+    def _is_auth_failure(self, response: requests.Response) -> bool:
+        # 403 means a moderation flag here, not a rejected key
+        return response.status_code == 401
+    
+    def _check_response_status(self, response: requests.Response):
+        """Raise the matching error for a non-200 response"""
+        self._update_rate_limits(response)
+        if response.status_code == 429:
+            logger.warning(f"Rate limit hit on {self.label}")
+            raise self._rate_limit_error(response, f"{self.label} rate limit exceeded")
+        elif response.status_code != 200:
+            logger.error(f"{self.label} API error: {response.status_code} - {response.text}")
+            raise self._status_error(response, f"{self.label} API error: {response.status_code}")
+    
+    def _record_response_usage(self, usage: Dict[str, Any]):
+        """Record token usage from an OpenRouter usage block"""
+        details = usage.get('prompt_tokens_details') or {}
+        self._record_usage(
+            prompt_tokens=usage.get('prompt_tokens', 0),
+            cached_tokens=details.get('cached_tokens', 0),
+            output_tokens=usage.get('completion_tokens', 0),
+            image_tokens=details.get('image_tokens', 0),
+            cost=usage.get('cost')
+        )
+    
+    def send_request(self, prompt: str, image_b64: Optional[str], system_prompt: Optional[str] = None,
+                     profile: Optional[GenerationProfile] = None, timeout: Optional[float] = None,
+                     history: Sequence[ConversationTurn] = ()) -> str:
+        """
+        Send request to OpenRouter API
+        """
+        profile = profile or self.get_generation_profile()
+        payload = self._build_payload(prompt, image_b64, system_prompt, profile, history)
+        
+        self._acquire_rate_limit()
         
         try:
-            logger.debug(f"Sending request to OpenRouter with model: {self.get_current_model()}")
-            response = requests.post(
-                self.api_url,
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            logger.debug(f"Sending request to {self.label} with model: {self.get_current_model()}")
+            response = self._post(payload, timeout=timeout)
             
             self._log_request(response.status_code == 200)
-            
-            if response.status_code == 429:
-                logger.warning("Rate limit hit on OpenRouter")
-                raise RateLimitError("OpenRouter rate limit exceeded")
-            elif response.status_code != 200:
-                logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-                raise APIError(f"OpenRouter API error: {response.status_code}")
+            self._check_response_status(response)
             
             response_data = response.json()
             
             if 'choices' not in response_data or not response_data['choices']:
-                logger.error("Invalid OpenRouter response structure")
-                raise APIError("Invalid response structure from OpenRouter")
+                logger.error(f"Invalid {self.label} response structure")
+                raise InvalidResponseError(f"Invalid response structure from {self.label}", provider=self.name)
+            
+            if response_data.get('usage'):
+                self._record_response_usage(response_data['usage'])
             
-            content = response_data['choices'][0]['message']['content']
-            logger.debug(f"Received response from OpenRouter: {len(content)} characters")
+            choice = response_data['choices'][0]
+            content = choice['message'].get('content') or ''
+            logger.debug(f"Received response from {self.label}: {len(content)} characters")
             
-            return content
+            finish_reason = choice.get('finish_reason')
+            return self._finish_response(content, profile, finish_reason == 'length', finish_reason)
             
         except requests.exceptions.Timeout:
             self._log_request(False)
-            logger.error("OpenRouter request timeout")
-            raise APIError("OpenRouter request timeout")
+            logger.error(f"{self.label} request timeout")
+            raise TimeoutError(f"{self.label} request timeout", provider=self.name)
         except requests.exceptions.RequestException as e:
             self._log_request(False)
-            logger.error(f"OpenRouter request failed: {e}")
-            raise APIError(f"OpenRouter request failed: {e}")
+            logger.error(f"{self.label} request failed: {e}")
+            raise NetworkError(f"{self.label} request failed: {e}", provider=self.name)
         except json.JSONDecodeError as e:
             self._log_request(False)
-            logger.error(f"Failed to parse OpenRouter response: {e}")
-            raise APIError(f"Invalid JSON response from OpenRouter: {e}")
+            logger.error(f"Failed to parse {self.label} response: {e}")
+            raise InvalidResponseError(f"Invalid JSON response from {self.label}: {e}", provider=self.name)
     
-    def handle_rate_limit(self) -> bool:
+    def _stream_chunks(self, prompt: str, image_b64: Optional[str], system_prompt: Optional[str] = None,
+                       profile: Optional[GenerationProfile] = None, timeout: Optional[float] = None,
+                       history: Sequence[ConversationTurn] = ()) -> Iterator[str]:
         """
-        Handle rate limit by switching models or implementing backoff
+        Stream content deltas from OpenRouter via server-sent events
         """
-        logger.info("Handling OpenRouter rate limit")
+        payload = self._build_payload(prompt, image_b64, system_prompt, profile, history)
+        payload['stream'] = True
+        finish_reason = None
+        usage_recorded = False
+        received = []
         
-        # Try switching to next model
-        if self.switch_model():
-            logger.info(f"Switched to OpenRouter model: {self.get_current_model()}")
-            return True
+        self._acquire_rate_limit()
         
-        # If no more models, implement backoff
-        logger.warning("No more OpenRouter models available, implementing backoff")
-        backoff_time = self._implement_backoff(1)
-        time.sleep(backoff_time)
+        try:
+            logger.debug(f"Streaming request to {self.label} with model: {self.get_current_model()}")
+            response = self._post(payload, stream=True, timeout=timeout)
+        except requests.exceptions.Timeout:
+            self._log_request(False)
+            logger.error(f"{self.label} request timeout")
+            raise TimeoutError(f"{self.label} request timeout", provider=self.name)
+        except requests.exceptions.RequestException as e:
+            self._log_request(False)
+            logger.error(f"{self.label} request failed: {e}")
+            raise NetworkError(f"{self.label} request failed: {e}", provider=self.name)
         
-        # Reset to first model after backoff
-        self.reset_model_index()
-        return True
-
-class RateLimitError(Exception):
-    """Raised when API rate limit is exceeded"""
-    pass
-
-class APIError(Exception):
-    """Raised when API returns an error"""
-    pass
\ No newline at end of file
+        try:
+            self._log_request(response.status_code == 200)
+            self._check_response_status(response)
+            
+            for event in self._iter_sse_events(response):
+                if 'error' in event:
+                    logger.error(f"{self.label} stream error: {event['error']}")
+                    raise ServerError(f"{self.label} stream error: {event['error']}", provider=self.name)
+                
+                # Usage only arrives with the final event, i.e. when the
+                # stream was not cancelled early
+                if event.get('usage'):
+                    self._record_response_usage(event['usage'])
+                    usage_recorded = True
+                
+                choices = event.get('choices') or []
+                if not choices:
+                    continue
+                finish_reason = choices[0].get('finish_reason') or finish_reason
+                content = (choices[0].get('delta') or {}).get('content')
+                if content:
+                    received.append(content)
+                    yield content
+            
+            # Only reached if no complete action arrived before the stream ended
+            if finish_reason == 'length':
+                self.raise_truncated(finish_reason)
+                    
+        except requests.exceptions.RequestException as e:
+            if self._is_timeout(e):
+                logger.error(f"{self.label} stream timeout")
+                raise TimeoutError(f"{self.label} stream timeout", provider=self.name)
+            logger.error(f"{self.label} stream interrupted: {e}")
+            raise NetworkError(f"{self.label} stream interrupted: {e}", provider=self.name)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse {self.label} stream event: {e}")
+            raise InvalidResponseError(f"Invalid JSON event from {self.label} stream: {e}", provider=self.name)
+        finally:
+            response.close()
+            # Cancelled before the final event: the generated part is still billed
+            if response.status_code == 200 and not usage_recorded:
+                self._record_estimated_usage(prompt, image_b64, system_prompt, history, ''.join(received))
@@ -0,0 +1,158 @@
+import importlib
+import logging
+from dataclasses import dataclass, field
+from importlib import metadata
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Entry point group third-party packages use to contribute providers
+ENTRY_POINT_GROUP = 'ki_browser.providers'
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    """
+    Declaration of an LLM provider that can be imported on demand
+
+    Attributes:
+        name: Provider name used for routing and statistics
+        import_path: 'package.module:ClassName' of the BaseLLMProvider subclass
+        configure: Maps the app config to constructor kwargs (must include
+            'models'), or returns None if the provider is not configured
+        capabilities: Feature flags such as 'vision' or 'streaming'
+    """
+    name: str
+    import_path: str
+    configure: Callable[[Any], Optional[Dict[str, Any]]]
+    capabilities: FrozenSet[str] = field(default_factory=frozenset)
+
+def _configure_openrouter(config) -> Optional[Dict[str, Any]]:
+    if not config.OPENROUTER_API_KEY:
+        return None
+    return {
+        'api_key': config.OPENROUTER_API_KEY,
+        'models': config.OPENROUTER_MODELS,
+        'api_url': config.OPENROUTER_API_URL,
+        'structured_output': config.ENABLE_STRUCTURED_OUTPUT
+    }
+
+def _configure_google(config) -> Optional[Dict[str, Any]]:
+    if not config.GOOGLE_API_KEY:
+        return None
+    return {
+        'api_key': config.GOOGLE_API_KEY,
+        'models': config.GOOGLE_MODELS,
+        'api_url_template': config.GOOGLE_API_URL,
+        'context_cache_ttl': config.GOOGLE_CONTEXT_CACHE_TTL,
+        'structured_output': config.ENABLE_STRUCTURED_OUTPUT,
+        'file_upload_ttl': config.GOOGLE_FILE_UPLOAD_TTL
+    }
+
+def _configure_local(config) -> Optional[Dict[str, Any]]:
+    if not config.LOCAL_MODELS:
+        return None
+    return {
+        'models': config.LOCAL_MODELS,
+        'api_url': config.LOCAL_API_URL,
+        'api_key': config.LOCAL_API_KEY,
+        'structured_output': config.ENABLE_STRUCTURED_OUTPUT,
+        'health_check_interval': config.LOCAL_HEALTH_CHECK_INTERVAL
+    }
+
+BUILTIN_PROVIDERS = [
+    ProviderSpec(
+        name='openrouter',
+        import_path='providers.openrouter_provider:OpenRouterProvider',
+        configure=_configure_openrouter,
+        capabilities=frozenset({'vision', 'streaming', 'system_prompt', 'prompt_cache', 'structured_output',
+                                'multi_turn'})
+    ),
+    ProviderSpec(
+        name='google',
+        import_path='providers.google_provider:GoogleProvider',
+        configure=_configure_google,
+        capabilities=frozenset({'vision', 'streaming', 'system_prompt', 'context_cache', 'structured_output',
+                                'file_upload', 'multi_turn'})
+    ),
+    ProviderSpec(
+        name='local',
+        import_path='providers.local_provider:LocalProvider',
+        configure=_configure_local,
+        capabilities=frozenset({'vision', 'streaming', 'system_prompt', 'structured_output'})
+    ),
+]
+
+class ProviderRegistry:
+    """
+    Registry of provider specs; provider modules are imported only when an
+    instance is first created
+    """
+
+    def __init__(self, specs: Optional[List[ProviderSpec]] = None, discover: bool = True):
+        self._specs: Dict[str, ProviderSpec] = {}
+        for spec in specs if specs is not None else BUILTIN_PROVIDERS:
+            self.register(spec)
+        if discover:
+            self.discover_entry_points()
+
+    def register(self, spec: ProviderSpec):
+        """Register or replace a provider spec"""
+        if spec.name in self._specs:
+            logger.info(f"Replacing provider spec '{spec.name}'")
+        self._specs[spec.name] = spec
+
+    def discover_entry_points(self, group: str = ENTRY_POINT_GROUP):
+        """
+        Register provider specs published by installed packages
+
+        Each entry point must resolve to a ProviderSpec or a callable
+        returning one. Broken plugins are logged and skipped.
+        """
+        try:
+            entry_points = metadata.entry_points()
+            if hasattr(entry_points, 'select'):
+                candidates = entry_points.select(group=group)
+            else:
+                candidates = entry_points.get(group, [])
+        except Exception as e:
+            logger.warning(f"Failed to list provider entry points: {e}")
+            return
+
+        for entry_point in candidates:
+            try:
+                spec = entry_point.load()
+                if callable(spec) and not isinstance(spec, ProviderSpec):
+                    spec = spec()
+                if not isinstance(spec, ProviderSpec):
+                    raise TypeError(f"expected ProviderSpec, got {type(spec).__name__}")
+            except Exception as e:
+                logger.warning(f"Ignoring provider plugin '{entry_point.name}': {e}")
+                continue
+            self.register(spec)
+            logger.info(f"Registered provider plugin '{spec.name}' from entry point '{entry_point.name}'")
+
+    def get_spec(self, name: str) -> ProviderSpec:
+        return self._specs[name]
+
+    def names(self) -> List[str]:
+        return list(self._specs)
+
+    def load_class(self, name: str) -> type:
+        """Import and return the provider class of a spec"""
+        module_name, _, class_name = self._specs[name].import_path.partition(':')
+        return getattr(importlib.import_module(module_name), class_name)
+
+    def create(self, name: str, **kwargs):
+        """
+        Import the provider class and instantiate it
+
+        Args:
+            name: Registered provider name
+            **kwargs: Constructor arguments from the spec's configure()
+
+        Returns:
+            Provider instance
+        """
+        provider = self.load_class(name)(**kwargs)
+        provider.name = name
+        return provider
@@ -0,0 +1,90 @@
+import sys
+import types
+from collections import namedtuple
+
+import pytest
+from PIL import Image
+
+Size = namedtuple('Size', 'width height')
+
+SCREEN_CHANGING_CALLS = ('click', 'doubleClick', 'rightClick', 'typewrite', 'hotkey', 'press', 'scroll')
+
+
+class FakeScreen:
+    """
+    Stand-in for pyautogui: every input call changes the screen content
+    """
+
+    def __init__(self):
+        self.frame = 0
+        self.calls = []
+        self.module = types.ModuleType('pyautogui')
+        self.module.FAILSAFE = True
+        self.module.PAUSE = 0
+        self.module.size = lambda: Size(1920, 1080)
+        self.module.screenshot = self.screenshot
+        self.module.moveTo = lambda *args, **kwargs: None
+        for name in SCREEN_CHANGING_CALLS:
+            setattr(self.module, name, self._input(name))
+
+    def _input(self, name):
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            self.frame += 1
+        return call
+
+    def screenshot(self):
+        return Image.new('RGB', (64, 48), ((self.frame * 37) % 256, 0, 0))
+
+
+@pytest.fixture
+def fake_screen(monkeypatch):
+    """Install a fake pyautogui and import the GUI modules against it"""
+    screen = FakeScreen()
+    monkeypatch.setitem(sys.modules, 'pyautogui', screen.module)
+    for name in ('main', 'core.action_executor', 'core.screenshot_manager'):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    return screen
+
+
+@pytest.fixture
+def make_app(fake_screen, monkeypatch, tmp_path):
+    """Build an EnhancedLLMAutomationApp without network access or delays"""
+    import main
+    from config import Config
+
+    settings = {
+        'OPENROUTER_API_KEY': 'test-key', 'GOOGLE_API_KEY': 'test-key', 'LOCAL_MODELS': [],
+        'LOG_FILE': str(tmp_path / 'automation.log'), 'DELAY_BETWEEN_ACTIONS': 0.0, 'PAUSE_BETWEEN_ACTIONS': 0.0,
+        'ENABLE_WARMUP_PROBE': False, 'ENABLE_SCREEN_INDEX': False, 'ENABLE_RESPONSE_CACHE': False,
+        'ENABLE_SHARED_QUOTA': False, 'GOOGLE_CONTEXT_CACHE_TTL': 0, 'GOOGLE_FILE_UPLOAD_TTL': 0
+    }
+
+    def build(**overrides):
+        for name, value in dict(settings, **overrides).items():
+            monkeypatch.setattr(Config, name, value)
+        return main.EnhancedLLMAutomationApp()
+
+    return build
+
+
+@pytest.fixture
+def make_manager(tmp_path):
+    """Build an LLMManager on a Config subclass with only the given features enabled"""
+    from config import Config
+    from core.llm_manager import LLMManager
+
+    settings = {
+        'OPENROUTER_API_KEY': 'test-key', 'GOOGLE_API_KEY': '', 'LOCAL_MODELS': [],
+        'GOOGLE_CONTEXT_CACHE_TTL': 0, 'GOOGLE_FILE_UPLOAD_TTL': 0, 'ENABLE_MODEL_CASCADE': False,
+        'ENABLE_RESPONSE_CACHE': False, 'ENABLE_SHARED_QUOTA': False, 'ENABLE_SINGLE_FLIGHT': False,
+        'RESPONSE_CACHE_PATH': str(tmp_path / 'responses.sqlite3'),
+        'QUOTA_LEDGER_PATH': str(tmp_path / 'quota.sqlite3'),
+        'SINGLE_FLIGHT_PATH': str(tmp_path / 'flights.sqlite3'),
+        'WARMUP_PROFILE_PATH': str(tmp_path / 'latency_profile.json')
+    }
+
+    def build(**overrides):
+        return LLMManager(type('StubConfig', (Config,), dict(settings, **overrides)))
+
+    return build
@@ -0,0 +1,61 @@
+import pytest
+
+from core.api_key_pool import ApiKeyPool, mask_key
+from utils.stub_llm_server import StubBehavior, StubLLMServer
+
+
+def test_parse_and_deduplicate_keys():
+    keys = ApiKeyPool.parse(' a, b ,,a ')
+    assert keys == ['a', 'b', 'a']
+    assert len(ApiKeyPool(keys)) == 2
+
+
+def test_rotation_starts_one_key_further_each_time():
+    pool = ApiKeyPool(['a', 'b', 'c'])
+    assert [key for key, _ in pool.rotation()] == ['a', 'b', 'c']
+    assert [key for key, _ in pool.rotation()] == ['b', 'c', 'a']
+
+
+def test_retired_keys_are_skipped_until_exhausted():
+    pool = ApiKeyPool(['a', 'b'])
+    pool.retire(mask_key('a'), 'HTTP 401')
+
+    assert [key for key, _ in pool.rotation()] == ['b']
+    assert not pool.exhausted
+    pool.retire(mask_key('b'), 'HTTP 401')
+    assert pool.exhausted
+    assert pool.rotation() == []
+    assert pool.get_stats()[mask_key('a')]['retired'] == 'HTTP 401'
+
+
+def test_pool_without_keys_is_never_exhausted():
+    pool = ApiKeyPool([])
+    assert pool.active() == [('', '')]
+    assert not pool.exhausted
+
+
+def test_masked_ids_do_not_reveal_keys():
+    assert mask_key('sk-secret').startswith('key-')
+    assert 'secret' not in mask_key('sk-secret')
+
+
+@pytest.fixture
+def manager_with_keys(make_manager):
+    behavior = StubBehavior(actions=[{'action': 'wait', 'seconds': 0}], rejected_keys=['bad-1', 'bad-2'])
+    with StubLLMServer(behavior) as srv:
+        yield make_manager(OPENROUTER_API_KEY='bad-1,bad-2,good', OPENROUTER_API_URL=srv.openrouter_url,
+                           OPENROUTER_MODELS=['stub/model'], MAX_RETRIES=1)
+
+
+def test_rejected_keys_rotate_without_failing_the_model(manager_with_keys):
+    manager = manager_with_keys
+
+    response = manager.send_request('Weiter', None, stream=False)
+
+    assert '"wait"' in response
+    routing = manager.router.get_stats()['targets']['openrouter/stub/model']
+    assert routing['error_rate'] == 0.0
+    assert routing['circuit_state'] == 'closed'
+    # MAX_RETRIES is 1: the rejected key did not use up the attempt
+    assert manager.errors_by_class == {'key_retired': 1}
+    assert manager.key_pools['openrouter'].active_count() == 2
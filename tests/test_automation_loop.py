@@ -0,0 +1,61 @@
+from core.exceptions import JSONParsingError
+
+
+def script_actions(app, actions):
+    """Answer _request_action with the given actions and record its calls"""
+    calls = []
+
+    def request_action(prompt, image_b64, similar_screen, escalate=False, deadline=None, follow_up=False):
+        calls.append({'escalate': escalate, 'recovery': app.recovery_note})
+        action = actions.pop(0)
+        if isinstance(action, Exception):
+            raise action
+        return action
+
+    app._request_action = request_action
+    return calls
+
+
+def test_plan_checkpoint_does_not_hide_the_screen_change(make_app, fake_screen):
+    app = make_app()
+    no_effect = []
+    app.llm_manager.report_no_effect = lambda: no_effect.append(True)
+    calls = script_actions(app, [
+        {'action': 'plan', 'steps': [
+            {'action': 'click', 'x': 10, 'y': 10},
+            {'action': 'click', 'x': 20, 'y': 20, 'verify_change': True}
+        ]},
+        {'action': 'complete'}
+    ])
+
+    assert app.run_automation('Formular ausfüllen')
+
+    assert fake_screen.calls == ['click', 'click']
+    assert app.action_executor.plans_aborted == 0
+    assert no_effect == []
+    assert calls[1] == {'escalate': False, 'recovery': None}
+
+
+def test_action_without_effect_escalates(make_app, fake_screen):
+    app = make_app()
+    no_effect = []
+    app.llm_manager.report_no_effect = lambda: no_effect.append(True)
+    # A click that does not change the screen
+    fake_screen.module.click = lambda *args, **kwargs: None
+    calls = script_actions(app, [{'action': 'click', 'x': 10, 'y': 10}, {'action': 'complete'}])
+
+    assert app.run_automation('Knopf drücken')
+
+    assert no_effect == [True]
+    assert calls[1]['escalate']
+    assert calls[1]['recovery'] == "Die letzte Aktion hatte keine sichtbare Wirkung."
+
+
+def test_unparseable_answer_escalates_the_next_request(make_app, fake_screen):
+    app = make_app()
+    calls = script_actions(app, [JSONParsingError('Failed to parse LLM response: kein JSON'), {'action': 'complete'}])
+
+    assert app.run_automation('Formular ausfüllen')
+
+    assert calls[0]['escalate'] is False
+    assert calls[1] == {'escalate': True, 'recovery': 'Failed to parse LLM response: kein JSON'}
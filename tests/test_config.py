@@ -0,0 +1,46 @@
+import pytest
+
+from config import Config
+from core.exceptions import ProviderUnavailableError
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    def configure(openrouter='', google='', local=()):
+        monkeypatch.setattr(Config, 'OPENROUTER_API_KEY', openrouter)
+        monkeypatch.setattr(Config, 'GOOGLE_API_KEY', google)
+        monkeypatch.setattr(Config, 'LOCAL_MODELS', list(local))
+    return configure
+
+
+def test_one_provider_is_enough(providers):
+    providers(google='key')
+    assert Config.failed_validations() == []
+    assert not Config.validate_config()['openrouter_available']
+
+
+def test_no_provider_fails_validation(providers):
+    providers()
+    assert Config.failed_validations() == ['provider_available']
+
+
+def test_invalid_setting_is_reported(providers, monkeypatch):
+    providers(openrouter='key')
+    monkeypatch.setattr(Config, 'MAX_ITERATIONS', 0)
+    assert Config.failed_validations() == ['valid_max_iterations']
+
+
+def test_local_only_setup_selects_local(providers, fake_screen):
+    import main
+
+    providers(local=['llava'])
+    assert main.select_provider(Config) == 'local'
+
+    providers()
+    with pytest.raises(ProviderUnavailableError):
+        main.select_provider(Config)
+
+
+def test_app_starts_with_local_models_only(make_app):
+    app = make_app(OPENROUTER_API_KEY='', GOOGLE_API_KEY='', LOCAL_MODELS=['llava'])
+    assert app.llm_manager.get_available_providers() == ['local']
@@ -0,0 +1,48 @@
+import math
+
+import pytest
+
+from core import deadline as deadline_module
+from core.deadline import Deadline
+from core.exceptions import TimeoutError
+from providers.google_provider import GoogleProvider
+from providers.openrouter_provider import OpenRouterProvider
+from utils.stub_llm_server import StubBehavior, StubLLMServer
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(deadline_module.time, 'time', lambda: now[0])
+    return now
+
+
+def test_deadline_without_budget_never_expires():
+    deadline = Deadline()
+    assert deadline.remaining() == math.inf
+    assert not deadline.expired()
+    assert deadline.cap(12.0) == 12.0
+
+
+def test_deadline_counts_down_and_caps_timeouts(clock):
+    deadline = Deadline(10)
+    clock[0] += 4
+    assert deadline.remaining() == 6.0
+    assert deadline.cap(30.0) == 6.0
+    assert deadline.cap(2.0) == 2.0
+
+    clock[0] += 7
+    assert deadline.remaining() == 0.0
+    assert deadline.expired()
+
+
+@pytest.mark.parametrize('make_provider', [
+    lambda srv: OpenRouterProvider('key', ['stub/model'], api_url=srv.openrouter_url),
+    lambda srv: GoogleProvider('key', ['gemini-2.0-flash'], api_url_template=srv.google_url),
+])
+def test_stalled_stream_raises_timeout(make_provider):
+    behavior = StubBehavior(actions=[{'action': 'complete'}], chunk_size=2, chunk_interval=0.5)
+    with StubLLMServer(behavior) as srv:
+        provider = make_provider(srv)
+        with pytest.raises(TimeoutError):
+            provider.send_streaming_request('Weiter', None, timeout=0.2)
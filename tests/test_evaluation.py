@@ -0,0 +1,106 @@
+import base64
+import io
+import json
+from types import SimpleNamespace
+
+from PIL import Image
+
+from core.evaluation import Evaluator, action_matches, load_cases, percentile
+from core.prompt_builder import PromptBuilder
+from providers.base_provider import image_mime_type
+from providers.openrouter_provider import OpenRouterProvider
+
+TARGET = ('stub', 'model')
+
+
+def write_frame(directory, name, image_format, spec):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), (255, 0, 0)).save(buffer, format=image_format)
+    suffix = '.png' if image_format == 'PNG' else '.jpg'
+    (directory / f"{name}{suffix}").write_bytes(buffer.getvalue())
+    if spec is not None:
+        (directory / f"{name}.json").write_text(json.dumps(spec), encoding='utf-8')
+
+
+class FakeProvider:
+    def __init__(self, answer):
+        self.answer = answer
+        self.requests = []
+
+    def send_request(self, prompt, image_b64, system_prompt=None):
+        self.requests.append((prompt, image_b64, system_prompt))
+        return json.dumps(self.answer)
+
+
+class FakeManager:
+    config = SimpleNamespace(MODEL_PRICING={}, PROMPT_TOKEN_BUDGET=1000)
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def get_available_targets(self):
+        return [TARGET]
+
+    def create_target_provider(self, target, usage_tracker=None):
+        return self.provider
+
+
+def test_load_cases_reads_png_and_jpeg_frames(tmp_path):
+    write_frame(tmp_path, 'a', 'PNG', {'prompt': 'Weiter', 'expected': {'action': 'click', 'x': 1, 'y': 2}})
+    write_frame(tmp_path, 'b', 'JPEG', {'expected': [{'action': 'key', 'key': 'enter'}], 'tolerance': 5})
+    write_frame(tmp_path, 'c', 'PNG', None)
+
+    cases = load_cases(str(tmp_path))
+
+    assert [case.name for case in cases] == ['a', 'b']
+    assert cases[0].expected == [{'action': 'click', 'x': 1, 'y': 2}]
+    assert cases[1].tolerance == 5
+    assert [image_mime_type(case.image_b64) for case in cases] == ['image/png', 'image/jpeg']
+
+
+def test_jpeg_frames_are_sent_as_jpeg(tmp_path):
+    write_frame(tmp_path, 'b', 'JPEG', {'expected': {'action': 'complete'}})
+    image_b64 = load_cases(str(tmp_path))[0].image_b64
+
+    message = OpenRouterProvider._build_user_message('Weiter', image_b64)
+    assert message['content'][1]['image_url']['url'].startswith('data:image/jpeg;base64,')
+
+
+def test_action_matches_with_tolerance():
+    expected = {'action': 'click', 'x': 100, 'y': 200}
+    assert action_matches({'action': 'click', 'x': 110, 'y': 190}, expected, 20)
+    assert not action_matches({'action': 'click', 'x': 130, 'y': 200}, expected, 20)
+    assert not action_matches({'action': 'double_click', 'x': 100, 'y': 200}, expected, 20)
+    assert action_matches({'action': 'type', 'text': 'Hallo '}, {'action': 'type', 'text': 'hallo'}, 0)
+
+
+def test_percentile_nearest_rank():
+    assert percentile([], 50) is None
+    assert percentile([3.0, 1.0, 2.0, 4.0], 50) == 2.0
+    assert percentile([3.0, 1.0, 2.0, 4.0], 99) == 4.0
+
+
+def test_evaluator_sends_builder_prompts_and_scores(tmp_path):
+    write_frame(tmp_path, 'a', 'PNG', {'prompt': 'Weiter', 'expected': {'action': 'click', 'x': 10, 'y': 10}})
+    write_frame(tmp_path, 'b', 'PNG', {'prompt': 'Fertig', 'expected': {'action': 'complete'}})
+    provider = FakeProvider({'action': 'click', 'x': 12, 'y': 9})
+    builder = PromptBuilder(1000, history_size=0)
+
+    report = Evaluator(FakeManager(provider), prompt_builder=builder, workers=2).run(load_cases(str(tmp_path)))
+
+    assert report[0]['correct'] == 1
+    assert report[0]['failures'] == ['b']
+    assert sorted(prompt for prompt, _, _ in provider.requests) == ['Aufgabe: Fertig', 'Aufgabe: Weiter']
+    assert {system for _, _, system in provider.requests} == {builder.system_prompt}
+
+
+def test_crashed_case_is_reported_as_error(tmp_path):
+    # A malformed sidecar: expected actions must be objects
+    write_frame(tmp_path, 'bad', 'PNG', {'prompt': 'Weiter', 'expected': ['click']})
+    provider = FakeProvider({'action': 'click', 'x': 1, 'y': 1})
+
+    report = Evaluator(FakeManager(provider), workers=1).run(load_cases(str(tmp_path)))
+
+    assert report[0]['cases'] == 1
+    assert report[0]['errors'] == 1
+    assert report[0]['failures'] == ['bad']
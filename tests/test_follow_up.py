@@ -0,0 +1,107 @@
+import pytest
+
+from core.llm_manager import FOLLOW_UP_PREFIX
+from providers.google_provider import GoogleProvider
+from providers.local_provider import LocalProvider
+from providers.openrouter_provider import OpenRouterProvider
+from providers.registry import ProviderRegistry
+
+FRAME = 'frame-a'
+RESPONSE = '{"action":"wait","seconds":0}'
+
+
+@pytest.fixture
+def manager_for(make_manager, monkeypatch):
+    """Build a manager for one OpenRouter model that records what it sends"""
+    def build(model):
+        manager = make_manager(OPENROUTER_MODELS=[model])
+        sent = []
+
+        def send_to_provider(provider, prompt, image_b64, history, *args, **kwargs):
+            sent.append({'prompt': prompt, 'image_b64': image_b64, 'history': history})
+            return RESPONSE
+
+        monkeypatch.setattr(manager, '_send_to_provider', send_to_provider)
+        return manager, sent
+
+    return build
+
+
+def test_unchanged_frame_is_sent_as_follow_up_to_a_caching_model(manager_for):
+    manager, sent = manager_for('anthropic/claude-3.5-sonnet')
+
+    manager.send_request('Schritt 1', FRAME, stream=False, follow_up=True)
+    manager.send_request('Schritt 2', FRAME, stream=False, follow_up=True)
+
+    assert sent[1]['image_b64'] is None
+    assert sent[1]['prompt'] == FOLLOW_UP_PREFIX + 'Schritt 2'
+    assert [turn.image_b64 for turn in sent[1]['history']] == [FRAME]
+    assert manager.follow_up_requests == 1
+
+
+def test_consecutive_follow_ups_reuse_the_cached_prefix(manager_for):
+    manager, sent = manager_for('anthropic/claude-3.5-sonnet')
+
+    for step in range(1, 4):
+        manager.send_request(f'Schritt {step}', FRAME, stream=False, system_prompt='System', follow_up=True)
+
+    assert sent[1]['history'] == sent[2]['history']
+    assert sent[2]['history'][0].prompt == 'Schritt 1'
+    provider = manager.providers['openrouter']
+    payloads = [provider._build_payload(request['prompt'], request['image_b64'], 'System', history=request['history'])
+                for request in sent[1:]]
+    # Everything up to the cache_control breakpoint is byte-identical
+    assert payloads[0]['messages'][:-1] == payloads[1]['messages'][:-1]
+    assert payloads[0]['messages'][1]['content'][-1]['cache_control'] == {'type': 'ephemeral'}
+    assert manager.follow_up_requests == 2
+
+
+def test_stateless_model_gets_the_screenshot_again(manager_for):
+    manager, sent = manager_for('meta-llama/llama-3.2-11b-vision-instruct')
+
+    manager.send_request('Schritt 1', FRAME, stream=False, follow_up=True)
+    manager.send_request('Schritt 2', FRAME, stream=False, follow_up=True)
+
+    assert sent[1] == {'prompt': 'Schritt 2', 'image_b64': FRAME, 'history': ()}
+    assert manager.follow_up_requests == 0
+
+
+def test_follow_up_needs_the_frame_the_model_received_last(manager_for):
+    manager, sent = manager_for('anthropic/claude-3.5-sonnet')
+
+    manager.send_request('Schritt 1', FRAME, stream=False, follow_up=True)
+    manager.send_request('Schritt 2', 'frame-b', stream=False, follow_up=True)
+    manager.send_request('Schritt 3', FRAME, stream=False, follow_up=True)
+
+    assert [request['image_b64'] for request in sent] == [FRAME, 'frame-b', FRAME]
+    assert manager.last_turn.image_b64 == FRAME
+
+
+def test_failed_request_does_not_become_the_follow_up_base(manager_for, monkeypatch):
+    manager, sent = manager_for('anthropic/claude-3.5-sonnet')
+    manager.send_request('Schritt 1', FRAME, stream=False, follow_up=True)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(manager, '_send_to_provider', fail)
+    with pytest.raises(Exception):
+        manager.send_request('Schritt 2', 'frame-b', stream=False, max_retries=1)
+
+    assert manager.last_turn.image_b64 == FRAME
+
+
+@pytest.mark.parametrize('provider, expected', [
+    (OpenRouterProvider('key', ['anthropic/claude-3.5-sonnet']), True),
+    (OpenRouterProvider('key', ['meta-llama/llama-3.2-11b-vision-instruct']), False),
+    (LocalProvider(['llava']), False),
+    # Repeated frames already go out as file URIs; a follow-up saves nothing
+    (GoogleProvider('key', ['gemini-2.0-flash'], file_upload_ttl=3600), False),
+    (GoogleProvider('key', ['gemini-2.0-flash']), False),
+])
+def test_supports_follow_up(provider, expected):
+    assert provider.supports_follow_up() is expected
+
+
+def test_local_provider_has_no_multi_turn_capability():
+    assert 'multi_turn' not in ProviderRegistry().get_spec('local').capabilities
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+import requests
+
+from core.exceptions import TruncatedResponseError
+from core.generation_profile import GenerationProfile, GenerationProfiles
+from providers.openrouter_provider import OpenRouterProvider
+
+
+def test_expanded_raises_the_cap_and_shifts_budget_from_thinking():
+    profile = GenerationProfile(max_tokens=500, stop_sequences=('}\n\n',), thinking_budget=1024,
+                                reasoning_effort='high')
+
+    expanded = profile.expanded()
+
+    assert expanded.max_tokens == 1000
+    assert expanded.thinking_budget == 512
+    assert expanded.reasoning_effort == 'low'
+    assert expanded.stop_sequences == profile.stop_sequences
+
+
+def test_expanded_respects_the_limit_and_unset_settings():
+    expanded = GenerationProfile(max_tokens=3000).expanded(factor=2.0, max_tokens_limit=4096)
+    assert expanded == GenerationProfile(max_tokens=4096)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('{"action":"complete"', '{"action":"complete"}'),
+    ('{"action":"plan","steps":[{"action":"click","x":1,"y":2}]  ', '{"action":"plan","steps":[{"action":"click","x":1,"y":2}]}'),
+    ('{"action":"complete"}', '{"action":"complete"}'),
+    ('{"action":"type","text":"{', '{"action":"type","text":"{'),
+    ('', ''),
+])
+def test_restore_stop_sequence(text, expected):
+    assert GenerationProfile.restore_stop_sequence(text) == expected
+
+
+def test_longest_matching_override_wins():
+    profiles = GenerationProfiles(GenerationProfile(max_tokens=500), {
+        'gemini-2.5': {'thinking_budget': 256},
+        'gemini-2.5-pro': {'max_tokens': 2000, 'stop_sequences': ['}\n\n']}
+    })
+
+    assert profiles.get('gemini-2.5-pro-preview') == GenerationProfile(max_tokens=2000, stop_sequences=('}\n\n',))
+    assert profiles.get('gemini-2.5-flash') == GenerationProfile(max_tokens=500, thinking_budget=256)
+    assert profiles.get('gemini-2.0-flash') is profiles.default
+
+
+def test_profiles_expand_with_configured_factor_and_limit():
+    profiles = GenerationProfiles(GenerationProfile(max_tokens=500), retry_factor=3.0, max_tokens_limit=1200)
+    assert profiles.expanded(profiles.default).max_tokens == 1200
+
+
+def chat_response(content, finish_reason):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps({
+        'choices': [{'message': {'content': content}, 'finish_reason': finish_reason}]
+    }).encode('utf-8')
+    return response
+
+
+def test_truncated_response_is_retried_once_with_a_larger_budget(make_manager):
+    manager = make_manager(OPENROUTER_MODELS=['stub/model'], MAX_TOKENS=300, STOP_SEQUENCES=[])
+    provider = manager._get_provider('openrouter')
+    responses = [chat_response('{"action":"type","te', 'length'), chat_response('{"action":"complete"}', 'stop')]
+    payloads = []
+
+    def post(url, json=None, **kwargs):
+        payloads.append(json)
+        return responses.pop(0)
+
+    provider.session.post = post
+
+    assert manager.send_request('Weiter', None, stream=False) == '{"action":"complete"}'
+
+    assert [payload['max_tokens'] for payload in payloads] == [300, 600]
+    assert [payload['model'] for payload in payloads] == ['stub/model', 'stub/model']
+    assert manager.truncation_retries == 1
+    assert provider.truncated_responses == 1
+
+
+def test_truncation_only_raises_without_a_complete_action():
+    provider = OpenRouterProvider('key', ['stub/model'])
+    profile = GenerationProfile(max_tokens=50)
+
+    assert provider._finish_response('{"action":"complete"} und', profile, True, 'length') \
+        == '{"action":"complete"} und'
+    with pytest.raises(TruncatedResponseError):
+        provider._finish_response('{"action":"cli', profile, True, 'length')
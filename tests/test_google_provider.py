@@ -0,0 +1,100 @@
+import json
+import time
+
+import requests
+
+from core.deadline import Deadline
+from core.prompt_builder import build_system_prompt
+from providers.google_provider import CONTEXT_CACHE_MIN_TOKENS, GoogleProvider
+
+API_URL_TEMPLATE = 'http://stub/v1beta/models/{model}:generateContent'
+LONG_PROMPT = 'x' * (CONTEXT_CACHE_MIN_TOKENS * 4)
+
+
+def make_response(status, body):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(body).encode('utf-8')
+    return response
+
+
+def make_provider(responses):
+    provider = GoogleProvider('key', ['gemini-2.0-flash'], api_url_template=API_URL_TEMPLATE, context_cache_ttl=600)
+    calls = []
+
+    def post(url, **kwargs):
+        calls.append(url)
+        return responses.pop(0)
+
+    provider.session.post = post
+    return provider, calls
+
+
+def test_short_system_prompt_is_not_sent_to_the_cache():
+    provider, calls = make_provider([])
+    assert provider._get_cached_content('kurzer Prompt') is None
+    assert calls == []
+
+
+def test_built_in_system_prompt_is_below_the_cache_minimum():
+    provider, calls = make_provider([])
+    assert provider._get_cached_content(build_system_prompt()) is None
+    assert calls == []
+
+
+def test_non_json_cache_response_falls_back_to_system_instruction():
+    invalid = requests.Response()
+    invalid.status_code = 200
+    invalid._content = b'<html>proxy error</html>'
+    provider, calls = make_provider([invalid, make_response(200, {'name': 'cachedContents/abc'})])
+
+    assert provider._get_cached_content(LONG_PROMPT) is None
+    # Not remembered as unsupported: the next request tries again
+    assert provider._get_cached_content(LONG_PROMPT) == 'cachedContents/abc'
+    assert len(calls) == 2
+
+
+def test_transient_errors_do_not_disable_context_caching():
+    provider, calls = make_provider([
+        make_response(429, {'error': {'status': 'RESOURCE_EXHAUSTED'}}),
+        make_response(503, {'error': {'status': 'UNAVAILABLE'}}),
+        make_response(200, {'name': 'cachedContents/abc'})
+    ])
+    assert provider._get_cached_content(LONG_PROMPT) is None
+    assert provider._get_cached_content(LONG_PROMPT) is None
+    assert provider._get_cached_content(LONG_PROMPT) == 'cachedContents/abc'
+    assert provider._get_cached_content(LONG_PROMPT) == 'cachedContents/abc'
+    assert len(calls) == 3
+
+
+def test_too_small_rejection_is_remembered():
+    provider, calls = make_provider([
+        make_response(400, {'error': {'message': 'Cached content is too small. min_total_token_count=4096'}})
+    ])
+    assert provider._get_cached_content(LONG_PROMPT) is None
+    assert provider._get_cached_content(LONG_PROMPT) is None
+    assert len(calls) == 1
+
+
+def test_context_cache_creation_uses_the_request_deadline():
+    provider, _ = make_provider([make_response(200, {'name': 'cachedContents/abc'})])
+    timeouts = []
+    post = provider.session.post
+
+    def record_timeout(url, **kwargs):
+        timeouts.append(kwargs['timeout'])
+        return post(url, **kwargs)
+
+    provider.session.post = record_timeout
+    provider._get_cached_content(LONG_PROMPT, Deadline(5))
+
+    assert 0 < timeouts[0] <= 5
+
+
+def test_expired_deadline_skips_context_cache_creation():
+    provider, calls = make_provider([])
+    deadline = Deadline(0.001)
+    time.sleep(0.01)
+
+    assert provider._get_cached_content(LONG_PROMPT, deadline) is None
+    assert calls == []
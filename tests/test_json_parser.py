@@ -0,0 +1,63 @@
+import json
+
+from utils.json_parser import IncrementalJSONParser, RobustJSONParser, build_action_schema
+
+
+def feed_all(parser, chunks):
+    for chunk in chunks:
+        result = parser.feed(chunk)
+        if result is not None:
+            return result
+    return None
+
+
+def test_returns_object_as_soon_as_it_closes():
+    parser = IncrementalJSONParser()
+    assert parser.feed('Ich klicke: {"action": "cli') is None
+    assert parser.feed('ck", "x": 10, "y": 20') is None
+    assert parser.feed('}\nund dann') == '{"action": "click", "x": 10, "y": 20}'
+
+
+def test_handles_braces_and_escaped_quotes_inside_strings():
+    text = '{"action": "type", "text": "a } \\" {b"}'
+    assert feed_all(IncrementalJSONParser(), list(text)) == text
+
+
+def test_skips_objects_without_required_keys():
+    chunks = ['{"note": 1} ', '{"action": "wait", "seconds": 1}']
+    assert feed_all(IncrementalJSONParser(), chunks) == '{"action": "wait", "seconds": 1}'
+
+
+def test_nested_plan_is_returned_whole():
+    plan = {'action': 'plan', 'steps': [{'action': 'click', 'x': 1, 'y': 2}, {'action': 'key', 'key': 'enter'}]}
+    text = json.dumps(plan)
+    result = feed_all(IncrementalJSONParser(), [text[i:i + 7] for i in range(0, len(text), 7)])
+    assert json.loads(result) == plan
+
+
+def test_ignores_unbalanced_quotes_in_leading_prose():
+    assert feed_all(IncrementalJSONParser(), ['Das "Feld ', '{"action": "complete"}']) == '{"action": "complete"}'
+
+
+def test_incomplete_object_returns_none():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"action": "click", "x": 1') is None
+    assert parser.buffer == '{"action": "click", "x": 1'
+
+
+def test_parse_llm_response_extracts_from_code_block():
+    content = 'Antwort:\n```json\n{"action": "navigate", "url": "https://example.com"}\n```'
+    assert RobustJSONParser.parse_llm_response(content) == {'action': 'navigate', 'url': 'https://example.com'}
+
+
+def test_validate_action_data_checks_required_fields_and_nested_plans():
+    assert RobustJSONParser.validate_action_data({'action': 'click', 'x': 1, 'y': 2})
+    assert not RobustJSONParser.validate_action_data({'action': 'click', 'x': 1})
+    assert not RobustJSONParser.validate_action_data({'action': 'plan', 'steps': [{'action': 'plan', 'steps': []}]})
+    assert not RobustJSONParser.validate_action_data(None)
+
+
+def test_action_schema_lists_all_actions():
+    schema = build_action_schema()
+    assert 'plan' in schema['properties']['action']['enum']
+    assert 'plan' not in schema['properties']['steps']['items']['properties']['action']['enum']
@@ -0,0 +1,97 @@
+import pytest
+
+from core.model_cascade import ModelCascade
+
+CHEAP = ('openrouter', 'stub/cheap')
+STRONG = ('openrouter', 'stub/strong')
+RESPONSE = '{"action":"wait","seconds":0}'
+
+
+def test_parse_targets_skips_invalid_specs():
+    specs = [' google:gemini-1.5-flash-8b ', 'openrouter', '', 'local:']
+    assert ModelCascade.parse_targets(specs) == [('google', 'gemini-1.5-flash-8b')]
+
+
+def test_split_tries_cheap_tier_first():
+    cascade = ModelCascade([CHEAP])
+    assert cascade.split([STRONG, CHEAP]) == [('cheap', [CHEAP]), ('strong', [STRONG])]
+    assert cascade.split([STRONG]) == [('strong', [STRONG])]
+
+
+def test_escalation_skips_the_cheap_tier_unless_it_is_all_there_is():
+    cascade = ModelCascade([CHEAP])
+    assert cascade.split([STRONG, CHEAP], escalate=True) == [('strong', [STRONG])]
+    assert cascade.split([CHEAP], escalate=True) == [('cheap', [CHEAP])]
+
+
+def test_only_cheap_tier_rejections_count_as_escalations():
+    cascade = ModelCascade([CHEAP])
+    cascade.record_response('cheap', 1.0)
+    cascade.record_response('cheap', 1.0)
+    cascade.record_response('strong', 4.0)
+    cascade.record_rejection('cheap', 'parse_failure')
+    cascade.record_rejection('strong', 'no_effect')
+    cascade.record_rejection(None, 'no_effect')
+
+    stats = cascade.get_stats()
+    assert stats['escalations'] == {'parse_failure': 1}
+    assert stats['tiers']['cheap']['hit_rate'] == 0.5
+    assert stats['tiers']['strong']['rejections'] == 1
+    # One cheap hit saved the difference to the strong tier's latency
+    assert stats['estimated_latency_saved'] == 3.0
+
+
+@pytest.fixture
+def cascade_manager(make_manager, monkeypatch):
+    """Manager with a cheap and a strong model that records the models it asks"""
+    manager = make_manager(OPENROUTER_MODELS=['stub/strong', 'stub/cheap'], ENABLE_MODEL_CASCADE=True,
+                           CASCADE_CHEAP_MODELS=['openrouter:stub/cheap'], MAX_RETRIES=2, RETRY_DELAY=0)
+    asked = []
+    failing = set()
+
+    def send_to_provider(provider, *args, **kwargs):
+        model = provider.get_current_model()
+        asked.append(model)
+        if model in failing:
+            raise ConnectionError('stub failure')
+        return RESPONSE
+
+    monkeypatch.setattr(manager, '_send_to_provider', send_to_provider)
+    return manager, asked, failing
+
+
+def test_cheap_model_answers_first(cascade_manager):
+    manager, asked, _ = cascade_manager
+    manager.send_request('Weiter', None, stream=False)
+
+    assert asked == ['stub/cheap']
+    assert manager.last_tier == 'cheap'
+
+
+@pytest.mark.parametrize('report', ['report_no_effect', 'report_parse_failure'])
+def test_rejected_cheap_answer_escalates_to_the_strong_model(cascade_manager, report):
+    manager, asked, _ = cascade_manager
+    manager.send_request('Weiter', None, stream=False)
+    if report == 'report_no_effect':
+        manager.report_no_effect()
+    else:
+        manager.report_parse_result(False)
+
+    manager.send_request('Weiter', None, stream=False, escalate=True)
+
+    assert asked == ['stub/cheap', 'stub/strong']
+    assert manager.last_tier == 'strong'
+    reason = 'no_effect' if report == 'report_no_effect' else 'parse_failure'
+    assert manager.cascade.get_stats()['escalations'] == {reason: 1}
+
+
+def test_failing_cheap_model_falls_back_to_the_strong_model(cascade_manager):
+    manager, asked, failing = cascade_manager
+    failing.add('stub/cheap')
+
+    assert manager.send_request('Weiter', None, stream=False) == RESPONSE
+
+    assert asked == ['stub/cheap', 'stub/strong']
+    assert manager.last_tier == 'strong'
+    tiers = manager.cascade.get_stats()['tiers']
+    assert (tiers['cheap']['requests'], tiers['strong']['requests']) == (0, 1)
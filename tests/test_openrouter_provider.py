@@ -0,0 +1,50 @@
+import pytest
+
+from core.usage_tracker import UsageTracker
+from providers.base_provider import ESTIMATED_IMAGE_TOKENS
+from providers.openrouter_provider import OpenRouterProvider
+from utils.stub_llm_server import StubBehavior, StubLLMServer
+
+ACTION = {'action': 'click', 'x': 120, 'y': 340}
+PRICING = {'openrouter': {'*': {'input': 1.0, 'output': 2.0}}}
+
+
+@pytest.fixture
+def server():
+    behavior = StubBehavior(actions=[ACTION], chunk_size=4, chunk_interval=0.005, seed=1)
+    with StubLLMServer(behavior) as srv:
+        yield srv
+
+
+def make_provider(server):
+    provider = OpenRouterProvider('key', ['stub/model'], api_url=server.openrouter_url)
+    provider.name = 'openrouter'
+    provider.usage_tracker = UsageTracker(PRICING)
+    return provider
+
+
+def test_cancelled_stream_records_estimated_usage(server):
+    provider = make_provider(server)
+
+    response = provider.send_streaming_request('Klicke auf Weiter', 'aGVsbG8=', system_prompt='Regeln')
+
+    assert '"x": 120' in response
+    assert provider.early_stops == 1
+    session = provider.usage_tracker.get_stats()['session']
+    assert session['responses'] == 1
+    assert session['estimated_responses'] == 1
+    assert session['image_tokens'] == ESTIMATED_IMAGE_TOKENS
+    assert session['prompt_tokens'] > ESTIMATED_IMAGE_TOKENS
+    assert session['output_tokens'] > 0
+    assert session['cost'] > 0
+
+
+def test_reported_usage_is_not_marked_estimated(server):
+    provider = make_provider(server)
+
+    provider.send_request('Klicke auf Weiter', 'aGVsbG8=', system_prompt='Regeln')
+
+    session = provider.usage_tracker.get_stats()['session']
+    assert session['prompt_tokens'] == 1000
+    assert session['estimated_responses'] == 0
+    assert provider.get_stats()['estimated_usage'] == 0
@@ -0,0 +1,111 @@
+from core.prompt_builder import CHARS_PER_TOKEN, PromptBuilder, build_action_grammar, estimate_tokens
+from utils.json_parser import ACTION_FIELDS
+
+TASK = 'Öffne die Einstellungen'
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('a') == 1
+    assert estimate_tokens('a' * 35) == 10
+
+
+def test_grammar_covers_every_action_once():
+    grammar = build_action_grammar()
+    listed = [action for line in grammar.splitlines() for action in line.split(':')[0].split(' ')[0].split('|')]
+    assert sorted(listed) == sorted(ACTION_FIELDS)
+    # Actions with the same fields and no note share a line
+    assert 'click|double_click|right_click|move_mouse: x,y' in grammar
+    assert 'scroll: x,y,clicks (clicks negativ = nach unten)' in grammar
+
+
+def test_prompt_within_budget_keeps_all_sections():
+    builder = PromptBuilder(budget=10000)
+    builder.record_action({'action': 'click', 'x': 1, 'y': 2})
+
+    built = builder.build(TASK, hint={'action': 'key', 'key': 'enter'}, recovery='Kein Effekt')
+
+    assert built.text.splitlines() == [
+        f'Aufgabe: {TASK}',
+        'Letzte Aktionen: {"action":"click","x":1,"y":2}',
+        'Auf einem sehr ähnlichen Bildschirm war erfolgreich: {"action":"key","key":"enter"}',
+        'Problem im letzten Schritt: Kein Effekt'
+    ]
+    assert not built.trimmed
+    assert built.tokens['system'] == builder.system_tokens
+    assert built.total_tokens == sum(built.tokens.values())
+
+
+def test_history_keeps_only_the_last_actions():
+    builder = PromptBuilder(budget=10000, history_size=2)
+    for x in range(3):
+        builder.record_action({'action': 'click', 'x': x, 'y': 0})
+
+    text = builder.build(TASK).text
+    assert '"x":0' not in text
+    assert '"x":1' in text and '"x":2' in text
+
+
+def test_history_size_zero_records_nothing():
+    builder = PromptBuilder(budget=10000, history_size=0)
+    builder.record_action({'action': 'complete'})
+    assert builder.build(TASK).text == f'Aufgabe: {TASK}'
+
+
+def test_oldest_history_is_dropped_first():
+    builder = PromptBuilder(budget=10000)
+    for x in range(3):
+        builder.record_action({'action': 'click', 'x': x, 'y': 0})
+    full = builder.build(TASK)
+    builder.budget = full.total_tokens - 1
+
+    built = builder.build(TASK)
+
+    assert built.trimmed
+    assert built.total_tokens <= builder.budget
+    assert '"x":0' not in built.text
+    assert '"x":2' in built.text
+    assert builder.get_stats()['trimmed'] == 1
+
+
+def test_recovery_is_shortened_after_history_is_gone():
+    builder = PromptBuilder(budget=10000)
+    builder.record_action({'action': 'click', 'x': 1, 'y': 2})
+    recovery = 'Die letzte Aktion hatte keine sichtbare Wirkung. ' * 4
+    base = builder.system_tokens + estimate_tokens(f'Aufgabe: {TASK}')
+    builder.budget = base + 10
+
+    built = builder.build(TASK, recovery=recovery)
+
+    assert built.trimmed
+    assert 'Letzte Aktionen' not in built.text
+    assert 'Problem im letzten Schritt: Die' in built.text
+    assert built.total_tokens <= builder.budget
+    assert len(built.text) < len(f'Aufgabe: {TASK}\n') + len(recovery)
+
+
+def test_task_is_never_cut():
+    task = 'x' * int(200 * CHARS_PER_TOKEN)
+    builder = PromptBuilder(budget=100)
+    builder.record_action({'action': 'complete'})
+
+    built = builder.build(task, recovery='Fehler')
+
+    assert built.text == f'Aufgabe: {task}'
+    assert built.total_tokens > builder.budget
+    stats = builder.get_stats()
+    assert stats['over_budget'] == 1
+    assert stats['trimmed'] == 1
+
+
+def test_stats_average_tokens_per_section():
+    builder = PromptBuilder(budget=10000)
+    builder.build('a' * 7)
+    builder.build('a' * 7, recovery='b' * 7)
+
+    stats = builder.get_stats()
+
+    assert stats['prompts'] == 2
+    assert stats['avg_tokens']['system'] == builder.system_tokens
+    assert stats['avg_tokens']['recovery'] == estimate_tokens('Problem im letzten Schritt: ' + 'b' * 7) / 2
+    assert stats['avg_tokens']['history'] == 0
@@ -0,0 +1,128 @@
+from core import provider_router
+from core.provider_router import CircuitBreaker, ProviderRouter
+
+A = ('google', 'fast')
+B = ('openrouter', 'slow')
+
+
+def open_breaker(breaker, now=100.0):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure(now)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+    breaker.record_failure(100.0)
+    breaker.record_failure(100.0)
+    assert breaker.allow_request(101.0)
+    breaker.record_failure(100.0)
+    assert not breaker.allow_request(105.0)
+    assert breaker.times_opened == 1
+
+
+def test_half_open_admits_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    open_breaker(breaker)
+
+    assert breaker.allow_request(110.0)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request(110.5)
+    assert not breaker.allow_request(111.0)
+
+
+def test_successful_probe_closes_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    open_breaker(breaker)
+    assert breaker.allow_request(110.0)
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request(110.5)
+    assert breaker.allow_request(110.5)
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+    open_breaker(breaker)
+    assert breaker.allow_request(110.0)
+
+    breaker.record_failure(110.0)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request(115.0)
+    assert breaker.allow_request(120.0)
+    assert breaker.times_opened == 2
+
+
+def test_abandoned_probe_is_given_up_after_reset_timeout():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    open_breaker(breaker)
+    assert breaker.allow_request(110.0)
+
+    assert not breaker.allow_request(119.0)
+    assert breaker.allow_request(120.0)
+
+
+def test_unmeasured_targets_come_first_then_by_score():
+    router = ProviderRouter()
+    router.record_success(B, 4.0)
+    assert router.rank([B, A]) == [A, B]
+
+    router.record_success(A, 1.0)
+    assert router.rank([B, A]) == [A, B]
+    assert router.last_decision == A
+
+
+def test_errors_inflate_the_score():
+    router = ProviderRouter(alpha=0.5)
+    router.record_success(A, 1.0)
+    router.record_success(B, 1.5)
+    router.record_failure(A)
+    router.record_failure(A)
+    assert router.rank([A, B]) == [B, A]
+
+
+def test_open_circuit_is_skipped_and_probed_once(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(provider_router.time, 'time', lambda: now[0])
+    router = ProviderRouter(failure_threshold=1, reset_timeout=30)
+    router.record_success(B, 2.0)
+    router.record_failure(A)
+
+    assert router.rank([A, B]) == [B]
+
+    now[0] += 30
+    assert router.rank([A, B]) == [B, A]
+    assert router.rank([A, B]) == [B]
+
+    router.record_success(A, 0.5)
+    assert router.rank([A, B]) == [A, B]
+
+
+def test_timeout_follows_p95_latency():
+    router = ProviderRouter(timeout_factor=2.0, timeout_min_samples=5, min_timeout=1.0)
+    assert router.get_timeout(A, 30.0) == 30.0
+
+    for latency in (1.0, 1.0, 1.0, 1.0, 2.0):
+        router.record_success(A, latency)
+    assert router.get_timeout(A, 30.0) == 4.0
+    assert router.get_timeout(A, 3.0) == 3.0
+
+
+def test_timeout_counts_as_failure_and_latency_sample():
+    router = ProviderRouter(failure_threshold=1)
+    router.record_timeout(A, 8.0)
+
+    stats = router.get_stats()['targets']['google/fast']
+    assert stats['timeouts'] == 1
+    assert stats['latency_p95'] == 8.0
+    assert stats['circuit_state'] == CircuitBreaker.OPEN
+
+
+def test_failed_probe_ranks_last_without_opening_the_breaker():
+    router = ProviderRouter(failure_threshold=1)
+    router.seed(A, None)
+    router.seed(B, 1.0)
+
+    assert router.rank([A, B]) == [B, A]
+    assert router.get_stats()['targets']['google/fast']['circuit_state'] == CircuitBreaker.CLOSED
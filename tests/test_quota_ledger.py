@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from core.quota_ledger import SharedQuotaLedger
+
+QUOTAS = {'google': {'gemini': {'rpm': 3}, '*': {'rpd': 100}}}
+
+
+@pytest.fixture
+def ledger_path(tmp_path):
+    return str(tmp_path / 'quota.sqlite3')
+
+
+def test_instances_share_one_quota(ledger_path):
+    first = SharedQuotaLedger(ledger_path, QUOTAS)
+    second = SharedQuotaLedger(ledger_path, QUOTAS)
+
+    assert first.try_acquire('google', 'gemini') == 0.0
+    assert second.try_acquire('google', 'gemini') == 0.0
+    assert first.try_acquire('google', 'gemini') == 0.0
+    assert second.try_acquire('google', 'gemini') > 0
+    assert second.throttled == 1
+
+
+def test_keys_have_separate_quotas(ledger_path):
+    ledger = SharedQuotaLedger(ledger_path, QUOTAS)
+    for _ in range(3):
+        assert ledger.try_acquire('google', 'gemini', 'key-a') == 0.0
+    assert ledger.try_acquire('google', 'gemini', 'key-a') > 0
+    assert ledger.try_acquire('google', 'gemini', 'key-b') == 0.0
+
+
+def test_daily_quota_survives_a_restart(ledger_path):
+    quotas = {'google': {'gemini': {'rpd': 2}}}
+    ledger = SharedQuotaLedger(ledger_path, quotas)
+    ledger.try_acquire('google', 'gemini')
+    ledger.try_acquire('google', 'gemini')
+
+    reopened = SharedQuotaLedger(ledger_path, quotas)
+    assert reopened.try_acquire('google', 'gemini') > 3600
+
+
+def test_cooldown_is_visible_to_other_instances(ledger_path):
+    first = SharedQuotaLedger(ledger_path, QUOTAS)
+    second = SharedQuotaLedger(ledger_path, QUOTAS)
+
+    first.cool_down('google', '*', 30)
+
+    assert 29 < second.wait_time('google', 'gemini') <= 30
+    assert 'google/*' in second.get_stats()['cooling_targets']
+    assert second.wait_time('openrouter', 'other') == 0.0
+
+
+def test_remaining_header_limits_all_instances(ledger_path):
+    first = SharedQuotaLedger(ledger_path, QUOTAS)
+    second = SharedQuotaLedger(ledger_path, QUOTAS)
+
+    first.update_from_headers('google', 'gemini', {'X-RateLimit-Remaining': '1'})
+
+    assert second.try_acquire('google', 'gemini') == 0.0
+    assert second.try_acquire('google', 'gemini') > 0
+
+
+def test_concurrent_instances_never_overspend(ledger_path):
+    quotas = {'google': {'gemini': {'rpm': 10}}}
+    granted = []
+
+    def worker():
+        ledger = SharedQuotaLedger(ledger_path, quotas)
+        granted.extend(ledger.try_acquire('google', 'gemini') == 0.0 for _ in range(10))
+
+    SharedQuotaLedger(ledger_path, quotas)
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(granted) == 40
+    assert granted.count(True) == 10
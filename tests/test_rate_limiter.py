@@ -0,0 +1,111 @@
+from core import rate_limiter
+from core.rate_limiter import RateLimiter, TokenBucket, parse_rate_limit_reset, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def use_clock(monkeypatch, clock):
+    monkeypatch.setattr(rate_limiter.time, 'time', clock)
+
+
+def test_token_bucket_refills_continuously():
+    bucket = TokenBucket(2, 1.0)
+    bucket.take(0.0)
+    bucket.take(0.0)
+    assert bucket.wait_time(0.0) == 1.0
+    assert bucket.wait_time(0.5) == 0.5
+    assert bucket.wait_time(1.0) == 0.0
+
+
+def test_token_bucket_without_refill_waits_forever():
+    bucket = TokenBucket(1, 0.0)
+    bucket.take(0.0)
+    assert bucket.wait_time(100.0) == float('inf')
+
+
+def test_rpm_quota_throttles_after_limit(monkeypatch):
+    clock = FakeClock()
+    use_clock(monkeypatch, clock)
+    limiter = RateLimiter({'google': {'gemini': {'rpm': 2}}})
+
+    assert limiter.try_acquire('google', 'gemini') == 0.0
+    assert limiter.try_acquire('google', 'gemini') == 0.0
+    assert limiter.try_acquire('google', 'gemini') == 30.0
+    assert limiter.throttled == 1
+
+    clock.now += 30
+    assert limiter.try_acquire('google', 'gemini') == 0.0
+
+
+def test_shared_quota_applies_to_all_models(monkeypatch):
+    use_clock(monkeypatch, FakeClock())
+    limiter = RateLimiter({'openrouter': {'*': {'rpm': 1}}})
+
+    assert limiter.try_acquire('openrouter', 'a') == 0.0
+    assert limiter.try_acquire('openrouter', 'b') > 0
+
+
+def test_quotas_are_tracked_per_key(monkeypatch):
+    use_clock(monkeypatch, FakeClock())
+    limiter = RateLimiter({'google': {'gemini': {'rpm': 1}}})
+
+    assert limiter.try_acquire('google', 'gemini', 'key-1') == 0.0
+    assert limiter.try_acquire('google', 'gemini', 'key-2') == 0.0
+    assert limiter.try_acquire('google', 'gemini', 'key-1') > 0
+
+
+def test_wait_time_does_not_take_a_token(monkeypatch):
+    use_clock(monkeypatch, FakeClock())
+    limiter = RateLimiter({'google': {'gemini': {'rpm': 1}}})
+
+    assert limiter.wait_time('google', 'gemini') == 0.0
+    assert limiter.try_acquire('google', 'gemini') == 0.0
+
+
+def test_cool_down_blocks_target_until_expired(monkeypatch):
+    clock = FakeClock()
+    use_clock(monkeypatch, clock)
+    limiter = RateLimiter()
+
+    limiter.cool_down('google', 'gemini', 5)
+    assert limiter.try_acquire('google', 'gemini') == 5.0
+    assert limiter.try_acquire('google', 'other') == 0.0
+    assert limiter.get_stats()['cooling_targets'] == {'google/gemini': 5.0}
+
+    clock.now += 5
+    assert limiter.try_acquire('google', 'gemini') == 0.0
+
+
+def test_exhausted_remaining_header_cools_down(monkeypatch):
+    clock = FakeClock()
+    use_clock(monkeypatch, clock)
+    limiter = RateLimiter({'openrouter': {'m': {'rpm': 10}}})
+
+    limiter.update_from_headers('openrouter', 'm', {
+        'X-RateLimit-Remaining': '0',
+        'X-RateLimit-Reset': str(int((clock.now + 12) * 1000))
+    })
+    assert limiter.wait_time('openrouter', 'm') == 12.0
+    assert limiter.cooldowns_applied == 1
+
+
+def test_parse_retry_after_seconds_and_http_date():
+    assert parse_retry_after('7') == 7.0
+    assert parse_retry_after('-3') == 0.0
+    assert parse_retry_after('Thu, 01 Jan 1970 00:01:40 GMT', now=40.0) == 60.0
+    assert parse_retry_after('bald') is None
+    assert parse_retry_after(None) is None
+
+
+def test_parse_rate_limit_reset_formats():
+    now = 1_700_000_000.0
+    assert parse_rate_limit_reset(str(int((now + 5) * 1000)), now) == 5.0
+    assert parse_rate_limit_reset(str(now + 5), now) == 5.0
+    assert parse_rate_limit_reset('5', now) == 5.0
+    assert parse_rate_limit_reset(None, now) is None
@@ -0,0 +1,97 @@
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from providers import registry
+from providers.registry import BUILTIN_PROVIDERS, ProviderRegistry, ProviderSpec
+
+
+def make_config(**overrides):
+    values = dict(
+        OPENROUTER_API_KEY='', OPENROUTER_MODELS=['m'], OPENROUTER_API_URL='http://stub/or',
+        GOOGLE_API_KEY='', GOOGLE_MODELS=['g'], GOOGLE_API_URL='http://stub/{model}',
+        GOOGLE_CONTEXT_CACHE_TTL=0, GOOGLE_FILE_UPLOAD_TTL=0,
+        LOCAL_MODELS=[], LOCAL_API_URL='http://stub/local', LOCAL_API_KEY='',
+        LOCAL_HEALTH_CHECK_INTERVAL=0, ENABLE_STRUCTURED_OUTPUT=True
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+class FakeEntryPoint:
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def load(self):
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+def use_entry_points(monkeypatch, entry_points):
+    monkeypatch.setattr(registry.metadata, 'entry_points', lambda: {registry.ENTRY_POINT_GROUP: entry_points})
+
+
+def test_importing_the_package_does_not_load_backends():
+    code = (
+        "import sys, providers\n"
+        "assert 'providers.google_provider' not in sys.modules\n"
+        "assert 'providers.openrouter_provider' not in sys.modules\n"
+        "providers.GoogleProvider\n"
+        "assert 'providers.google_provider' in sys.modules\n"
+    )
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=Path(registry.__file__).parents[1])
+
+
+def test_builtin_specs_are_configured_only_with_credentials():
+    specs = {spec.name: spec for spec in BUILTIN_PROVIDERS}
+    config = make_config()
+    assert all(spec.configure(config) is None for spec in specs.values())
+
+    config = make_config(GOOGLE_API_KEY='key', LOCAL_MODELS=['llava'])
+    assert specs['google'].configure(config)['models'] == ['g']
+    assert specs['local'].configure(config)['models'] == ['llava']
+    assert specs['openrouter'].configure(config) is None
+
+
+def test_builtin_capabilities():
+    capabilities = {spec.name: spec.capabilities for spec in BUILTIN_PROVIDERS}
+    assert all({'vision', 'streaming', 'structured_output'} <= caps for caps in capabilities.values())
+    assert 'context_cache' in capabilities['google']
+    assert 'prompt_cache' in capabilities['openrouter']
+
+
+def test_create_imports_and_names_the_provider():
+    providers = ProviderRegistry(discover=False)
+    provider = providers.create('local', models=['llava'], api_url='http://stub/local')
+    assert provider.name == 'local'
+    assert type(provider).__name__ == 'LocalProvider'
+
+
+def test_unknown_provider_raises_key_error():
+    with pytest.raises(KeyError):
+        ProviderRegistry(discover=False).get_spec('missing')
+
+
+def test_entry_point_plugins_are_registered(monkeypatch):
+    spec = ProviderSpec('custom', 'custom.module:Provider', lambda config: None)
+    use_entry_points(monkeypatch, [
+        FakeEntryPoint('direct', spec),
+        FakeEntryPoint('factory', lambda: ProviderSpec('factory', 'x:Y', lambda config: None)),
+        FakeEntryPoint('broken', ImportError('missing dependency')),
+        FakeEntryPoint('wrong', 'not a spec')
+    ])
+
+    names = ProviderRegistry().names()
+    assert names[-2:] == ['custom', 'factory']
+    assert 'broken' not in names and 'wrong' not in names
+
+
+def test_plugin_can_replace_a_builtin(monkeypatch):
+    spec = ProviderSpec('google', 'other.module:Gemini', lambda config: None)
+    use_entry_points(monkeypatch, [FakeEntryPoint('google', spec)])
+    assert ProviderRegistry().get_spec('google') is spec
@@ -0,0 +1,85 @@
+import pytest
+
+from core import response_cache
+from core.response_cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(response_cache.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'responses.sqlite3')
+
+
+def test_key_ignores_whitespace_but_not_model():
+    key = ResponseCache.make_key('frame', 'Klicke  auf\nOK', 'google:gemini')
+    assert key == ResponseCache.make_key('frame', 'Klicke auf OK', 'google:gemini')
+    assert key != ResponseCache.make_key('frame', 'Klicke auf OK', 'openrouter:gemini')
+    assert key != ResponseCache.make_key('other', 'Klicke auf OK', 'google:gemini')
+
+
+def test_hits_and_misses_are_counted(cache_path, clock):
+    cache = ResponseCache(cache_path)
+    assert cache.get('a') is None
+    cache.put('a', '{"action":"complete"}', 'google:gemini')
+
+    assert cache.get('a') == '{"action":"complete"}'
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['stores'], stats['entries']) == (1, 1, 1, 1)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_entries_expire_after_ttl(cache_path, clock):
+    cache = ResponseCache(cache_path, ttl=60)
+    cache.put('a', 'response', 'm')
+
+    clock[0] += 60
+    assert cache.get('a') == 'response'
+    clock[0] += 1
+    assert cache.get('a') is None
+    assert cache.get_stats()['entries'] == 0
+
+
+def test_least_recently_used_entry_is_evicted(cache_path, clock):
+    cache = ResponseCache(cache_path, max_entries=2)
+    cache.put('a', 'A', 'm')
+    clock[0] += 1
+    cache.put('b', 'B', 'm')
+    clock[0] += 1
+    cache.get('a')
+    clock[0] += 1
+
+    cache.put('c', 'C', 'm')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.get('c') == 'C'
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_expired_entries_are_dropped_on_store(cache_path, clock):
+    cache = ResponseCache(cache_path, ttl=10)
+    cache.put('a', 'A', 'm')
+    clock[0] += 11
+    cache.put('b', 'B', 'm')
+
+    stats = cache.get_stats()
+    assert stats['entries'] == 1
+    assert stats['evictions'] == 1
+
+
+def test_entries_survive_reopening(cache_path, clock):
+    ResponseCache(cache_path).put('a', 'A', 'm')
+    assert ResponseCache(cache_path).get('a') == 'A'
+
+
+def test_clear_removes_all_entries(cache_path, clock):
+    cache = ResponseCache(cache_path)
+    cache.put('a', 'A', 'm')
+    cache.clear()
+    assert cache.get('a') is None
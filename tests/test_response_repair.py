@@ -0,0 +1,49 @@
+import pytest
+
+from utils.stub_llm_server import StubBehavior, StubLLMServer
+
+CHEAP = ('openrouter', 'stub/cheap')
+STRONG = ('openrouter', 'stub/strong')
+
+
+@pytest.fixture
+def server():
+    with StubLLMServer(StubBehavior(actions=[{'action': 'wait', 'seconds': 0}])) as srv:
+        yield srv
+
+
+@pytest.fixture
+def manager(server, make_manager):
+    return make_manager(OPENROUTER_API_URL=server.openrouter_url, OPENROUTER_MODELS=['stub/strong', 'stub/cheap'],
+                        ENABLE_MODEL_CASCADE=True, CASCADE_CHEAP_MODELS=['openrouter:stub/cheap'])
+
+
+def test_repair_stays_out_of_routing_and_session_usage(manager, server):
+    manager.last_target = STRONG
+    manager.last_tier = 'strong'
+
+    action = manager.repair_response('{"action": "wait", "seconds": }', 'invalid JSON')
+
+    assert action == {'action': 'wait', 'seconds': 0}
+    assert server.behavior.stats['stub/cheap']['requests'] == 1
+    assert manager.last_target == STRONG
+    assert manager.last_tier == 'strong'
+    assert manager.total_requests == 0
+    assert manager.router.get_stats()['targets'] == {}
+    assert all(tier['requests'] == 0 for tier in manager.cascade.get_stats()['tiers'].values())
+    assert manager.usage_tracker.get_stats()['session']['responses'] == 0
+    stats = manager.get_all_provider_stats()['repair']
+    assert stats['successes'] == 1
+    assert stats['usage']['responses'] == 1
+
+
+def test_repair_skips_targets_with_open_breaker(manager, server):
+    for _ in range(manager.config.CIRCUIT_FAILURE_THRESHOLD):
+        manager.router.record_failure(CHEAP)
+    state = manager.router.get_stats()['targets']['openrouter/stub/cheap']['circuit_state']
+
+    assert manager.repair_response('kein JSON', 'no JSON object') == {'action': 'wait', 'seconds': 0}
+    assert server.behavior.stats['stub/strong']['requests'] == 1
+    assert 'stub/cheap' not in server.behavior.stats
+    # The open breaker was not turned into a half-open probe
+    assert manager.router.get_stats()['targets']['openrouter/stub/cheap']['circuit_state'] == state == 'open'
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from config import Config
+from core.exceptions import (
+    APIError, AuthenticationError, InvalidRequestError, InvalidResponseError, KeyRetiredError, NetworkError,
+    RateLimitError, ServerError, TimeoutError, TruncatedResponseError
+)
+from core.retry_policy import FATAL, RetryPolicy
+
+
+@pytest.mark.parametrize('error, error_class', [
+    (RateLimitError('429'), 'rate_limit'),
+    (TimeoutError('slow'), 'timeout'),
+    (KeyRetiredError('revoked'), 'key_retired'),
+    (AuthenticationError('401'), 'auth'),
+    (TruncatedResponseError('length'), 'truncated'),
+    (InvalidResponseError('not json'), 'invalid_response'),
+    (ServerError('503'), 'server_error'),
+    (InvalidRequestError('400'), 'invalid_request'),
+    (NetworkError('reset'), 'network'),
+    (APIError('502', status_code=502), 'server_error'),
+    (APIError('422', status_code=422), 'invalid_request'),
+    (ValueError('bug'), 'unknown'),
+])
+def test_classify(error, error_class):
+    assert RetryPolicy.classify(error) == error_class
+
+
+def test_provider_rules_override_defaults():
+    policy = RetryPolicy(Config.RETRY_POLICY)
+
+    assert policy.get_rule('google', 'network').retryable
+    assert policy.get_rule('google', 'network').max_attempts == 2
+    local = policy.get_rule('local', 'network')
+    assert not local.retryable and local.skip_provider
+    assert policy.get_rule('local', 'server_error').max_attempts == 2
+
+
+def test_unconfigured_error_class_is_fatal():
+    assert RetryPolicy(Config.RETRY_POLICY).get_rule('google', 'truncated') is FATAL
+    assert RetryPolicy().get_rule('google', 'timeout') is FATAL
+
+
+def test_backoff_is_full_jitter_within_bounds():
+    random.seed(7)
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+
+    for attempt, ceiling in ((1, 1.0), (2, 2.0), (3, 4.0), (4, 5.0), (10, 5.0)):
+        delays = [policy.backoff(attempt) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        assert max(delays) > ceiling * 0.8
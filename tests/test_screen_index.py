@@ -0,0 +1,112 @@
+import json
+
+from PIL import Image, ImageDraw
+
+from core.screen_index import ScreenSimilarityIndex, compute_dhash, hamming_distance
+
+CLICK = {'action': 'click', 'x': 10, 'y': 20}
+
+
+def gradient(width=170, height=160):
+    image = Image.new('L', (width, height))
+    image.putdata([x * 255 // width for _ in range(height) for x in range(width)])
+    return image
+
+
+def flip_bits(value, *bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_dhash_is_stable_and_sized():
+    image = gradient()
+    assert compute_dhash(image) == compute_dhash(image.convert('RGB'))
+    # Brightness rises left to right, so no pixel is brighter than its right neighbour
+    assert compute_dhash(image) == 0
+    assert compute_dhash(image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)) == (1 << 256) - 1
+    assert compute_dhash(image, hash_size=8).bit_length() <= 64
+
+
+def test_small_change_gives_small_distance():
+    image = Image.new('RGB', (320, 240), 'white')
+    ImageDraw.Draw(image).rectangle((40, 40, 200, 120), fill='navy')
+    changed = image.copy()
+    ImageDraw.Draw(changed).rectangle((300, 220, 304, 224), fill='red')
+    other = Image.new('RGB', (320, 240), 'white')
+    ImageDraw.Draw(other).ellipse((100, 60, 300, 220), fill='darkgreen')
+
+    base = compute_dhash(image)
+    assert hamming_distance(base, compute_dhash(changed)) <= 10
+    assert hamming_distance(base, compute_dhash(other)) > 10
+
+
+def test_hamming_distance():
+    assert hamming_distance(0b1011, 0b1011) == 0
+    assert hamming_distance(0b1011, 0b0010) == 2
+
+
+def test_nearest_finds_hashes_within_distance():
+    index = ScreenSimilarityIndex(max_distance=4)
+    phash = (1 << 200) | 12345
+    index.add(phash, CLICK, 'task')
+
+    # Bits spread over several chunks still share an exact chunk
+    match = index.nearest(flip_bits(phash, 0, 60, 120, 250), 'task')
+    assert match is not None
+    assert (match.distance, match.action, match.phash) == (4, CLICK, phash)
+    assert index.nearest(flip_bits(phash, 0, 60, 120, 180, 250), 'task') is None
+    assert index.nearest(flip_bits(phash, 0, 60), 'task', max_distance=1) is None
+
+
+def test_nearest_prefers_the_closest_entry_of_the_same_context():
+    index = ScreenSimilarityIndex(max_distance=4)
+    index.add(flip_bits(0, 1, 2), {'action': 'wait', 'seconds': 1}, 'task')
+    index.add(flip_bits(0, 1), CLICK, 'task', frame_hash='abc')
+    index.add(0, {'action': 'complete'}, 'other task')
+
+    match = index.nearest(0, 'task')
+    assert (match.distance, match.action, match.frame_hash) == (1, CLICK, 'abc')
+    assert index.get_stats()['match_rate'] == 1.0
+
+
+def test_same_screen_and_context_updates_the_entry():
+    index = ScreenSimilarityIndex()
+    index.add(7, CLICK, 'task')
+    index.add(7, {'action': 'complete'}, 'task')
+
+    assert index.get_stats()['entries'] == 1
+    assert index.nearest(7, 'task').action == {'action': 'complete'}
+
+
+def test_oldest_entries_are_evicted():
+    index = ScreenSimilarityIndex(max_entries=2)
+    for phash in (1 << 10, 1 << 100, 1 << 200):
+        index.add(phash, CLICK)
+
+    assert index.get_stats()['entries'] == 2
+    assert index.nearest(1 << 10, max_distance=0) is None
+    assert index.nearest(1 << 200, max_distance=0) is not None
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    path = str(tmp_path / 'index.json')
+    index = ScreenSimilarityIndex(path=path)
+    index.add(1 << 255, CLICK, 'task', frame_hash='abc')
+    index.save()
+
+    loaded = ScreenSimilarityIndex(path=path)
+    match = loaded.nearest(1 << 255, 'task')
+    assert (match.distance, match.action, match.frame_hash) == (0, CLICK, 'abc')
+
+
+def test_load_ignores_other_hash_sizes_and_broken_files(tmp_path):
+    path = tmp_path / 'index.json'
+    small = ScreenSimilarityIndex(hash_bits=64, path=str(path))
+    small.add(1, CLICK)
+    small.save()
+    assert len(json.loads(path.read_text())['entries']) == 1
+    assert ScreenSimilarityIndex(path=str(path)).get_stats()['entries'] == 0
+
+    path.write_text('{kein json')
+    assert ScreenSimilarityIndex(path=str(path)).get_stats()['entries'] == 0
@@ -0,0 +1,142 @@
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from core.exceptions import DeadlineExceededError
+from core.single_flight import SingleFlight
+from utils.stub_llm_server import StubBehavior, StubLLMServer
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def flight_path(tmp_path):
+    return str(tmp_path / 'flights.sqlite3')
+
+
+def run_leader(flight, started, release, result='leader'):
+    """Start a call in a thread that holds the key until release is set"""
+    outcome = {}
+
+    def call():
+        started.set()
+        release.wait(5)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def worker():
+        try:
+            outcome['response'] = flight.do('key', call)
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    assert started.wait(5)
+    return thread, outcome
+
+
+def test_waiting_instance_receives_the_leaders_response(flight_path):
+    leader, follower = SingleFlight(flight_path), SingleFlight(flight_path, poll_interval=0.01)
+    started, release = threading.Event(), threading.Event()
+    thread, outcome = run_leader(leader, started, release)
+
+    assert follower.get_stats()['in_flight'] == 1
+    threading.Timer(0.1, release.set).start()
+    response = follower.do('key', lambda: pytest.fail('identical call sent twice'), timeout=5)
+    thread.join()
+
+    assert response == outcome['response'] == 'leader'
+    assert leader.calls == 1
+    assert follower.calls == 0
+    assert follower.coalesced == 1
+    assert follower.get_stats()['in_flight'] == 0
+
+
+def test_finished_calls_are_not_reused(flight_path):
+    flight = SingleFlight(flight_path)
+    assert flight.do('key', lambda: 'first') == 'first'
+    time.sleep(0.01)
+    assert SingleFlight(flight_path).do('key', lambda: 'second') == 'second'
+
+
+def test_failed_leader_hands_the_call_to_a_waiting_instance(flight_path):
+    leader, follower = SingleFlight(flight_path), SingleFlight(flight_path, poll_interval=0.01)
+    started, release = threading.Event(), threading.Event()
+    thread, outcome = run_leader(leader, started, release, result=RuntimeError('boom'))
+
+    threading.Timer(0.1, release.set).start()
+    response = follower.do('key', lambda: 'follower', timeout=5)
+    thread.join()
+
+    assert isinstance(outcome['error'], RuntimeError)
+    assert response == 'follower'
+    assert follower.takeovers == 1
+
+
+def test_waiting_instance_gives_up_at_its_timeout(flight_path):
+    leader, follower = SingleFlight(flight_path), SingleFlight(flight_path, poll_interval=0.01)
+    started, release = threading.Event(), threading.Event()
+    thread, _ = run_leader(leader, started, release)
+
+    with pytest.raises(DeadlineExceededError):
+        follower.do('key', lambda: 'follower', timeout=0.1)
+    release.set()
+    thread.join()
+
+
+def test_abandoned_claim_is_taken_over_after_its_lease(flight_path):
+    crashed = SingleFlight(flight_path)
+    crashed._claim('key', time.time())
+
+    follower = SingleFlight(flight_path, lease_ttl=0.1, poll_interval=0.01)
+    assert follower.do('key', lambda: 'follower', timeout=5) == 'follower'
+    assert follower.takeovers == 1
+
+
+def test_call_in_another_process_is_shared(flight_path):
+    script = (
+        'import sys, time\n'
+        'from core.single_flight import SingleFlight\n'
+        'SingleFlight(sys.argv[1]).do("key", lambda: (time.sleep(0.5), "child")[1])\n'
+    )
+    child = subprocess.Popen([sys.executable, '-c', script, flight_path], cwd=REPO_ROOT)
+    try:
+        flight = SingleFlight(flight_path, poll_interval=0.01)
+        deadline = time.time() + 10
+        while flight.get_stats()['in_flight'] == 0:
+            assert child.poll() is None and time.time() < deadline
+            time.sleep(0.01)
+
+        assert flight.do('key', lambda: pytest.fail('identical call sent twice'), timeout=10) == 'child'
+    finally:
+        assert child.wait(10) == 0
+
+
+def test_managers_sharing_the_file_send_one_request(make_manager):
+    behavior = StubBehavior(latency='fixed:0.3', actions=[{'action': 'wait', 'seconds': 0}])
+    with StubLLMServer(behavior) as srv:
+        managers = [
+            make_manager(OPENROUTER_API_URL=srv.openrouter_url, OPENROUTER_MODELS=['stub/model'],
+                         ENABLE_SINGLE_FLIGHT=True)
+            for _ in range(2)
+        ]
+        responses = []
+        threads = [
+            threading.Thread(target=lambda m=m: responses.append(m.send_request('Weiter', None, stream=False,
+                                                                                frame_hash='frame')))
+            for m in managers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(responses) == 2 and responses[0] == responses[1]
+        assert sum(stats['requests'] for stats in srv.behavior.stats.values()) == 1
+        assert sum(m.single_flight.coalesced for m in managers) == 1
@@ -0,0 +1,125 @@
+import json
+
+import pytest
+import requests
+
+from core.exceptions import InvalidRequestError
+from core.rate_limiter import RateLimiter
+from providers.google_provider import GoogleProvider, to_gemini_schema
+from providers.openrouter_provider import OpenRouterProvider
+from utils.json_parser import build_action_schema
+
+OK = {'choices': [{'message': {'content': '{"action":"complete"}'}, 'finish_reason': 'stop'}]}
+GEMINI_OK = {'candidates': [{'content': {'parts': [{'text': '{"action":"complete"}'}]}, 'finishReason': 'STOP'}]}
+
+
+class CountingLimiter(RateLimiter):
+    def __init__(self):
+        super().__init__()
+        self.acquired = 0
+
+    def try_acquire(self, provider, model, key_id=''):
+        self.acquired += 1
+        return super().try_acquire(provider, model, key_id)
+
+
+def make_response(status, body):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(body).encode('utf-8')
+    return response
+
+
+def fake_post(provider, responses):
+    """Replace the provider's HTTP session and record the payloads sent"""
+    payloads = []
+
+    def post(url, json=None, **kwargs):
+        payloads.append(json)
+        return responses.pop(0)
+
+    provider.session.post = post
+    provider.rate_limiter = CountingLimiter()
+    return payloads
+
+
+def make_openrouter(responses):
+    provider = OpenRouterProvider('key', ['stub/model'], api_url='http://stub/v1/chat/completions',
+                                  structured_output=True)
+    provider.name = 'openrouter'
+    return provider, fake_post(provider, responses)
+
+
+def make_google(responses):
+    provider = GoogleProvider('key', ['gemini-2.0-flash'], api_url_template='http://stub/{model}:generateContent',
+                              structured_output=True)
+    provider.name = 'google'
+    return provider, fake_post(provider, responses)
+
+
+def test_gemini_schema_uses_upper_case_types():
+    schema = to_gemini_schema(build_action_schema())
+    assert schema['type'] == 'OBJECT'
+    assert schema['properties']['x']['type'] == 'INTEGER'
+    assert schema['properties']['steps']['items']['type'] == 'OBJECT'
+    assert 'plan' in schema['properties']['action']['enum']
+
+
+def test_payloads_carry_the_action_schema():
+    openrouter, _ = make_openrouter([])
+    google, _ = make_google([])
+
+    response_format = openrouter._build_payload('Weiter', None)['response_format']
+    generation_config = google._build_payload('Weiter', None)['generationConfig']
+
+    assert response_format['json_schema']['schema'] == build_action_schema()
+    assert generation_config['responseMimeType'] == 'application/json'
+    assert generation_config['responseSchema'] == to_gemini_schema(build_action_schema())
+
+
+def test_schema_rejection_resends_without_schema_and_takes_a_token():
+    rejection = {'error': {'message': "Invalid parameter: 'response_format' is not supported by this model"}}
+    provider, payloads = make_openrouter([make_response(400, rejection), make_response(200, OK)])
+
+    assert provider.send_request('Weiter', None) == '{"action":"complete"}'
+
+    assert 'response_format' in payloads[0]
+    assert 'response_format' not in payloads[1]
+    assert provider.rate_limiter.acquired == 2
+    assert provider.structured_output_unsupported == {'stub/model'}
+    assert 'response_format' not in provider._build_payload('Weiter', None)
+
+
+@pytest.mark.parametrize('message', ['Image could not be decoded', 'This model maximum context length is 8192'])
+def test_unrelated_bad_request_keeps_structured_output(message):
+    provider, payloads = make_openrouter([make_response(400, {'error': {'message': message}})])
+
+    with pytest.raises(InvalidRequestError):
+        provider.send_request('Weiter', None)
+
+    assert len(payloads) == 1
+    assert provider.rate_limiter.acquired == 1
+    assert provider.structured_output_unsupported == set()
+
+
+def test_gemini_schema_rejection_resends_without_schema():
+    rejection = {'error': {'code': 400, 'message': 'Invalid JSON payload: Unknown name "responseSchema"'}}
+    provider, payloads = make_google([make_response(400, rejection), make_response(200, GEMINI_OK)])
+
+    assert provider.send_request('Weiter', None) == '{"action":"complete"}'
+
+    assert 'responseSchema' in payloads[0]['generationConfig']
+    assert 'responseSchema' not in payloads[1]['generationConfig']
+    assert 'responseMimeType' not in payloads[1]['generationConfig']
+    assert provider.rate_limiter.acquired == 2
+    assert provider.structured_output_unsupported == {'gemini-2.0-flash'}
+
+
+def test_request_without_schema_is_never_resent():
+    provider, payloads = make_openrouter([make_response(400, {'error': {'message': 'bad response_format'}})])
+    provider.structured_output = False
+
+    with pytest.raises(InvalidRequestError):
+        provider.send_request('Weiter', None)
+
+    assert len(payloads) == 1
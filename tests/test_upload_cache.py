@@ -0,0 +1,137 @@
+import base64
+import io
+
+from PIL import Image
+
+from core import upload_cache
+from core.upload_cache import UploadCache
+
+
+def encode_png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4)).save(buffer, format='PNG')
+    return base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+PNG_B64 = encode_png()
+
+
+def use_time(monkeypatch, now):
+    clock = [now]
+    monkeypatch.setattr(upload_cache.time, 'time', lambda: clock[0])
+    return clock
+
+
+def test_record_use_counts_per_frame():
+    cache = UploadCache(ttl=60)
+    assert cache.record_use('a') == 1
+    assert cache.record_use('a') == 2
+    assert cache.record_use('b') == 1
+
+
+def test_use_counts_evict_least_recently_used():
+    cache = UploadCache(ttl=60, max_entries=2)
+    cache.record_use('a')
+    cache.record_use('b')
+    cache.record_use('a')
+    cache.record_use('c')
+    assert cache.record_use('a') == 3
+    assert cache.record_use('b') == 1
+
+
+def test_handles_expire_after_ttl(monkeypatch):
+    clock = use_time(monkeypatch, 1000.0)
+    cache = UploadCache(ttl=60)
+    cache.put('a', 'files/1')
+
+    assert cache.get('a') == 'files/1'
+    clock[0] += 60
+    assert cache.get('a') is None
+    assert cache.get_stats() == {'entries': 0, 'uploads': 1, 'hits': 1, 'invalidations': 0}
+
+
+def test_provider_expiry_is_capped_by_ttl(monkeypatch):
+    clock = use_time(monkeypatch, 1000.0)
+    cache = UploadCache(ttl=60)
+    cache.put('late', 'files/1', expires_at=5000.0)
+    cache.put('early', 'files/2', expires_at=1010.0)
+
+    clock[0] += 30
+    assert cache.get('late') == 'files/1'
+    assert cache.get('early') is None
+    clock[0] += 30
+    assert cache.get('late') is None
+
+
+def test_invalidate_drops_every_frame_with_the_handle():
+    cache = UploadCache(ttl=60)
+    cache.put('a', 'files/1')
+    cache.put('b', 'files/1')
+    cache.put('c', 'files/2')
+
+    cache.invalidate('files/1')
+
+    assert cache.get('a') is None and cache.get('b') is None
+    assert cache.get('c') == 'files/2'
+    assert cache.invalidations == 2
+
+
+def test_full_cache_drops_expired_handles_first(monkeypatch):
+    clock = use_time(monkeypatch, 1000.0)
+    cache = UploadCache(ttl=60, max_entries=2)
+    cache.put('old', 'files/1', expires_at=1005.0)
+    cache.put('a', 'files/2')
+    clock[0] += 10
+    cache.put('b', 'files/3')
+
+    assert cache.get('a') == 'files/2'
+    assert cache.get('b') == 'files/3'
+    assert cache.get_stats()['entries'] == 2
+
+
+def test_full_cache_without_expired_handles_drops_the_oldest():
+    cache = UploadCache(ttl=60, max_entries=2)
+    cache.put('a', 'files/1')
+    cache.put('b', 'files/2')
+    cache.put('c', 'files/3')
+
+    assert cache.get('a') is None
+    assert cache.get('c') == 'files/3'
+
+
+def test_gemini_uploads_a_repeated_frame_once():
+    from providers.google_provider import GoogleProvider
+    from utils.stub_llm_server import StubLLMServer
+
+    with StubLLMServer() as server:
+        provider = GoogleProvider('key', ['gemini-2.0-flash'], api_url_template=server.google_url,
+                                  file_upload_ttl=600)
+        parts = [provider._build_image_part(PNG_B64) for _ in range(3)]
+
+    assert 'inline_data' in parts[0]
+    assert parts[1] == parts[2]
+    assert parts[1]['file_data']['file_uri'].endswith('/files/stub-1')
+    assert provider.upload_cache.get_stats()['uploads'] == 1
+
+
+def test_gemini_sends_the_frame_inline_when_the_upload_answer_is_not_json():
+    import requests
+
+    from providers.google_provider import GoogleProvider
+
+    start = requests.Response()
+    start.status_code = 200
+    start.headers['X-Goog-Upload-URL'] = 'http://stub/upload/session'
+    finish = requests.Response()
+    finish.status_code = 200
+    finish._content = b'<html>proxy error</html>'
+    responses = [start, finish]
+
+    provider = GoogleProvider('key', ['gemini-2.0-flash'], api_url_template='http://stub/v1beta/models/{model}',
+                              file_upload_ttl=600)
+    provider.session.post = lambda url, **kwargs: responses.pop(0)
+    parts = [provider._build_image_part(PNG_B64) for _ in range(2)]
+
+    assert parts[1] == parts[0]
+    assert parts[1]['inline_data']['data'] == PNG_B64
+    assert provider.upload_failures == 1
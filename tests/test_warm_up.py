@@ -0,0 +1,69 @@
+import pytest
+
+from utils.stub_llm_server import StubBehavior, StubLLMServer
+
+OPENROUTER_MODELS = ['stub/slow', 'stub/fast']
+GOOGLE_MODELS = ['gemini-a', 'gemini-b']
+
+
+@pytest.fixture
+def server():
+    behavior = StubBehavior(latency='fixed:0.02', model_latency={'stub/slow': 'fixed:0.3', 'stub/fast': 'fixed:0.05'},
+                            actions=[{'action': 'wait', 'seconds': 0}], seed=1)
+    with StubLLMServer(behavior) as srv:
+        yield srv
+
+
+@pytest.fixture
+def manager(server, make_manager):
+    return make_manager(OPENROUTER_API_URL=server.openrouter_url, OPENROUTER_MODELS=OPENROUTER_MODELS,
+                        GOOGLE_API_KEY='key', GOOGLE_API_URL=server.google_url, GOOGLE_MODELS=GOOGLE_MODELS,
+                        WARMUP_WORKERS=4)
+
+
+def test_shared_providers_are_created_once_before_probing(manager):
+    created = []
+    create = manager.registry.create
+
+    def record(name, **kwargs):
+        created.append((name, len(kwargs['models'])))
+        return create(name, **kwargs)
+
+    manager.registry.create = record
+    manager.warm_up()
+
+    assert created.count(('openrouter', 2)) == 1
+    assert created.count(('google', 2)) == 1
+    assert sorted(manager.providers) == ['google', 'openrouter']
+
+
+def test_probes_are_not_session_traffic(manager):
+    results = manager.warm_up()
+
+    assert all(result.available for result in results.values())
+    assert manager.usage_tracker.get_stats()['session']['responses'] == 0
+    assert manager.warmup_usage.get_stats()['session']['responses'] == 4
+    for target in manager.router.get_stats()['targets'].values():
+        assert target['requests'] == 0
+        assert target['latency_p95'] is None
+        assert target['probe_latency'] is not None
+
+
+def test_probes_order_the_router_until_real_traffic(manager):
+    manager.warm_up()
+
+    ranked = manager.router.rank(manager.get_available_targets())
+    assert ranked[-1] == ('openrouter', 'stub/slow')
+
+    # The first real response replaces the probe latency
+    manager.router.record_success(('openrouter', 'stub/slow'), 0.01)
+    assert manager.router.rank(manager.get_available_targets())[0] == ('openrouter', 'stub/slow')
+
+
+def test_fresh_profile_is_reused(manager, server):
+    manager.warm_up()
+    requests = sum(stats['requests'] for stats in server.behavior.stats.values())
+
+    manager.warm_up()
+
+    assert sum(stats['requests'] for stats in server.behavior.stats.values()) == requests
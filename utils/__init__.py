@@ -1,5 +1,5 @@
 """Utility modules"""
 
-from .json_parser import RobustJSONParser
+from .json_parser import RobustJSONParser, IncrementalJSONParser, ACTION_FIELDS, build_action_schema
 
-__all__ = ['RobustJSONParser']
\ No newline at end of file
+__all__ = ['RobustJSONParser', 'IncrementalJSONParser', 'ACTION_FIELDS', 'build_action_schema']
@@ -5,6 +5,73 @@ from typing import Dict, Any, Optional, List
 
 logger = logging.getLogger(__name__)
 
+# Required fields per action; also the source of the structured-output schema
+ACTION_FIELDS = {
+    'click': ['x', 'y'],
+    'double_click': ['x', 'y'],
+    'right_click': ['x', 'y'],
+    'type': ['text'],
+    'key': ['key'],
+    'scroll': ['x', 'y', 'clicks'],
+    'move_mouse': ['x', 'y'],
+    'navigate': ['url'],
+    'wait': ['seconds'],
+    'next_prompt': ['prompt'],
+    'complete': [],
+    'error': ['message'],
+    'plan': ['steps']
+}
+
+# Actions a plan may not contain
+NON_PLAN_STEP_ACTIONS = frozenset({'plan'})
+
+# JSON schema types of the action fields
+ACTION_FIELD_TYPES = {
+    'x': 'integer',
+    'y': 'integer',
+    'text': 'string',
+    'key': 'string',
+    'clicks': 'integer',
+    'url': 'string',
+    'seconds': 'number',
+    'prompt': 'string',
+    'message': 'string',
+    'verify_change': 'boolean'
+}
+
+def _build_flat_schema(actions: List[str], extra_fields: List[str]) -> Dict[str, Any]:
+    properties = {'action': {'type': 'string', 'enum': actions}}
+    for action in actions:
+        for field in ACTION_FIELDS[action]:
+            if field != 'steps':
+                properties.setdefault(field, {'type': ACTION_FIELD_TYPES[field]})
+    for field in extra_fields:
+        properties[field] = {'type': ACTION_FIELD_TYPES[field]}
+    return {
+        'type': 'object',
+        'properties': properties,
+        'required': ['action']
+    }
+
+def build_action_schema() -> Dict[str, Any]:
+    """
+    Build a JSON schema for action objects from ACTION_FIELDS
+
+    The schema is deliberately flat (one object, optional per-action
+    fields) because provider schema dialects do not support oneOf;
+    validate_action_data still checks the per-action required fields.
+
+    Returns:
+        JSON schema dictionary
+    """
+    schema = _build_flat_schema(list(ACTION_FIELDS), [])
+    step_actions = [action for action in ACTION_FIELDS if action not in NON_PLAN_STEP_ACTIONS]
+    schema['properties']['steps'] = {
+        'type': 'array',
+        'items': _build_flat_schema(step_actions, ['verify_change'])
+    }
+    return schema
+
 class RobustJSONParser:
     """
     Robust JSON parser for LLM responses with multiple fallback strategies
@@ -27,7 +94,8 @@ class RobustJSONParser:
         
         content = content.strip()
         
-        # Strategy 1: Direct JSON parsing
+        # Strategy 1: Direct JSON parsing (the only one needed for structured
+        # output; the others cover models without schema support)
         result = RobustJSONParser._try_direct_parse(content)
         if result:
             return result
@@ -204,33 +272,29 @@ class RobustJSONParser:
             logger.warning("'action' field must be a string")
             return False
         
-        # Validate action-specific requirements
-        valid_actions = {
-            'click': ['x', 'y'],
-            'double_click': ['x', 'y'],
-            'right_click': ['x', 'y'],
-            'type': ['text'],
-            'key': ['key'],
-            'scroll': ['x', 'y', 'clicks'],
-            'move_mouse': ['x', 'y'],
-            'navigate': ['url'],
-            'wait': ['seconds'],
-            'next_prompt': ['prompt'],
-            'complete': [],
-            'error': ['message']
-        }
-        
-        if action not in valid_actions:
+        if action not in ACTION_FIELDS:
             logger.warning(f"Unknown action: {action}")
             return False
         
         # Check required fields for specific actions
-        required_fields = valid_actions[action]
+        required_fields = ACTION_FIELDS[action]
         for field in required_fields:
             if field not in data:
                 logger.warning(f"Missing required field '{field}' for action '{action}'")
                 return False
         
+        if action == 'plan':
+            steps = data['steps']
+            if not isinstance(steps, list) or not steps:
+                logger.warning("'steps' of a plan must be a non-empty list")
+                return False
+            for step in steps:
+                if isinstance(step, dict) and step.get('action') in NON_PLAN_STEP_ACTIONS:
+                    logger.warning("Plans cannot be nested")
+                    return False
+                if not RobustJSONParser.validate_action_data(step):
+                    return False
+        
         logger.debug(f"Validated action data: {action}")
         return True
     
@@ -259,4 +323,84 @@ class RobustJSONParser:
             if result and RobustJSONParser.validate_action_data(result):
                 objects.append(result)
         
-        return objects
\ No newline at end of file
+        return objects
+
+class IncrementalJSONParser:
+    """
+    Incremental JSON extractor for streamed LLM responses
+
+    Text chunks are fed as they arrive; the first complete top-level JSON
+    object containing all required keys is returned as soon as its closing
+    brace has been received, so the caller can stop reading the stream.
+    """
+
+    def __init__(self, required_keys: tuple = ('action',)):
+        self.required_keys = required_keys
+        self.buffer = ''
+        self._scan_pos = 0
+        self._start_idx = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape_next = False
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        Feed the next chunk of streamed text
+
+        Args:
+            chunk: Newly received text
+
+        Returns:
+            JSON text of the first complete matching object, or None if no
+            such object has been closed yet
+        """
+        if not chunk:
+            return None
+
+        self.buffer += chunk
+
+        while self._scan_pos < len(self.buffer):
+            char = self.buffer[self._scan_pos]
+            self._scan_pos += 1
+
+            # Quotes only matter inside an object; prose before the JSON may
+            # contain unbalanced quotes
+            if self._depth == 0:
+                if char == '{':
+                    self._start_idx = self._scan_pos - 1
+                    self._depth = 1
+                continue
+
+            if self._escape_next:
+                self._escape_next = False
+                continue
+
+            if char == '\\' and self._in_string:
+                self._escape_next = True
+                continue
+
+            if char == '"':
+                self._in_string = not self._in_string
+                continue
+
+            if self._in_string:
+                continue
+
+            if char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = self.buffer[self._start_idx:self._scan_pos]
+                    if self._matches(candidate):
+                        logger.debug("Complete JSON object received from stream")
+                        return candidate
+
+        return None
+
+    def _matches(self, candidate: str) -> bool:
+        """Check whether a closed object is valid JSON with the required keys"""
+        result = RobustJSONParser._try_direct_parse(candidate)
+        if result is None:
+            return False
+        return all(key in result for key in self.required_keys)
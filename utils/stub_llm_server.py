@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Local stub LLM server for load tests without API quota
+
+Speaks the OpenRouter chat-completions and Gemini generateContent /
+streamGenerateContent wire formats (plus Gemini file uploads), answers with
+scripted or random valid actions and can inject latency, 429 and 5xx
+responses as well as rejected API keys.
+
+Usage:
+    python -m utils.stub_llm_server --port 8765 --latency lognormal:-1.5,0.5 --rate-limit-rate 0.05
+
+    OPENROUTER_API_URL=http://127.0.0.1:8765/api/v1/chat/completions
+    GOOGLE_API_URL=http://127.0.0.1:8765/v1beta/models/{model}:generateContent
+    LOCAL_API_URL=http://127.0.0.1:8765/api/v1/chat/completions
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GEMINI_PATH = re.compile(r'/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)')
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution spec into a sampler (seconds)
+
+    Supported specs:
+        fixed:0.2
+        uniform:0.1,0.5
+        normal:0.3,0.1          (mean, stddev)
+        lognormal:-1.5,0.5      (mu, sigma of the underlying normal)
+        exponential:0.3         (mean)
+
+    Args:
+        spec: Distribution spec
+
+    Returns:
+        Function drawing a non-negative latency from a Random instance
+    """
+    kind, _, args = spec.partition(':')
+    try:
+        params = [float(value) for value in args.split(',')] if args else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec '{spec}'")
+
+    samplers = {
+        'fixed': (1, lambda rng, p: p[0]),
+        'uniform': (2, lambda rng, p: rng.uniform(p[0], p[1])),
+        'normal': (2, lambda rng, p: rng.gauss(p[0], p[1])),
+        'lognormal': (2, lambda rng, p: rng.lognormvariate(p[0], p[1])),
+        'exponential': (1, lambda rng, p: rng.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0)
+    }
+    if kind not in samplers or len(params) != samplers[kind][0]:
+        raise ValueError(f"Invalid latency spec '{spec}'")
+
+    sampler = samplers[kind][1]
+    return lambda rng: max(sampler(rng, params), 0.0)
+
+def random_action(rng: random.Random) -> Dict[str, Any]:
+    """Generate a random action that passes the app's validation"""
+    kind = rng.choice(['click', 'double_click', 'type', 'key', 'scroll', 'wait'])
+    x, y = rng.randint(10, 1200), rng.randint(10, 700)
+    if kind in ('click', 'double_click'):
+        return {'action': kind, 'x': x, 'y': y}
+    if kind == 'type':
+        return {'action': 'type', 'text': rng.choice(['hallo', 'test', 'suche'])}
+    if kind == 'key':
+        return {'action': 'key', 'key': rng.choice(['enter', 'tab', 'escape'])}
+    if kind == 'scroll':
+        return {'action': 'scroll', 'x': x, 'y': y, 'clicks': rng.choice([-3, 3])}
+    return {'action': 'wait', 'seconds': 1}
+
+class StubBehavior:
+    """
+    Scripted behaviour of the stub server, shared by all request threads
+    """
+
+    def __init__(self, latency: str = 'fixed:0', model_latency: Optional[Dict[str, str]] = None,
+                 rate_limit_rate: float = 0.0, server_error_rate: float = 0.0,
+                 retry_after: float = 5.0, chunk_size: int = 12, chunk_interval: float = 0.01,
+                 actions: Optional[List[Dict[str, Any]]] = None, seed: Optional[int] = None,
+                 rejected_keys: Optional[List[str]] = None):
+        self.latency = parse_latency(latency)
+        self.model_latency = {model: parse_latency(spec) for model, spec in (model_latency or {}).items()}
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.retry_after = retry_after
+        self.chunk_size = chunk_size
+        self.chunk_interval = chunk_interval
+        self._actions = itertools.cycle(actions) if actions else None
+        self.rejected_keys = set(rejected_keys or [])
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._cache_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def next_request(self, model: str) -> Tuple[Optional[int], float, str]:
+        """
+        Decide the outcome of a request
+
+        Returns:
+            (injected error status or None, latency in seconds, action JSON)
+        """
+        with self._lock:
+            stats = self.stats.setdefault(model, {'requests': 0, 'rate_limited': 0, 'server_errors': 0})
+            stats['requests'] += 1
+
+            sampler = self.model_latency.get(model, self.latency)
+            latency = sampler(self._rng)
+
+            roll = self._rng.random()
+            if roll < self.rate_limit_rate:
+                stats['rate_limited'] += 1
+                return 429, latency, ''
+            if roll < self.rate_limit_rate + self.server_error_rate:
+                stats['server_errors'] += 1
+                return self._rng.choice([500, 502, 503]), latency, ''
+
+            action = next(self._actions) if self._actions else random_action(self._rng)
+        return None, latency, json.dumps(action, ensure_ascii=False)
+
+    def next_cache_name(self) -> str:
+        return f"cachedContents/stub-{next(self._cache_ids)}"
+
+    def next_file_name(self) -> str:
+        return f"files/stub-{next(self._file_ids)}"
+
+    def chunks(self, text: str) -> Iterator[str]:
+        for start in range(0, len(text), self.chunk_size):
+            yield text[start:start + self.chunk_size]
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler dispatching on the OpenRouter and Gemini URL layouts"""
+
+    protocol_version = 'HTTP/1.1'
+    behavior: StubBehavior = None
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+        if path == '/stats':
+            self._send_json(200, self.behavior.stats)
+        elif path.endswith('/v1/models'):
+            # OpenAI-compatible model listing, used as health probe
+            self._send_json(200, {'object': 'list', 'data': [
+                {'id': model, 'object': 'model'} for model in self.behavior.stats
+            ]})
+        else:
+            self._send_json(404, {'error': {'code': 404, 'message': 'Not found'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        if self.path.startswith('/upload/'):
+            self._handle_file_upload(self.rfile.read(length))
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            self._send_json(400, {'error': {'code': 400, 'message': 'Invalid JSON body'}})
+            return
+
+        path = self.path.split('?', 1)[0]
+        gemini = GEMINI_PATH.search(path)
+        if path.endswith('/chat/completions'):
+            self._handle_openrouter(body)
+        elif gemini:
+            self._handle_gemini(gemini.group('model'), gemini.group('method') == 'streamGenerateContent')
+        elif path.endswith('/cachedContents'):
+            self._send_json(200, {'name': self.behavior.next_cache_name(), 'model': body.get('model')})
+        else:
+            self._send_json(404, {'error': {'code': 404, 'message': f'Unknown endpoint {path}'}})
+
+    def _handle_file_upload(self, body: bytes):
+        """Gemini Files API resumable upload: 'start' returns the upload URL, 'finalize' the file"""
+        command = self.headers.get('X-Goog-Upload-Command', '')
+        if 'start' in command:
+            upload_url = f"http://{self.headers.get('Host')}{self.path.split('?', 1)[0]}?upload_id=stub"
+            self._send_json(200, {}, {'X-Goog-Upload-URL': upload_url})
+        elif 'finalize' in command:
+            name = self.behavior.next_file_name()
+            self._send_json(200, {'file': {
+                'name': name,
+                'uri': f"http://{self.headers.get('Host')}/v1beta/{name}",
+                'mimeType': self.headers.get('Content-Type', 'image/png'),
+                'sizeBytes': str(len(body)),
+                'state': 'ACTIVE'
+            }})
+        else:
+            self._send_json(400, {'error': {'code': 400, 'message': 'Missing X-Goog-Upload-Command'}})
+
+    def _handle_openrouter(self, body: Dict[str, Any]):
+        model = body.get('model', 'unknown')
+        if self.headers.get('Authorization', '').replace('Bearer ', '', 1) in self.behavior.rejected_keys:
+            self._send_json(401, {'error': {'code': 401, 'message': 'No auth credentials found'}})
+            return
+        status, latency, text = self.behavior.next_request(model)
+        time.sleep(latency)
+
+        if status == 429:
+            retry_after = self.behavior.retry_after
+            self._send_json(429, {'error': {'code': 429, 'message': 'Rate limit exceeded'}}, {
+                'Retry-After': f"{retry_after:g}",
+                'X-RateLimit-Remaining': '0',
+                'X-RateLimit-Reset': str(int((time.time() + retry_after) * 1000))
+            })
+            return
+        if status:
+            self._send_json(status, {'error': {'code': status, 'message': 'Injected server error'}})
+            return
+
+        usage = {'prompt_tokens': 1000, 'completion_tokens': len(text) // 4,
+                 'prompt_tokens_details': {'cached_tokens': 0}}
+        if not body.get('stream'):
+            self._send_json(200, {
+                'id': 'stub', 'model': model, 'usage': usage,
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': text}}]
+            })
+            return
+
+        events = [{'choices': [{'index': 0, 'delta': {'content': chunk}}]} for chunk in self.behavior.chunks(text)]
+        events.append({'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}], 'usage': usage})
+        self._send_sse(events, done_marker=True)
+
+    def _handle_gemini(self, model: str, stream: bool):
+        if self.headers.get('x-goog-api-key') in self.behavior.rejected_keys:
+            self._send_json(400, {'error': {
+                'code': 400, 'status': 'INVALID_ARGUMENT', 'message': 'API key not valid. Please pass a valid API key.',
+                'details': [{'@type': 'type.googleapis.com/google.rpc.ErrorInfo', 'reason': 'API_KEY_INVALID'}]
+            }})
+            return
+        status, latency, text = self.behavior.next_request(model)
+        time.sleep(latency)
+
+        if status == 429:
+            self._send_json(429, {'error': {
+                'code': 429, 'status': 'RESOURCE_EXHAUSTED', 'message': 'Quota exceeded',
+                'details': [{'@type': 'type.googleapis.com/google.rpc.RetryInfo',
+                             'retryDelay': f"{self.behavior.retry_after:g}s"}]
+            }})
+            return
+        if status:
+            self._send_json(status, {'error': {'code': status, 'status': 'UNAVAILABLE',
+                                               'message': 'Injected server error'}})
+            return
+
+        usage = {'promptTokenCount': 1000, 'candidatesTokenCount': len(text) // 4,
+                 'promptTokensDetails': [{'modality': 'TEXT', 'tokenCount': 742},
+                                         {'modality': 'IMAGE', 'tokenCount': 258}]}
+        if not stream:
+            self._send_json(200, {
+                'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'finishReason': 'STOP'}],
+                'usageMetadata': usage
+            })
+            return
+
+        # Like Gemini, every event carries the running usage totals
+        events = [{'candidates': [{'content': {'role': 'model', 'parts': [{'text': chunk}]}}],
+                   'usageMetadata': usage}
+                  for chunk in self.behavior.chunks(text)]
+        events.append({'candidates': [{'content': {'role': 'model', 'parts': [{'text': ''}]},
+                                       'finishReason': 'STOP'}],
+                       'usageMetadata': usage})
+        self._send_sse(events, done_marker=False)
+
+    def _send_json(self, status: int, data: Any, headers: Optional[Dict[str, str]] = None):
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_sse(self, events: List[Dict[str, Any]], done_marker: bool):
+        """Stream events as server-sent events; the client may hang up early"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        lines = [f"data: {json.dumps(event)}\n\n" for event in events]
+        if done_marker:
+            lines.append("data: [DONE]\n\n")
+        try:
+            for line in lines:
+                self.wfile.write(line.encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(self.behavior.chunk_interval)
+        except (BrokenPipeError, ConnectionResetError):
+            logger.debug("Client closed stream early")
+
+class StubLLMServer:
+    """
+    Stub LLM server running in a background thread
+
+    Example:
+        with StubLLMServer(StubBehavior(latency='uniform:0.1,0.3')) as server:
+            Config.OPENROUTER_API_URL = server.openrouter_url
+            Config.GOOGLE_API_URL = server.google_url
+    """
+
+    def __init__(self, behavior: Optional[StubBehavior] = None, host: str = '127.0.0.1', port: int = 0):
+        handler = type('BoundStubRequestHandler', (StubRequestHandler,), {'behavior': behavior or StubBehavior()})
+        self.behavior = handler.behavior
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openrouter_url(self) -> str:
+        return f"{self.base_url}/api/v1/chat/completions"
+
+    @property
+    def google_url(self) -> str:
+        return f"{self.base_url}/v1beta/models/{{model}}:generateContent"
+
+    def start(self) -> 'StubLLMServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Stub LLM server listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> 'StubLLMServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub LLM server (OpenRouter + Gemini wire formats)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='fixed:0',
+                        help="Latency distribution, e.g. fixed:0.2, uniform:0.1,0.5, lognormal:-1.5,0.5")
+    parser.add_argument('--model-latency', action='append', default=[], metavar='MODEL=SPEC',
+                        help="Per-model latency distribution (repeatable)")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument('--server-error-rate', type=float, default=0.0, help="Share of requests answered with 5xx")
+    parser.add_argument('--retry-after', type=float, default=5.0, help="Retry delay reported with 429 (seconds)")
+    parser.add_argument('--chunk-size', type=int, default=12, help="Characters per streamed chunk")
+    parser.add_argument('--chunk-interval', type=float, default=0.01, help="Delay between streamed chunks")
+    parser.add_argument('--actions', help="JSON file with a list of actions to return in order (cycled)")
+    parser.add_argument('--seed', type=int, help="Random seed for reproducible runs")
+    parser.add_argument('--rejected-key', action='append', default=[], metavar='KEY',
+                        help="API key answered with an auth error (repeatable)")
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()), format='%(asctime)s - %(levelname)s - %(message)s')
+
+    actions = None
+    if args.actions:
+        with open(args.actions, 'r', encoding='utf-8') as f:
+            actions = json.load(f)
+
+    model_latency = dict(item.split('=', 1) for item in args.model_latency)
+    behavior = StubBehavior(
+        latency=args.latency,
+        model_latency=model_latency,
+        rate_limit_rate=args.rate_limit_rate,
+        server_error_rate=args.server_error_rate,
+        retry_after=args.retry_after,
+        chunk_size=args.chunk_size,
+        chunk_interval=args.chunk_interval,
+        actions=actions,
+        seed=args.seed,
+        rejected_keys=args.rejected_key
+    )
+
+    server = StubLLMServer(behavior, args.host, args.port)
+    logger.info(f"OPENROUTER_API_URL={server.openrouter_url}")
+    logger.info(f"GOOGLE_API_URL={server.google_url}")
+    try:
+        server.start()
+        server._thread.join()
+    except KeyboardInterrupt:
+        logger.info("Stopping stub LLM server")
+        server.stop()
+
+if __name__ == "__main__":
+    main()